@@ -207,7 +207,10 @@ class ApiClient {
 
    async logout() {
       try {
-         await this.request("/api/auth/logout", { method: "POST" });
+         await this.request("/api/auth/logout", {
+            method: "POST",
+            body: JSON.stringify({ refresh_token: getRefreshToken() }),
+         });
       } finally {
          clearTokens();
       }
@@ -370,6 +373,13 @@ class ApiClient {
       });
    }
 
+   async bulkUpdateOrderStatus(orderIds: number[], status: string) {
+      return this.request<any>(`/api/admin/orders/bulk/status`, {
+         method: "POST",
+         body: JSON.stringify({ order_ids: orderIds, status }),
+      });
+   }
+
    async updateOrderShipping(id: number, data: any) {
       return this.request(`/api/admin/orders/${id}/shipping`, {
          method: "PUT",
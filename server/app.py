@@ -1,8 +1,17 @@
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from extensions import db, redis_client
 from config import config
+from utils.search import init_search
+from utils.suggest import build_suggest_index
+from utils.rollups import ensure_rollups
+from utils.schema import upgrade_schema
+from utils.constants import load_constants
+from utils.token_blocklist import is_token_revoked
+from utils.passwords import PasswordHasherBusy
+from utils.rate_limit import init_rate_limits
 import os
 import paypalrestsdk
 
@@ -11,6 +20,12 @@ def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Behind a proxy, take the client address from the trusted X-Forwarded-For hops
+    # (rate limits key on request.remote_addr); never trust the header otherwise
+    hops = app.config['PROXY_FIX_HOPS']
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    
     # Initialize extensions
     db.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
@@ -41,11 +56,24 @@ def create_app(config_name='development'):
         print('JWT expired token')
         return jsonify({'error': 'Token has expired'}), 401
 
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return is_token_revoked(jwt_payload)
+
+    @app.errorhandler(PasswordHasherBusy)
+    def on_password_hasher_busy(e):
+        response = jsonify({'error': 'Server is busy, please try again shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
     @jwt.revoked_token_loader
     def on_revoked(jwt_header, jwt_payload):
         print('JWT revoked token')
         return jsonify({'error': 'Token has been revoked'}), 401
     
+    # Endpoint and blueprint rate limits for views without @rate_limited
+    init_rate_limits(app)
+    
     # Create upload folder
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
@@ -95,8 +123,13 @@ def create_app(config_name='development'):
     # Create tables and seed admin user
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        init_search()
+        ensure_rollups()
         seed_admin_user(app)
         seed_default_constants(app)
+        load_constants()
+        build_suggest_index()
     
     return app
 
@@ -104,6 +137,7 @@ def create_app(config_name='development'):
 def seed_admin_user(app):
     """Create default admin user if not exists."""
     from models.user import User
+    from utils.rollups import record_signup
     
     admin_email = app.config['ADMIN_EMAIL']
     admin = User.query.filter_by(email=admin_email).first()
@@ -118,6 +152,7 @@ def seed_admin_user(app):
         )
         admin.set_password(app.config['ADMIN_PASSWORD'])
         db.session.add(admin)
+        record_signup(admin)
         db.session.commit()
         print(f'Admin user created: {admin_email}')
 
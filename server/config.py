@@ -10,15 +10,60 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Per-process Bloom filter in front of the Redis token blocklist
+    JWT_BLOOM_CAPACITY = int(os.getenv('JWT_BLOOM_CAPACITY', 100000))  # revoked tokens
+    JWT_BLOOM_ERROR_RATE = float(os.getenv('JWT_BLOOM_ERROR_RATE', 0.001))
+    
+    # Gunicorn worker processes and threads per worker (read by the Dockerfile)
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 4))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 8))
+    
+    # Password hashing (werkzeug method string, e.g. 'scrypt' or 'pbkdf2:sha256:600000').
+    # Pools are per gunicorn worker: by default all of them together get one
+    # hashing process per CPU, and at most half a worker's threads wait on hashing
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = int(os.getenv(  # 0 hashes in the request thread
+        'PASSWORD_HASH_WORKERS', max((os.cpu_count() or 1) // max(WEB_CONCURRENCY, 1), 1)
+    ))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', max(GUNICORN_THREADS // 2, 1)))
     
     # Database
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://localhost/marketplace')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
     
+    # Threads per process running independent analytics queries concurrently
+    # (each holds its own database connection; 0 runs them in the request thread)
+    ANALYTICS_QUERY_WORKERS = int(os.getenv('ANALYTICS_QUERY_WORKERS', 4))
+    
     # Redis
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     
+    # Listing totals: cached exact counts, planner estimates for big unfiltered tables
+    COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 30))  # seconds
+    COUNT_ESTIMATE_THRESHOLD = int(os.getenv('COUNT_ESTIMATE_THRESHOLD', 100000))  # rows
+    
+    # Order numbers: sequence blocks reserved per process from 'redis' or 'postgres'
+    ORDER_NUMBER_BACKEND = os.getenv('ORDER_NUMBER_BACKEND', 'redis')
+    ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', 100))
+    # Upper bound on processes (all nodes, all workers) holding a block; a lost
+    # Redis counter restarts this many blocks past the highest issued number
+    ORDER_NUMBER_MAX_PROCESSES = int(os.getenv('ORDER_NUMBER_MAX_PROCESSES', 64))
+    
+    # Rate limits per endpoint (blueprint.view) or blueprint: name=requests/seconds
+    RATE_LIMITS = os.getenv(
+        'RATE_LIMITS',
+        'auth.login=10/60,auth.register=5/3600,products.rate_product=30/60,payments.create_paypal_order=10/60'
+    )
+    
+    # Reverse proxies in front of the app that append X-Forwarded-For/-Proto;
+    # only that many hops are trusted for the client address (0 = none, serve directly)
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', 0))
+    
+    # Per-process cache tier in front of Redis
+    LOCAL_CACHE_MAX_ENTRIES = int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', 1024))
+    LOCAL_CACHE_TTL = int(os.getenv('LOCAL_CACHE_TTL', 30))  # seconds
+    
     # Upload
     # Default uploads directory: workspace-level `uploads/` (absolute path)
     _env_upload = os.getenv('UPLOAD_FOLDER')
@@ -4,6 +4,7 @@ Database initialization and seeding script
 from app import create_app
 from extensions import db
 from models import User, Category, Product, Order
+from utils.rollups import record_signup
 import os
 
 def init_db():
@@ -30,6 +31,7 @@ def init_db():
             )
             admin.set_password(app.config['ADMIN_PASSWORD'])
             db.session.add(admin)
+            record_signup(admin)
             db.session.commit()
             print(f"✓ Admin user created: {admin_email}")
             print(f"  Password: {app.config['ADMIN_PASSWORD']}")
@@ -124,13 +126,68 @@ def seed_sample_data():
         db.session.commit()
         print(f"✓ Created {len(products)} sample products")
         
+        from utils.search import rebuild_search_index
+        rebuild_search_index()
+        
         print("\n✓ Sample data seeding complete!")
 
 
+def repair_rating_summaries():
+    """Recompute denormalized product rating summaries from product_ratings."""
+    from utils.ratings import recompute_rating_summaries
+    app = create_app()
+    
+    with app.app_context():
+        print("Recomputing product rating summaries...")
+        rated = recompute_rating_summaries()
+        print(f"✓ Rating summaries rebuilt ({rated} rated products)")
+
+
+def rebuild_search():
+    """Rebuild the product full-text search index."""
+    from utils.search import rebuild_search_index
+    app = create_app()
+    
+    with app.app_context():
+        print("Rebuilding product search index...")
+        rebuild_search_index()
+        print("✓ Search index rebuilt")
+
+
+def rebuild_rollups():
+    """Recompute the daily analytics rollups from orders and users."""
+    from utils.rollups import rebuild_rollups as rebuild
+    app = create_app()
+    
+    with app.app_context():
+        print("Rebuilding daily analytics rollups...")
+        order_days, signup_days = rebuild()
+        print(f"✓ Rollups rebuilt ({order_days} order days, {signup_days} signup days)")
+
+
+def rebuild_leaderboards():
+    """Recompute the Redis sales leaderboards from paid orders."""
+    from utils.leaderboards import rebuild_leaderboards as rebuild
+    app = create_app()
+    
+    with app.app_context():
+        print("Rebuilding sales leaderboards...")
+        products, customers = rebuild()
+        print(f"✓ Leaderboards rebuilt ({products} products, {customers} customers)")
+
+
 if __name__ == '__main__':
     import sys
     
     if len(sys.argv) > 1 and sys.argv[1] == '--seed':
         seed_sample_data()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--repair-ratings':
+        repair_rating_summaries()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--rebuild-search':
+        rebuild_search()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--rebuild-rollups':
+        rebuild_rollups()
+    elif len(sys.argv) > 1 and sys.argv[1] == '--rebuild-leaderboards':
+        rebuild_leaderboards()
     else:
         init_db()
@@ -5,6 +5,7 @@ from models.product import Product
 from models.rating import ProductRating
 from models.order import Order, OrderItem, OrderStatus, PaymentStatus
 from models.constant import Constant
+from models.rollup import OrderDaily, SignupDaily
 
 __all__ = [
     'User',
@@ -17,5 +18,7 @@ __all__ = [
     'OrderStatus',
     'PaymentStatus'
     'PaymentStatus',
-    'Constant'
+    'Constant',
+    'OrderDaily',
+    'SignupDaily'
 ]
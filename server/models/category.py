@@ -18,7 +18,9 @@ class Category(db.Model):
     # Relationships
     products = db.relationship('Product', back_populates='category', lazy='dynamic')
     
-    def to_dict(self, include_products=False):
+    def to_dict(self, include_products=False, product_count=None):
+        if product_count is None:
+            product_count = self.products.count()
         data = {
             'id': self.id,
             'name': self.name,
@@ -29,7 +31,7 @@ class Category(db.Model):
             'display_order': self.display_order,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'product_count': self.products.count()
+            'product_count': product_count
         }
         
         if include_products:
@@ -42,6 +42,15 @@ class Product(db.Model):
     view_count = db.Column(db.Integer, default=0)
     sales_count = db.Column(db.Integer, default=0)
     
+    # Ratings summary, maintained incrementally by utils.ratings
+    rating_sum = db.Column(db.Integer, default=0)
+    rating_count = db.Column(db.Integer, default=0)
+    rating_1 = db.Column(db.Integer, default=0)
+    rating_2 = db.Column(db.Integer, default=0)
+    rating_3 = db.Column(db.Integer, default=0)
+    rating_4 = db.Column(db.Integer, default=0)
+    rating_5 = db.Column(db.Integer, default=0)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -64,6 +73,21 @@ class Product(db.Model):
             return False
         return 0 < self.stock_quantity <= self.low_stock_threshold
     
+    @property
+    def rating_average(self):
+        """Average rating from the denormalized summary columns."""
+        if not self.rating_count:
+            return 0.0
+        return round((self.rating_sum or 0) / self.rating_count, 2)
+    
+    @property
+    def rating_histogram(self):
+        """Number of ratings per star value (1-5)."""
+        return {
+            str(star): getattr(self, f'rating_{star}') or 0
+            for star in range(1, 6)
+        }
+    
     def to_dict(self, include_category=True):
         data = {
             'id': self.id,
@@ -100,16 +124,9 @@ class Product(db.Model):
             data['category'] = self.category.to_dict(include_products=False)
 
         # Ratings summary (average and count)
-        try:
-            reviews = len(self.ratings) if self.ratings is not None else 0
-            avg = 0.0
-            if reviews > 0:
-                avg = sum([r.rating for r in self.ratings]) / reviews
-            data['rating'] = round(avg, 2)
-            data['reviews'] = reviews
-        except Exception:
-            data['rating'] = 0
-            data['reviews'] = 0
+        data['rating'] = self.rating_average
+        data['reviews'] = self.rating_count or 0
+        data['rating_histogram'] = self.rating_histogram
         
         return data
     
@@ -4,6 +4,9 @@ from datetime import datetime
 
 class ProductRating(db.Model):
     __tablename__ = 'product_ratings'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'user_id', name='uq_product_ratings_product_user'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
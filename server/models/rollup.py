@@ -0,0 +1,28 @@
+from extensions import db
+
+
+class OrderDaily(db.Model):
+    """Per-day order counts and paid revenue, by the orders' UTC creation date."""
+    __tablename__ = 'orders_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    paid_count = db.Column(db.Integer, nullable=False, default=0)
+    paid_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    paid_subtotal = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    paid_tax = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    paid_shipping = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OrderDaily {self.day}>'
+
+
+class SignupDaily(db.Model):
+    """Per-day user registrations, by the users' UTC creation date."""
+    __tablename__ = 'signups_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    signup_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SignupDaily {self.day}>'
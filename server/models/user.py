@@ -1,5 +1,5 @@
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.passwords import hash_password, verify_password, needs_rehash
 from datetime import datetime
 
 
@@ -24,11 +24,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check password against hash."""
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        """Whether the stored hash predates the current hashing parameters."""
+        return needs_rehash(self.password_hash)
     
     def to_dict(self, include_sensitive=False):
         """Convert user to dictionary."""
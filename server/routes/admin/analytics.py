@@ -4,139 +4,294 @@ from models.user import User
 from models.product import Product
 from models.category import Category
 from models.order import Order, OrderItem, OrderStatus, PaymentStatus
+from models.rollup import OrderDaily, SignupDaily
 from extensions import db
 from utils.auth import admin_required
+from utils.cache import cache_stats
+from utils import metrics
+from utils.parallel import gather
+from utils.leaderboards import top_products, top_customers, DAILY_RETENTION_DAYS
 from sqlalchemy import func, desc
 from datetime import datetime, timedelta
 
 admin_analytics_bp = Blueprint('admin_analytics', __name__)
 
 
+def _start_day(days):
+    """
+    First UTC day of a window covering the last `days` days, today included.
+
+    Rollups, leaderboards and their SQL fallbacks all use this, so one `days`
+    means the same period across the dashboard.
+    """
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+
+def _window_start(days):
+    """Start of the _start_day() window as a datetime, for filtering orders."""
+    return datetime.combine(_start_day(days), datetime.min.time())
+
+
+def _days_arg(default=None, maximum=None):
+    """
+    The `days` query arg, capped at `maximum`.
+
+    Raises:
+        ValueError: If it is given but is not a positive integer
+    """
+    if 'days' not in request.args:
+        return default
+    days = request.args.get('days', type=int)
+    if days is None or days < 1:
+        raise ValueError('days must be a positive integer')
+    return min(days, maximum) if maximum else days
+
+
+def _leaders(reader, limit, days):
+    try:
+        return reader(limit, days)
+    except Exception as e:
+        print(f"Leaderboard read error: {e}")
+        return None
+
+
+def _top_sellers(limit, days=None):
+    """
+    Best-selling products by units, from the Redis leaderboard when available.
+
+    Args:
+        limit: Number of products
+        days: Only count orders from the last N days (all time if None)
+
+    Returns:
+        list: [{'id', 'name', 'sku', 'image_url', 'total_sold', 'revenue'}]
+    """
+    leaders = _leaders(top_products, limit, days)
+    if leaders is None:
+        # Leaderboards not built or Redis unavailable: aggregate paid orders
+        query = db.session.query(
+            OrderItem.product_id,
+            func.sum(OrderItem.quantity).label('units'),
+            func.sum(OrderItem.total_price).label('revenue')
+        ).join(Order).filter(Order.payment_status == PaymentStatus.PAID.value)
+        if days:
+            query = query.filter(Order.created_at >= _window_start(days))
+        leaders = [
+            {'id': row.product_id, 'units': int(row.units or 0), 'revenue': float(row.revenue or 0)}
+            for row in query.group_by(OrderItem.product_id).order_by(desc('units')).limit(limit)
+        ]
+    
+    products = {}
+    if leaders:
+        products = {
+            p.id: p for p in Product.query.filter(Product.id.in_([leader['id'] for leader in leaders])).all()
+        }
+    sellers = []
+    for leader in leaders:
+        product = products.get(leader['id'])
+        if not product:
+            continue
+        sellers.append({
+            'id': product.id,
+            'name': product.name,
+            'sku': product.sku,
+            'image_url': product.image_url,
+            'total_sold': leader['units'],
+            'revenue': leader['revenue']
+        })
+    return sellers
+
+
+def _top_customers(limit, days=None):
+    """
+    Customers with the highest paid spend, from the Redis leaderboard when
+    available.
+
+    Returns:
+        list: [{'id', 'email', 'name', 'order_count', 'total_spent'}]
+    """
+    leaders = _leaders(top_customers, limit, days)
+    if leaders is None:
+        query = db.session.query(
+            Order.user_id,
+            func.count(Order.id).label('orders'),
+            func.sum(Order.total).label('spend')
+        ).filter(Order.payment_status == PaymentStatus.PAID.value)
+        if days:
+            query = query.filter(Order.created_at >= _window_start(days))
+        leaders = [
+            {'id': row.user_id, 'orders': row.orders, 'spend': float(row.spend or 0)}
+            for row in query.group_by(Order.user_id).order_by(desc('spend')).limit(limit)
+        ]
+    
+    users = {}
+    if leaders:
+        users = {u.id: u for u in User.query.filter(User.id.in_([leader['id'] for leader in leaders])).all()}
+    customers = []
+    for leader in leaders:
+        user = users.get(leader['id'])
+        if not user:
+            continue
+        customers.append({
+            'id': user.id,
+            'email': user.email,
+            'name': f'{user.first_name or ""} {user.last_name or ""}'.strip() or 'N/A',
+            'order_count': leader['orders'],
+            'total_spent': leader['spend']
+        })
+    return customers
+
+
+def _dashboard_users(start_day):
+    counts = db.session.query(
+        func.count(User.id).label('total'),
+        func.count(User.id).filter(User.is_active == True).label('active')
+    ).one()
+    new_users = db.session.query(
+        func.coalesce(func.sum(SignupDaily.signup_count), 0)
+    ).filter(SignupDaily.day >= start_day).scalar()
+    return {
+        'total': counts.total,
+        'new': int(new_users or 0),
+        'active': counts.active,
+        'inactive': counts.total - counts.active
+    }
+
+
+def _dashboard_products():
+    tracked = Product.track_inventory == True
+    counts = db.session.query(
+        func.count(Product.id).label('total'),
+        func.count(Product.id).filter(Product.is_active == True).label('active'),
+        func.count(Product.id).filter(
+            tracked,
+            Product.stock_quantity > 0,
+            Product.stock_quantity <= Product.low_stock_threshold
+        ).label('low_stock'),
+        func.count(Product.id).filter(tracked, Product.stock_quantity <= 0).label('out_of_stock')
+    ).one()
+    return {
+        'total': counts.total,
+        'active': counts.active,
+        'inactive': counts.total - counts.active,
+        'low_stock': counts.low_stock,
+        'out_of_stock': counts.out_of_stock
+    }
+
+
+def _dashboard_categories():
+    counts = db.session.query(
+        func.count(Category.id).label('total'),
+        func.count(Category.id).filter(Category.is_active == True).label('active')
+    ).one()
+    return {
+        'total': counts.total,
+        'active': counts.active,
+        'inactive': counts.total - counts.active
+    }
+
+
+def _dashboard_order_statuses():
+    counts = db.session.query(
+        func.count(Order.id).filter(Order.status == OrderStatus.PENDING.value).label('pending'),
+        func.count(Order.id).filter(Order.status == OrderStatus.PROCESSING.value).label('processing'),
+        func.count(Order.id).filter(Order.status == OrderStatus.SHIPPED.value).label('shipped')
+    ).one()
+    return {
+        'pending': counts.pending,
+        'processing': counts.processing,
+        'shipped': counts.shipped
+    }
+
+
+def _dashboard_revenue(start_day):
+    # All-time and recent totals from the daily rollup in one pass
+    recent = OrderDaily.day >= start_day
+    columns = {
+        'orders': OrderDaily.order_count,
+        'total': OrderDaily.paid_total,
+        'subtotal': OrderDaily.paid_subtotal,
+        'tax': OrderDaily.paid_tax,
+        'shipping': OrderDaily.paid_shipping,
+        'order_count': OrderDaily.paid_count
+    }
+    row = db.session.query(
+        *[func.sum(column).label(name) for name, column in columns.items()],
+        *[func.sum(column).filter(recent).label(f'recent_{name}') for name, column in columns.items()]
+    ).one()._asdict()
+    return {
+        scope: {
+            name: (int if name in ('orders', 'order_count') else float)(row[prefix + name] or 0)
+            for name in columns
+        }
+        for scope, prefix in (('all_time', ''), ('recent', 'recent_'))
+    }
+
+
+def _dashboard_top_products():
+    return [
+        {
+            'id': p['id'],
+            'name': p['name'],
+            'image_url': p['image_url'],
+            'total_sold': p['total_sold'],
+            'total_revenue': p['revenue']
+        }
+        for p in _top_sellers(5)
+    ]
+
+
+def _dashboard_recent_orders():
+    recent_orders = Order.query.options(
+        *Order.loader_options(include_items=False, include_user=True)
+    ).order_by(
+        Order.created_at.desc()
+    ).limit(10).all()
+    # Serialize here: the objects belong to this task's session
+    return [order.to_dict(include_items=False, include_user=True) for order in recent_orders]
+
+
 @admin_analytics_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 @admin_required
 def get_dashboard_stats():
     """Get comprehensive dashboard statistics."""
     # Date range
-    days = request.args.get('days', 30, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # User stats
-    total_users = User.query.count()
-    new_users = User.query.filter(User.created_at >= start_date).count()
-    active_users = User.query.filter_by(is_active=True).count()
-    
-    # Product stats
-    total_products = Product.query.count()
-    active_products = Product.query.filter_by(is_active=True).count()
-    low_stock_products = Product.query.filter(
-        Product.track_inventory == True,
-        Product.stock_quantity > 0,
-        Product.stock_quantity <= Product.low_stock_threshold
-    ).count()
-    out_of_stock_products = Product.query.filter(
-        Product.track_inventory == True,
-        Product.stock_quantity <= 0
-    ).count()
-    
-    # Category stats
-    total_categories = Category.query.count()
-    active_categories = Category.query.filter_by(is_active=True).count()
-    
-    # Order stats
-    total_orders = Order.query.count()
-    recent_orders = Order.query.filter(Order.created_at >= start_date).count()
-    pending_orders = Order.query.filter_by(status=OrderStatus.PENDING.value).count()
-    processing_orders = Order.query.filter_by(status=OrderStatus.PROCESSING.value).count()
-    shipped_orders = Order.query.filter_by(status=OrderStatus.SHIPPED.value).count()
+    try:
+        days = _days_arg(30)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    start_day = _start_day(days)
     
-    # Revenue stats (only paid orders)
-    revenue_query = db.session.query(
-        func.sum(Order.total).label('total_revenue'),
-        func.sum(Order.subtotal).label('subtotal'),
-        func.sum(Order.tax).label('tax'),
-        func.sum(Order.shipping_cost).label('shipping'),
-        func.count(Order.id).label('order_count')
-    ).filter(Order.payment_status == PaymentStatus.PAID.value)
+    # Independent sections run concurrently, each on its own connection
+    sections, timings = gather({
+        'users': lambda: _dashboard_users(start_day),
+        'products': _dashboard_products,
+        'categories': _dashboard_categories,
+        'order_statuses': _dashboard_order_statuses,
+        'revenue': lambda: _dashboard_revenue(start_day),
+        'top_products': _dashboard_top_products,
+        'recent_orders': _dashboard_recent_orders
+    }, metric_prefix='dashboard')
     
-    all_time_revenue = revenue_query.first()
-    recent_revenue = revenue_query.filter(Order.created_at >= start_date).first()
-    
-    # Top selling products
-    top_products = db.session.query(
-        Product.id,
-        Product.name,
-        Product.image_url,
-        func.sum(OrderItem.quantity).label('total_sold'),
-        func.sum(OrderItem.total_price).label('total_revenue')
-    ).join(OrderItem).join(Order).filter(
-        Order.payment_status == PaymentStatus.PAID.value
-    ).group_by(Product.id, Product.name, Product.image_url).order_by(
-        desc('total_sold')
-    ).limit(5).all()
-    
-    # Recent orders
-    recent_orders_list = Order.query.order_by(
-        Order.created_at.desc()
-    ).limit(10).all()
+    revenue = sections['revenue']
+    all_time_orders = revenue['all_time'].pop('orders')
+    recent_orders = revenue['recent'].pop('orders')
+    revenue['recent']['days'] = days
     
     return jsonify({
-        'users': {
-            'total': total_users,
-            'new': new_users,
-            'active': active_users,
-            'inactive': total_users - active_users
-        },
-        'products': {
-            'total': total_products,
-            'active': active_products,
-            'inactive': total_products - active_products,
-            'low_stock': low_stock_products,
-            'out_of_stock': out_of_stock_products
-        },
-        'categories': {
-            'total': total_categories,
-            'active': active_categories,
-            'inactive': total_categories - active_categories
-        },
+        'users': sections['users'],
+        'products': sections['products'],
+        'categories': sections['categories'],
         'orders': {
-            'total': total_orders,
+            'total': all_time_orders,
             'recent': recent_orders,
-            'pending': pending_orders,
-            'processing': processing_orders,
-            'shipped': shipped_orders
-        },
-        'revenue': {
-            'all_time': {
-                'total': float(all_time_revenue.total_revenue or 0),
-                'subtotal': float(all_time_revenue.subtotal or 0),
-                'tax': float(all_time_revenue.tax or 0),
-                'shipping': float(all_time_revenue.shipping or 0),
-                'order_count': all_time_revenue.order_count
-            },
-            'recent': {
-                'total': float(recent_revenue.total_revenue or 0),
-                'subtotal': float(recent_revenue.subtotal or 0),
-                'tax': float(recent_revenue.tax or 0),
-                'shipping': float(recent_revenue.shipping or 0),
-                'order_count': recent_revenue.order_count,
-                'days': days
-            }
+            **sections['order_statuses']
         },
-        'top_products': [
-            {
-                'id': p.id,
-                'name': p.name,
-                'image_url': p.image_url,
-                'total_sold': int(p.total_sold),
-                'total_revenue': float(p.total_revenue)
-            }
-            for p in top_products
-        ],
-        'recent_orders': [
-            order.to_dict(include_items=False, include_user=True)
-            for order in recent_orders_list
-        ]
+        'revenue': revenue,
+        'top_products': sections['top_products'],
+        'recent_orders': sections['recent_orders'],
+        'timings_ms': timings
     }), 200
 
 
@@ -146,27 +301,23 @@ def get_dashboard_stats():
 def get_sales_analytics():
     """Get sales analytics over time."""
     # Date range
-    days = request.args.get('days', 30, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    try:
+        days = _days_arg(30)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Daily sales
-    daily_sales = db.session.query(
-        func.date(Order.created_at).label('date'),
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total).label('revenue')
-    ).filter(
-        Order.created_at >= start_date,
-        Order.payment_status == PaymentStatus.PAID.value
-    ).group_by(
-        func.date(Order.created_at)
-    ).order_by('date').all()
+    # Daily sales of paid orders, from the rollup
+    daily_sales = OrderDaily.query.filter(
+        OrderDaily.day >= _start_day(days),
+        OrderDaily.paid_count > 0
+    ).order_by(OrderDaily.day).all()
     
     return jsonify({
         'daily_sales': [
             {
-                'date': str(day.date),
-                'order_count': day.order_count,
-                'revenue': float(day.revenue or 0)
+                'date': day.day.isoformat(),
+                'order_count': day.paid_count,
+                'revenue': float(day.paid_total or 0)
             }
             for day in daily_sales
         ]
@@ -179,20 +330,14 @@ def get_sales_analytics():
 def get_product_performance():
     """Get product performance metrics."""
     limit = request.args.get('limit', 10, type=int)
+    # Per-day leaderboards only go back DAILY_RETENTION_DAYS
+    try:
+        days = _days_arg(maximum=DAILY_RETENTION_DAYS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Top selling products
-    top_sellers = db.session.query(
-        Product.id,
-        Product.name,
-        Product.sku,
-        Product.image_url,
-        func.sum(OrderItem.quantity).label('total_sold'),
-        func.sum(OrderItem.total_price).label('revenue')
-    ).join(OrderItem).join(Order).filter(
-        Order.payment_status == PaymentStatus.PAID.value
-    ).group_by(
-        Product.id, Product.name, Product.sku, Product.image_url
-    ).order_by(desc('total_sold')).limit(limit).all()
+    # Top selling products, all time or over the last `days` days
+    top_sellers = _top_sellers(limit, days)
     
     # Low stock products
     low_stock = Product.query.filter(
@@ -208,17 +353,7 @@ def get_product_performance():
     ).order_by(Product.stock_quantity.asc()).limit(limit).all()
     
     return jsonify({
-        'top_sellers': [
-            {
-                'id': p.id,
-                'name': p.name,
-                'sku': p.sku,
-                'image_url': p.image_url,
-                'total_sold': int(p.total_sold),
-                'revenue': float(p.revenue)
-            }
-            for p in top_sellers
-        ],
+        'top_sellers': top_sellers,
         'low_stock': [p.to_dict(include_category=False) for p in low_stock],
         'out_of_stock': [p.to_dict(include_category=False) for p in out_of_stock]
     }), 200
@@ -260,49 +395,38 @@ def get_category_performance():
 def get_user_activity():
     """Get user activity analytics."""
     # Date range
-    days = request.args.get('days', 30, type=int)
-    start_date = datetime.utcnow() - timedelta(days=days)
+    try:
+        days = _days_arg(30)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # New user registrations over time
-    new_users = db.session.query(
-        func.date(User.created_at).label('date'),
-        func.count(User.id).label('count')
-    ).filter(
-        User.created_at >= start_date
-    ).group_by(
-        func.date(User.created_at)
-    ).order_by('date').all()
+    # New user registrations over time, from the rollup
+    new_users = SignupDaily.query.filter(
+        SignupDaily.day >= _start_day(days),
+        SignupDaily.signup_count > 0
+    ).order_by(SignupDaily.day).all()
     
-    # Top customers by order count
-    top_customers = db.session.query(
-        User.id,
-        User.email,
-        User.first_name,
-        User.last_name,
-        func.count(Order.id).label('order_count'),
-        func.sum(Order.total).label('total_spent')
-    ).join(Order).filter(
-        Order.payment_status == PaymentStatus.PAID.value
-    ).group_by(
-        User.id, User.email, User.first_name, User.last_name
-    ).order_by(desc('total_spent')).limit(10).all()
+    # Top customers by paid spend
+    customers = _top_customers(10)
     
     return jsonify({
         'new_users_by_date': [
             {
-                'date': str(day.date),
-                'count': day.count
+                'date': day.day.isoformat(),
+                'count': day.signup_count
             }
             for day in new_users
         ],
-        'top_customers': [
-            {
-                'id': u.id,
-                'email': u.email,
-                'name': f'{u.first_name or ""} {u.last_name or ""}'.strip() or 'N/A',
-                'order_count': u.order_count,
-                'total_spent': float(u.total_spent or 0)
-            }
-            for u in top_customers
-        ]
+        'top_customers': customers
+    }), 200
+
+
+@admin_analytics_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_metrics():
+    """Get cache and timing metrics of the worker process serving this request."""
+    return jsonify({
+        'cache': cache_stats(),
+        **metrics.snapshot()
     }), 200
@@ -5,7 +5,8 @@ from models.product import Product
 from extensions import db
 from utils.auth import admin_required
 from utils.helpers import save_image, delete_image, generate_slug
-from utils.cache import invalidate_cache
+from utils.cache import invalidate_tags
+from utils.suggest import sync_categories, remove_categories
 
 admin_categories_bp = Blueprint('admin_categories', __name__)
 
@@ -100,8 +101,9 @@ def create_category():
     db.session.add(category)
     db.session.commit()
     
-    # Invalidate cache
-    invalidate_cache('categories')
+    # Invalidate cache (product responses embed their category)
+    invalidate_tags('categories', 'catalog')
+    sync_categories([category])
     
     return jsonify({
         'message': 'Category created successfully',
@@ -152,8 +154,9 @@ def update_category(category_id):
     
     db.session.commit()
     
-    # Invalidate cache
-    invalidate_cache('categories')
+    # Invalidate cache (product responses embed their category)
+    invalidate_tags('categories', 'catalog')
+    sync_categories([category])
     
     return jsonify({
         'message': 'Category updated successfully',
@@ -184,8 +187,9 @@ def delete_category(category_id):
     db.session.delete(category)
     db.session.commit()
     
-    # Invalidate cache
-    invalidate_cache('categories')
+    # Invalidate cache (product responses embed their category)
+    invalidate_tags('categories', 'catalog')
+    remove_categories([category_id])
     
     return jsonify({
         'message': 'Category deleted successfully'
@@ -210,8 +214,8 @@ def reorder_categories():
     
     db.session.commit()
     
-    # Invalidate cache
-    invalidate_cache('categories')
+    # Invalidate cache (product responses embed their category)
+    invalidate_tags('categories', 'catalog')
     
     return jsonify({
         'message': 'Categories reordered successfully'
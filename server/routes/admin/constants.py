@@ -1,18 +1,17 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 from extensions import db
 from models.constant import Constant
-from models.user import User
+from utils.cache import invalidate_tags
+from utils.constants import bump_constants_version
+from utils.auth import check_admin
 
 admin_constants_bp = Blueprint('admin_constants', __name__)
 
 
 def _require_admin():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user or not getattr(user, 'is_admin', False):
-        return None
-    return user
+    # Claims plus the cached user-status map; no database round-trip
+    return check_admin() is None
 
 
 @admin_constants_bp.route('', methods=['GET'])
@@ -44,4 +43,6 @@ def update_constants():
         updated.append(c)
 
     db.session.commit()
+    bump_constants_version()
+    invalidate_tags('constants')
     return jsonify({'constants': {c.key: c.value for c in updated}}), 200
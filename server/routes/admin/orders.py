@@ -1,36 +1,104 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required
 from models.order import Order, OrderItem, OrderStatus, PaymentStatus
-from models.product import Product
 from models.user import User
 from extensions import db
 from utils.auth import admin_required
+from utils.cache import cached, invalidate_tags
+from utils.inventory import release_stock, record_shipment, reserve_order_stock, InsufficientStock
+from utils.rollups import record_payment_status_change, record_order_deleted
+from utils.leaderboards import update_leaderboards, order_scores, apply_scores
+from utils.pagination import paginate, keyset_paginate, resolve_sort_column, InvalidCursor
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import func, or_, select
 
 admin_orders_bp = Blueprint('admin_orders', __name__)
 
+# Most orders accepted by one bulk status request
+MAX_BULK_ORDERS = 1000
 
-@admin_orders_bp.route('', methods=['GET'])
-@jwt_required()
-@admin_required
-def get_orders():
-    """Get all orders with filtering and pagination."""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    search = request.args.get('search', '')
-    status = request.args.get('status', '')
-    payment_status = request.args.get('payment_status', '')
-    start_date = request.args.get('start_date', '')
-    end_date = request.args.get('end_date', '')
-    sort_by = request.args.get('sort_by', 'created_at')
-    sort_order = request.args.get('sort_order', 'desc')
-    
-    # Build query
-    query = Order.query
-    
-    # Apply filters
+# Statuses an order may move to, by current status; only an order an admin
+# has confirmed can ship
+ALLOWED_TRANSITIONS = {
+    OrderStatus.PENDING.value: {
+        OrderStatus.CONFIRMED.value, OrderStatus.PROCESSING.value, OrderStatus.CANCELLED.value
+    },
+    OrderStatus.CONFIRMED.value: {
+        OrderStatus.PROCESSING.value, OrderStatus.SHIPPED.value, OrderStatus.CANCELLED.value
+    },
+    OrderStatus.PROCESSING.value: {OrderStatus.SHIPPED.value, OrderStatus.CANCELLED.value},
+    OrderStatus.SHIPPED.value: {OrderStatus.DELIVERED.value, OrderStatus.REFUNDED.value},
+    OrderStatus.DELIVERED.value: {OrderStatus.REFUNDED.value},
+    OrderStatus.CANCELLED.value: set(),
+    OrderStatus.REFUNDED.value: set()
+}
+
+# Payments whose order has given its stock back and must not ship
+UNSHIPPABLE_PAYMENT_STATUSES = {PaymentStatus.FAILED.value, PaymentStatus.REFUNDED.value}
+
+
+def _transition_error(order, new_status):
+    """Why an order cannot move to new_status, or None if it can."""
+    if new_status not in ALLOWED_TRANSITIONS.get(order.status, set()):
+        return f'Cannot change status from {order.status} to {new_status}'
+    if new_status == OrderStatus.SHIPPED.value and order.payment_status in UNSHIPPABLE_PAYMENT_STATUSES:
+        return f'Cannot ship an order whose payment is {order.payment_status}'
+    return None
+
+
+def _apply_status(orders, new_status):
+    """
+    Move orders to a new status, stamping timestamps and adjusting inventory.
+
+    Stock and sales_count changes for all the orders are applied together
+    with set-based updates.
+
+    Returns:
+        list: Ids of products whose stock or sales counts changed
+    """
+    now = datetime.utcnow()
+    changed_product_ids = []
+    if new_status == OrderStatus.SHIPPED.value:
+        # Stock was reserved at checkout; shipping moves sales counts
+        changed_product_ids = record_shipment([o for o in orders if not o.shipped_at])
+    elif new_status in (OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value):
+        # Unshipped orders give their reserved stock back
+        changed_product_ids = release_stock(orders)
+
+    for order in orders:
+        if new_status == OrderStatus.CONFIRMED.value and not order.confirmed_at:
+            order.confirmed_at = now
+        elif new_status == OrderStatus.SHIPPED.value and not order.shipped_at:
+            order.shipped_at = now
+        elif new_status == OrderStatus.DELIVERED.value and not order.delivered_at:
+            order.delivered_at = now
+        order.status = new_status
+    return changed_product_ids
+
+
+def _filter_orders(query, args):
+    """
+    Apply the order list filters shared by listing and export.
+
+    Args:
+        query: Order query or select(Order)
+        args: Request args (search, status, payment_status, start_date, end_date)
+
+    Returns:
+        tuple: (filtered query, dict of the filters applied, for count_total())
+    """
+    search = args.get('search', '')
+    status = args.get('status', '')
+    payment_status = args.get('payment_status', '')
+    start_date = args.get('start_date', '')
+    end_date = args.get('end_date', '')
+    
+    filters = {}
     if search:
+        filters['search'] = search
         query = query.filter(
             or_(
                 Order.order_number.ilike(f'%{search}%'),
@@ -40,15 +108,18 @@ def get_orders():
         )
     
     if status:
+        filters['status'] = status
         query = query.filter_by(status=status)
     
     if payment_status:
+        filters['payment_status'] = payment_status
         query = query.filter_by(payment_status=payment_status)
     
     if start_date:
         try:
             start = datetime.fromisoformat(start_date)
             query = query.filter(Order.created_at >= start)
+            filters['start_date'] = start.isoformat()
         except ValueError:
             pass
     
@@ -56,26 +127,169 @@ def get_orders():
         try:
             end = datetime.fromisoformat(end_date)
             query = query.filter(Order.created_at <= end)
+            filters['end_date'] = end.isoformat()
         except ValueError:
             pass
     
-    # Apply sorting
-    if hasattr(Order, sort_by):
-        order_col = getattr(Order, sort_by)
-        query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+    return query, filters
+
+
+@admin_orders_bp.route('', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_orders():
+    """Get all orders with filtering and pagination."""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    sort_by = request.args.get('sort_by', 'created_at')
+    sort_order = request.args.get('sort_order', 'desc')
     
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Build query; eager-load what to_dict(include_user=True) serializes
+    query, filters = _filter_orders(
+        Order.query.options(*Order.loader_options(include_user=True)),
+        request.args
+    )
+    
+    if 'cursor' in request.args:
+        # Keyset pagination: seek on the sort key instead of OFFSET
+        descending = sort_order == 'desc'
+        try:
+            result = keyset_paginate(
+                query,
+                [(resolve_sort_column(Order, sort_by), descending), (Order.id, descending)],
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total') == 'true',
+                table='orders',
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        items = result.items
+        page_info = {
+            'next_cursor': result.next_cursor,
+            'prev_cursor': result.prev_cursor,
+            'total': result.total,
+            'total_estimated': result.total_estimated,
+            'per_page': result.per_page
+        }
+    else:
+        # Apply sorting
+        if hasattr(Order, sort_by):
+            order_col = getattr(Order, sort_by)
+            query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+        
+        # Paginate
+        pagination = paginate(query, page, per_page, 'orders', filters)
+        items = pagination.items
+        page_info = {
+            'total': pagination.total,
+            'total_estimated': pagination.total_estimated,
+            'pages': pagination.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
     
     return jsonify({
-        'orders': [o.to_dict(include_user=True) for o in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        'orders': [o.to_dict(include_user=True) for o in items],
+        **page_info
     }), 200
 
 
+# Order columns of the CSV export, followed by ITEM_EXPORT_COLUMNS
+ORDER_EXPORT_COLUMNS = [
+    'id', 'order_number', 'user_id', 'status', 'payment_status', 'subtotal', 'tax',
+    'shipping_cost', 'discount', 'total', 'shipping_name', 'shipping_street',
+    'shipping_city', 'shipping_state', 'shipping_postal_code', 'shipping_country',
+    'shipping_phone', 'tracking_number', 'carrier', 'created_at', 'confirmed_at',
+    'shipped_at', 'delivered_at'
+]
+ITEM_EXPORT_COLUMNS = ['product_id', 'product_sku', 'product_name', 'quantity', 'unit_price', 'total_price']
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_rows(orders):
+    """CSV lines for orders: one per item, order columns repeated."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+    
+    writer.writerow(ORDER_EXPORT_COLUMNS + [f'item_{c}' for c in ITEM_EXPORT_COLUMNS])
+    yield flush()
+    
+    for count, order in enumerate(orders, 1):
+        order_values = [_export_value(getattr(order, c)) for c in ORDER_EXPORT_COLUMNS]
+        # Orders without items still get a row
+        for item in order.items or [None]:
+            item_values = [_export_value(getattr(item, c)) if item else '' for c in ITEM_EXPORT_COLUMNS]
+            writer.writerow(order_values + item_values)
+        if count % 100 == 0:
+            yield flush()
+    yield flush()
+
+
+def _ndjson_rows(orders):
+    """One JSON document per order, items included."""
+    lines = []
+    for order in orders:
+        lines.append(json.dumps(order.to_dict()) + '\n')
+        if len(lines) == 100:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+@admin_orders_bp.route('/export', methods=['GET'])
+@jwt_required()
+@admin_required
+def export_orders():
+    """
+    Stream all orders matching the list filters as CSV or NDJSON.
+    Accepts the get_orders filters plus format=csv|ndjson; rows come in id order.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    # yield_per streams from a server-side cursor; items arrive per batch
+    # with one SELECT ... IN, so memory stays flat however many orders match
+    stmt, _ = _filter_orders(select(Order).options(*Order.loader_options()), request.args)
+    stmt = stmt.order_by(Order.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    
+    def orders():
+        yield from db.session.scalars(stmt)
+    
+    if export_format == 'csv':
+        rows, mimetype = _csv_rows(orders()), 'text/csv'
+    else:
+        rows, mimetype = _ndjson_rows(orders()), 'application/x-ndjson'
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+    
+    return Response(
+        stream_with_context(rows),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 @admin_orders_bp.route('/<int:order_id>', methods=['GET'])
 @jwt_required()
 @admin_required
@@ -96,7 +310,7 @@ def get_order(order_id):
 @admin_required
 def update_order_status(order_id):
     """Update order status."""
-    order = Order.query.get(order_id)
+    order = Order.query.filter_by(id=order_id).with_for_update().first()
     
     if not order:
         return jsonify({'error': 'Order not found'}), 404
@@ -112,33 +326,19 @@ def update_order_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
     
-    # Update timestamps based on status and adjust inventory on shipment
-    if new_status == OrderStatus.CONFIRMED.value and not order.confirmed_at:
-        order.confirmed_at = datetime.utcnow()
-    elif new_status == OrderStatus.SHIPPED.value and not order.shipped_at:
-        order.shipped_at = datetime.utcnow()
-        # Reduce stock for each order item when order is shipped
-        for item in order.items:
-            product = Product.query.get(item.product_id)
-            if not product:
-                continue
-            if not product.track_inventory:
-                continue
-            try:
-                qty = int(item.quantity or 0)
-            except Exception:
-                qty = 0
-            if product.stock_quantity is None:
-                product.stock_quantity = 0
-            product.stock_quantity = max(product.stock_quantity - qty, 0)
-            # increment sales count
-            product.sales_count = (product.sales_count or 0) + qty
-            db.session.add(product)
-    elif new_status == OrderStatus.DELIVERED.value and not order.delivered_at:
-        order.delivered_at = datetime.utcnow()
-    
-    order.status = new_status
+    changed_product_ids = []
+    if order.status != new_status:
+        # Same transition rules as the bulk endpoint
+        error = _transition_error(order, new_status)
+        if error:
+            db.session.rollback()
+            return jsonify({'error': error}), 400
+        changed_product_ids = _apply_status([order], new_status)
     db.session.commit()
+    invalidate_tags('orders')
+    if changed_product_ids:
+        # Stock and sales counts appear in the cached catalog
+        invalidate_tags('catalog', *[f'product:{pid}' for pid in changed_product_ids])
     
     return jsonify({
         'message': 'Order status updated successfully',
@@ -146,12 +346,85 @@ def update_order_status(order_id):
     }), 200
 
 
+@admin_orders_bp.route('/bulk/status', methods=['POST'])
+@jwt_required()
+@admin_required
+def bulk_update_order_status():
+    """
+    Move a batch of orders to one status in a single transaction.
+    Expects: { order_ids: [...], status }
+    Returns: { updated, results } - one result per requested order id
+    """
+    data = request.get_json() or {}
+    new_status = data.get('status')
+    order_ids = data.get('order_ids')
+    
+    if not new_status:
+        return jsonify({'error': 'Status is required'}), 400
+    
+    valid_statuses = [s.value for s in OrderStatus]
+    if new_status not in valid_statuses:
+        return jsonify({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}), 400
+    
+    if not isinstance(order_ids, list) or not order_ids:
+        return jsonify({'error': 'order_ids must be a non-empty list'}), 400
+    
+    try:
+        order_ids = list(dict.fromkeys(int(i) for i in order_ids))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'order_ids must be integers'}), 400
+    
+    if len(order_ids) > MAX_BULK_ORDERS:
+        return jsonify({'error': f'At most {MAX_BULK_ORDERS} orders per request'}), 400
+    
+    # Lock the batch in id order so overlapping batches cannot double-apply
+    orders = {
+        o.id: o for o in Order.query
+        .filter(Order.id.in_(order_ids))
+        .order_by(Order.id)
+        .with_for_update()
+        .all()
+    }
+    
+    results = []
+    to_update = []
+    for order_id in order_ids:
+        order = orders.get(order_id)
+        if not order:
+            results.append({'id': order_id, 'result': 'error', 'error': 'Order not found'})
+            continue
+        result = {'id': order_id, 'order_number': order.order_number, 'previous_status': order.status}
+        error = _transition_error(order, new_status) if order.status != new_status else None
+        if order.status == new_status:
+            result['result'] = 'unchanged'
+        elif error:
+            result.update(result='error', error=error)
+        else:
+            result['result'] = 'updated'
+            to_update.append(order)
+        results.append(result)
+    
+    changed_product_ids = _apply_status(to_update, new_status) if to_update else []
+    db.session.commit()
+    if to_update:
+        invalidate_tags('orders')
+    if changed_product_ids:
+        invalidate_tags('catalog', *[f'product:{pid}' for pid in changed_product_ids])
+    
+    return jsonify({
+        'status': new_status,
+        'updated': len(to_update),
+        'results': results
+    }), 200
+
+
 @admin_orders_bp.route('/<int:order_id>/payment-status', methods=['PUT'])
 @jwt_required()
 @admin_required
 def update_payment_status(order_id):
     """Update order payment status."""
-    order = Order.query.get(order_id)
+    # Lock the order so concurrent updates cannot release or reserve twice
+    order = Order.query.filter_by(id=order_id).with_for_update().first()
     
     if not order:
         return jsonify({'error': 'Order not found'}), 404
@@ -167,8 +440,28 @@ def update_payment_status(order_id):
     if new_status not in valid_statuses:
         return jsonify({'error': f'Invalid payment status. Must be one of: {", ".join(valid_statuses)}'}), 400
     
+    # Failed or refunded payments on unshipped orders give the stock back;
+    # marking such an order paid again takes it back before it can ship
+    changed_product_ids = []
+    try:
+        if new_status in (PaymentStatus.FAILED.value, PaymentStatus.REFUNDED.value):
+            changed_product_ids = release_stock([order])
+        elif new_status == PaymentStatus.PAID.value and order.status not in (
+            OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value
+        ):
+            changed_product_ids = reserve_order_stock([order])
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'shortages': e.shortages}), 409
+    
+    old_status = order.payment_status
     order.payment_status = new_status
+    record_payment_status_change(order, old_status)
     db.session.commit()
+    invalidate_tags('orders')
+    update_leaderboards(order, old_status)
+    if changed_product_ids:
+        invalidate_tags('catalog', *[f'product:{pid}' for pid in changed_product_ids])
     
     return jsonify({
         'message': 'Payment status updated successfully',
@@ -200,6 +493,7 @@ def update_shipping_info(order_id):
             pass
     
     db.session.commit()
+    invalidate_tags('orders')
     
     return jsonify({
         'message': 'Shipping information updated successfully',
@@ -223,6 +517,7 @@ def update_order_notes(order_id):
         order.admin_notes = data['admin_notes']
     
     db.session.commit()
+    invalidate_tags('orders')
     
     return jsonify({
         'message': 'Order notes updated successfully',
@@ -246,8 +541,17 @@ def delete_order(order_id):
             'error': 'Only cancelled or pending orders can be deleted'
         }), 400
     
+    changed_product_ids = release_stock([order])
+    record_order_deleted(order)
+    # Paid orders leave the leaderboards once the delete is committed
+    paid_scores = order_scores(order) if order.payment_status == PaymentStatus.PAID.value else None
     db.session.delete(order)
     db.session.commit()
+    invalidate_tags('orders')
+    if paid_scores:
+        apply_scores(paid_scores, -1)
+    if changed_product_ids:
+        invalidate_tags('catalog', *[f'product:{pid}' for pid in changed_product_ids])
     
     return jsonify({
         'message': 'Order deleted successfully'
@@ -257,37 +561,40 @@ def delete_order(order_id):
 @admin_orders_bp.route('/stats', methods=['GET'])
 @jwt_required()
 @admin_required
+@cached('order_stats', ttl=60, tags=['orders'], personalized=False)
 def get_order_stats():
     """Get order statistics."""
-    # Count orders by status
-    stats = {
-        'total_orders': Order.query.count(),
-        'by_status': {},
-        'by_payment_status': {}
-    }
+    # One pass over orders: counts and money per (status, payment_status)
+    rows = db.session.query(
+        Order.status,
+        Order.payment_status,
+        func.count(Order.id),
+        func.sum(Order.total),
+        func.sum(Order.subtotal),
+        func.sum(Order.tax),
+        func.sum(Order.shipping_cost)
+    ).group_by(Order.status, Order.payment_status).all()
     
-    for status in OrderStatus:
-        count = Order.query.filter_by(status=status.value).count()
-        stats['by_status'][status.value] = count
-    
-    for payment_status in PaymentStatus:
-        count = Order.query.filter_by(payment_status=payment_status.value).count()
-        stats['by_payment_status'][payment_status.value] = count
-    
-    # Calculate revenue
-    from sqlalchemy import func
-    revenue_data = db.session.query(
-        func.sum(Order.total).label('total_revenue'),
-        func.sum(Order.subtotal).label('total_subtotal'),
-        func.sum(Order.tax).label('total_tax'),
-        func.sum(Order.shipping_cost).label('total_shipping')
-    ).filter(Order.payment_status == PaymentStatus.PAID.value).first()
-    
-    stats['revenue'] = {
-        'total': float(revenue_data.total_revenue or 0),
-        'subtotal': float(revenue_data.total_subtotal or 0),
-        'tax': float(revenue_data.total_tax or 0),
-        'shipping': float(revenue_data.total_shipping or 0)
+    stats = {
+        'total_orders': 0,
+        'by_status': {s.value: 0 for s in OrderStatus},
+        'by_payment_status': {s.value: 0 for s in PaymentStatus}
     }
+    revenue = {'total': 0, 'subtotal': 0, 'tax': 0, 'shipping': 0}
+    
+    for status, payment_status, count, total, subtotal, tax, shipping in rows:
+        stats['total_orders'] += count
+        if status in stats['by_status']:
+            stats['by_status'][status] += count
+        if payment_status in stats['by_payment_status']:
+            stats['by_payment_status'][payment_status] += count
+        # Revenue counts paid orders only
+        if payment_status == PaymentStatus.PAID.value:
+            revenue['total'] += total or 0
+            revenue['subtotal'] += subtotal or 0
+            revenue['tax'] += tax or 0
+            revenue['shipping'] += shipping or 0
+    
+    stats['revenue'] = {key: float(value) for key, value in revenue.items()}
     
     return jsonify(stats), 200
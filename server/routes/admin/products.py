@@ -5,8 +5,11 @@ from models.category import Category
 from extensions import db
 from utils.auth import admin_required
 from utils.helpers import save_image, delete_image, generate_slug
-from utils.cache import invalidate_cache
-from sqlalchemy import or_
+from utils.cache import invalidate_tags
+from utils.search import apply_search, index_products, unindex_products
+from utils.suggest import sync_products, remove_products
+from utils.ratings import serialize_products
+from utils.pagination import paginate, keyset_paginate, resolve_sort_column, InvalidCursor
 
 admin_products_bp = Blueprint('admin_products', __name__)
 
@@ -28,43 +31,71 @@ def get_products():
     # Build query
     query = Product.query
     
-    # Apply filters
+    # Apply filters, remembering them for the count cache
+    filters = {}
+    rank = None
     if search:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f'%{search}%'),
-                Product.sku.ilike(f'%{search}%'),
-                Product.description.ilike(f'%{search}%')
-            )
-        )
+        filters['search'] = search
+        query, rank = apply_search(query, search)
     
     if category_id:
+        filters['category_id'] = category_id
         query = query.filter_by(category_id=category_id)
     
-    if is_active == 'true':
-        query = query.filter_by(is_active=True)
-    elif is_active == 'false':
-        query = query.filter_by(is_active=False)
-    
-    if is_featured == 'true':
-        query = query.filter_by(is_featured=True)
-    elif is_featured == 'false':
-        query = query.filter_by(is_featured=False)
-    
-    # Apply sorting
-    if hasattr(Product, sort_by):
-        order_col = getattr(Product, sort_by)
-        query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
-    
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if is_active in ('true', 'false'):
+        filters['is_active'] = is_active == 'true'
+        query = query.filter_by(is_active=filters['is_active'])
+    
+    if is_featured in ('true', 'false'):
+        filters['is_featured'] = is_featured == 'true'
+        query = query.filter_by(is_featured=filters['is_featured'])
+    
+    if 'cursor' in request.args:
+        # Keyset pagination: seek on the sort key instead of OFFSET
+        descending = sort_order == 'desc'
+        try:
+            result = keyset_paginate(
+                query,
+                [(resolve_sort_column(Product, sort_by), descending), (Product.id, descending)],
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total') == 'true',
+                table='products',
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        items = result.items
+        page_info = {
+            'next_cursor': result.next_cursor,
+            'prev_cursor': result.prev_cursor,
+            'total': result.total,
+            'total_estimated': result.total_estimated,
+            'per_page': result.per_page
+        }
+    else:
+        # Apply sorting
+        if rank is not None and ('sort_by' not in request.args or sort_by == 'relevance'):
+            # Best matches first when searching, unless the caller asked for a specific order
+            query = query.order_by(rank, Product.id.desc())
+        elif hasattr(Product, sort_by):
+            order_col = getattr(Product, sort_by)
+            query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+        
+        # Paginate
+        pagination = paginate(query, page, per_page, 'products', filters)
+        items = pagination.items
+        page_info = {
+            'total': pagination.total,
+            'total_estimated': pagination.total_estimated,
+            'pages': pagination.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
     
     return jsonify({
-        'products': [p.to_dict() for p in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        'products': serialize_products(items),
+        **page_info
     }), 200
 
 
@@ -146,10 +177,13 @@ def create_product():
     )
     
     db.session.add(product)
+    db.session.flush()  # ensure product.id is available for the search index
+    index_products([product])
     db.session.commit()
     
-    # Invalidate cache
-    invalidate_cache('products')
+    # Invalidate cache (a new product also changes its category's product_count)
+    invalidate_tags('catalog', 'products', 'categories', f'product:{product.id}')
+    sync_products([product])
     
     return jsonify({
         'message': 'Product created successfully',
@@ -168,6 +202,7 @@ def update_product(product_id):
         return jsonify({'error': 'Product not found'}), 404
     
     data = request.form.to_dict()
+    old_category_id = product.category_id
     
     # Update slug if name changed
     if 'name' in data and data['name'] != product.name:
@@ -242,10 +277,15 @@ def update_product(product_id):
     if 'is_featured' in data:
         product.is_featured = data['is_featured'].lower() == 'true'
     
+    index_products([product])
     db.session.commit()
     
     # Invalidate cache
-    invalidate_cache('products')
+    tags = ['catalog', 'products', f'product:{product_id}']
+    if product.category_id != old_category_id:
+        tags.append('categories')
+    invalidate_tags(*tags)
+    sync_products([product])
     
     return jsonify({
         'message': 'Product updated successfully',
@@ -270,11 +310,13 @@ def delete_product(product_id):
         for img in product.images:
             delete_image(img)
     
+    unindex_products([product_id])
     db.session.delete(product)
     db.session.commit()
     
     # Invalidate cache
-    invalidate_cache('products')
+    invalidate_tags('catalog', 'products', 'categories', f'product:{product_id}')
+    remove_products([product_id])
     
     return jsonify({
         'message': 'Product deleted successfully'
@@ -303,10 +345,13 @@ def bulk_delete_products():
                 delete_image(img)
         db.session.delete(product)
     
+    deleted_ids = [p.id for p in products]
+    unindex_products(deleted_ids)
     db.session.commit()
     
     # Invalidate cache
-    invalidate_cache('products')
+    invalidate_tags('catalog', 'products', 'categories', *[f'product:{pid}' for pid in deleted_ids])
+    remove_products(deleted_ids)
     
     return jsonify({
         'message': f'{len(products)} products deleted successfully'
@@ -335,10 +380,15 @@ def bulk_update_products():
             if hasattr(product, key):
                 setattr(product, key, value)
     
+    index_products(products)
     db.session.commit()
     
     # Invalidate cache
-    invalidate_cache('products')
+    tags = ['catalog', 'products', *[f'product:{p.id}' for p in products]]
+    if 'category_id' in updates:
+        tags.append('categories')
+    invalidate_tags(*tags)
+    sync_products(products)
     
     return jsonify({
         'message': f'{len(products)} products updated successfully'
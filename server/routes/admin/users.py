@@ -3,8 +3,11 @@ from flask_jwt_extended import jwt_required
 from models.user import User
 from models.order import Order
 from extensions import db
-from utils.auth import admin_required
-from sqlalchemy import or_
+from utils.auth import admin_required, refresh_user_status, forget_user_status
+from utils.cache import cached, invalidate_tags
+from utils.rollups import record_user_deleted
+from utils.pagination import paginate, keyset_paginate, resolve_sort_column, InvalidCursor
+from sqlalchemy import func, or_
 
 admin_users_bp = Blueprint('admin_users', __name__)
 
@@ -25,8 +28,10 @@ def get_users():
     # Build query
     query = User.query
     
-    # Apply filters
+    # Apply filters, remembering them for the count cache
+    filters = {}
     if search:
+        filters['search'] = search
         query = query.filter(
             or_(
                 User.email.ilike(f'%{search}%'),
@@ -36,37 +41,64 @@ def get_users():
             )
         )
     
-    if is_admin == 'true':
-        query = query.filter_by(is_admin=True)
-    elif is_admin == 'false':
-        query = query.filter_by(is_admin=False)
+    if is_admin in ('true', 'false'):
+        filters['is_admin'] = is_admin == 'true'
+        query = query.filter_by(is_admin=filters['is_admin'])
     
-    if is_active == 'true':
-        query = query.filter_by(is_active=True)
-    elif is_active == 'false':
-        query = query.filter_by(is_active=False)
+    if is_active in ('true', 'false'):
+        filters['is_active'] = is_active == 'true'
+        query = query.filter_by(is_active=filters['is_active'])
     
-    # Apply sorting
-    if hasattr(User, sort_by):
-        order_col = getattr(User, sort_by)
-        query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
-    
-    # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if 'cursor' in request.args:
+        # Keyset pagination: seek on the sort key instead of OFFSET
+        descending = sort_order == 'desc'
+        try:
+            result = keyset_paginate(
+                query,
+                [(resolve_sort_column(User, sort_by), descending), (User.id, descending)],
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total') == 'true',
+                table='users',
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        items = result.items
+        page_info = {
+            'next_cursor': result.next_cursor,
+            'prev_cursor': result.prev_cursor,
+            'total': result.total,
+            'total_estimated': result.total_estimated,
+            'per_page': result.per_page
+        }
+    else:
+        # Apply sorting
+        if hasattr(User, sort_by):
+            order_col = getattr(User, sort_by)
+            query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+        
+        # Paginate
+        pagination = paginate(query, page, per_page, 'users', filters)
+        items = pagination.items
+        page_info = {
+            'total': pagination.total,
+            'total_estimated': pagination.total_estimated,
+            'pages': pagination.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
     
     # Add order count for each user
     users_data = []
-    for user in pagination.items:
+    for user in items:
         user_dict = user.to_dict()
         user_dict['order_count'] = user.orders.count()
         users_data.append(user_dict)
     
     return jsonify({
         'users': users_data,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        **page_info
     }), 200
 
 
@@ -136,6 +168,8 @@ def update_user(user_id):
         user.set_password(data['password'])
     
     db.session.commit()
+    invalidate_tags('users')
+    refresh_user_status(user)
     
     return jsonify({
         'message': 'User updated successfully',
@@ -155,6 +189,8 @@ def toggle_admin(user_id):
     
     user.is_admin = not user.is_admin
     db.session.commit()
+    invalidate_tags('users')
+    refresh_user_status(user)
     
     return jsonify({
         'message': f'User {"promoted to" if user.is_admin else "demoted from"} admin',
@@ -174,6 +210,8 @@ def toggle_active(user_id):
     
     user.is_active = not user.is_active
     db.session.commit()
+    invalidate_tags('users')
+    refresh_user_status(user)
     
     return jsonify({
         'message': f'User {"activated" if user.is_active else "deactivated"}',
@@ -197,8 +235,11 @@ def delete_user(user_id):
             'error': f'Cannot delete user with {user.orders.count()} orders. Deactivate instead.'
         }), 400
     
+    record_user_deleted(user)
     db.session.delete(user)
     db.session.commit()
+    invalidate_tags('users')
+    forget_user_status(user_id)
     
     return jsonify({
         'message': 'User deleted successfully'
@@ -208,14 +249,26 @@ def delete_user(user_id):
 @admin_users_bp.route('/stats', methods=['GET'])
 @jwt_required()
 @admin_required
+@cached('user_stats', ttl=60, tags=['users'], personalized=False)
 def get_user_stats():
     """Get user statistics."""
+    # One pass over users, grouped by the two flags
+    rows = db.session.query(
+        User.is_active, User.is_admin, func.count(User.id)
+    ).group_by(User.is_active, User.is_admin).all()
+    
     stats = {
-        'total_users': User.query.count(),
-        'active_users': User.query.filter_by(is_active=True).count(),
-        'inactive_users': User.query.filter_by(is_active=False).count(),
-        'admin_users': User.query.filter_by(is_admin=True).count(),
-        'regular_users': User.query.filter_by(is_admin=False).count()
+        'total_users': 0,
+        'active_users': 0,
+        'inactive_users': 0,
+        'admin_users': 0,
+        'regular_users': 0
     }
+    for is_active, is_admin, count in rows:
+        stats['total_users'] += count
+        if is_active is not None:
+            stats['active_users' if is_active else 'inactive_users'] += count
+        if is_admin is not None:
+            stats['admin_users' if is_admin else 'regular_users'] += count
     
     return jsonify(stats), 200
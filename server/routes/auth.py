@@ -1,7 +1,13 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt, decode_token
 from models.user import User
 from extensions import db
+from utils.cache import invalidate_tags
+from utils.auth import user_claims, get_user_status, refresh_user_status
+from utils.token_blocklist import revoke_token
+from utils.passwords import PasswordHasherBusy
+from utils.rate_limit import rate_limited
+from utils.rollups import record_signup
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -20,6 +26,7 @@ def log_auth_header():
 
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limited
 def register():
     """Register a new user."""
     data = request.get_json()
@@ -48,10 +55,14 @@ def register():
     user.set_password(data['password'])
     
     db.session.add(user)
+    record_signup(user)
     db.session.commit()
+    invalidate_tags('users')
+    # Replaces any 'no such user' entry cached for this id
+    refresh_user_status(user)
     
     # Create tokens
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_access_token(identity=str(user.id), additional_claims=user_claims(user))
     refresh_token = create_refresh_token(identity=str(user.id))
     
     return jsonify({
@@ -63,6 +74,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limited
 def login():
     """Login user."""
     data = request.get_json()
@@ -80,8 +92,18 @@ def login():
     if not user.is_active:
         return jsonify({'error': 'Account is inactive'}), 403
     
+    # Upgrade hashes made with older parameters while we have the plaintext
+    if user.password_needs_rehash():
+        try:
+            user.set_password(data['password'])
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass  # try again on a later login
+    
+    refresh_user_status(user)
+    
     # Create tokens
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_access_token(identity=str(user.id), additional_claims=user_claims(user))
     refresh_token = create_refresh_token(identity=str(user.id))
     
     return jsonify({
@@ -97,7 +119,16 @@ def login():
 def refresh():
     """Refresh access token."""
     user_id = get_jwt_identity()
-    access_token = create_access_token(identity=user_id)
+    status = get_user_status(user_id)
+    
+    if not status:
+        return jsonify({'error': 'User not found'}), 404
+    
+    if not status['is_active']:
+        return jsonify({'error': 'Account is inactive'}), 403
+    
+    # Re-stamp the claims so flag changes reach the new token
+    access_token = create_access_token(identity=user_id, additional_claims=status)
     
     return jsonify({
         'access_token': access_token
@@ -130,8 +161,20 @@ def get_current_user():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    """Logout user (client should remove tokens)."""
-    # In a more advanced implementation, you could blacklist the token
+    """Logout user by revoking the access token and, if sent, the refresh token."""
+    claims = get_jwt()
+    revoke_token(claims['jti'], claims['exp'])
+    
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_claims = decode_token(data['refresh_token'])
+            # Only let users revoke their own tokens
+            if refresh_claims.get('sub') == claims.get('sub'):
+                revoke_token(refresh_claims['jti'], refresh_claims['exp'])
+        except Exception as e:
+            print(f"Logout refresh token error: {e}")
+    
     return jsonify({
         'message': 'Logout successful'
     }), 200
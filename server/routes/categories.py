@@ -1,10 +1,13 @@
 from flask import Blueprint, request, jsonify
 from models.category import Category
+from utils.cache import cached
+from utils.pagination import paginate, keyset_paginate, InvalidCursor
 
 categories_bp = Blueprint('categories', __name__)
 
 
 @categories_bp.route('', methods=['GET'])
+@cached('categories', ttl=300, tags=['categories'], personalized=False)
 def get_categories():
     """Public endpoint: Get categories with optional filtering and pagination."""
     page = request.args.get('page', 1, type=int)
@@ -14,25 +17,55 @@ def get_categories():
 
     query = Category.query
 
+    # Filters applied, for the count cache
+    filters = {}
     if search:
+        filters['search'] = search
         query = query.filter(Category.name.ilike(f'%{search}%'))
 
-    if is_active == 'true':
-        query = query.filter_by(is_active=True)
-    elif is_active == 'false':
-        query = query.filter_by(is_active=False)
+    if is_active in ('true', 'false'):
+        filters['is_active'] = is_active == 'true'
+        query = query.filter_by(is_active=filters['is_active'])
 
-    # Order by display_order then name
-    query = query.order_by(Category.display_order.asc(), Category.name.asc())
+    if 'cursor' in request.args:
+        # Keyset pagination on (display_order, name, id)
+        try:
+            result = keyset_paginate(
+                query,
+                [(Category.display_order, False), (Category.name, False), (Category.id, False)],
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total') == 'true',
+                table='categories',
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        items = result.items
+        page_info = {
+            'next_cursor': result.next_cursor,
+            'prev_cursor': result.prev_cursor,
+            'total': result.total,
+            'total_estimated': result.total_estimated,
+            'per_page': result.per_page
+        }
+    else:
+        # Order by display_order then name
+        query = query.order_by(Category.display_order.asc(), Category.name.asc())
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        pagination = paginate(query, page, per_page, 'categories', filters)
+        items = pagination.items
+        page_info = {
+            'total': pagination.total,
+            'total_estimated': pagination.total_estimated,
+            'pages': pagination.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
 
     return jsonify({
-        'categories': [c.to_dict() for c in pagination.items],
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        'categories': [c.to_dict() for c in items],
+        **page_info
     }), 200
 
 
@@ -1,12 +1,12 @@
 from flask import Blueprint, jsonify
-from models.constant import Constant
+from utils.constants import get_constants_snapshot
+from utils.cache import cached
 
 constants_bp = Blueprint('constants', __name__)
 
 
 @constants_bp.route('', methods=['GET'])
+@cached('constants', ttl=600, tags=['constants'], personalized=False)
 def get_constants():
     """Public endpoint to fetch all constants as key => value map."""
-    consts = Constant.query.all()
-    data = {c.key: c.value for c in consts}
-    return jsonify({'constants': data}), 200
+    return jsonify({'constants': get_constants_snapshot().raw}), 200
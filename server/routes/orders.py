@@ -1,11 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
-from models.order import Order, OrderItem, OrderStatus, PaymentStatus
+from models.order import Order, OrderStatus, PaymentStatus
 from models.product import Product
-from models.user import User
 from datetime import datetime
-from decimal import Decimal
+from utils.cache import invalidate_tags
+from utils.auth import get_user_status
+from utils.pricing import price_cart, insert_order_items, PricingError
+from utils.order_numbers import next_order_number
+from utils.inventory import reserve_stock, InsufficientStock
+from utils.rollups import record_order_created
+from utils.leaderboards import update_leaderboards
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -15,33 +20,35 @@ orders_bp = Blueprint('orders', __name__)
 def create_order():
     """Create a new order for the current authenticated user."""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    if not get_user_status(user_id):
         return jsonify({'error': 'User not found'}), 404
 
     data = request.get_json() or {}
 
-    items = data.get('items', [])
-    subtotal = Decimal(str(data.get('subtotal', 0)))
-    tax = Decimal(str(data.get('tax', 0)))
-    shipping_cost = Decimal(str(data.get('shipping_cost', 0)))
-    discount = Decimal(str(data.get('discount', 0)))
-    total = Decimal(str(data.get('total', subtotal + tax + shipping_cost - discount)))
+    # Price the cart from the catalog (client-sent prices and totals are
+    # ignored) and reserve its stock, all in this transaction
+    try:
+        priced = price_cart(data.get('items', []), lock=True)
+        reserve_stock(priced.quantities(), priced.products)
+    except PricingError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'shortages': e.shortages}), 409
 
     # Shipping fields
     shipping = data.get('shipping_address', {})
 
     order = Order(
-        order_number=f"ORD-{int(datetime.utcnow().timestamp())}",
-        user_id=user.id,
-        # allow client to provide status/payment_status (e.g., for card payments)
-        status=data.get('status', OrderStatus.PENDING.value),
-        payment_status=data.get('payment_status', PaymentStatus.PENDING.value),
-        subtotal=subtotal,
-        tax=tax,
-        shipping_cost=shipping_cost,
-        discount=discount,
-        total=total,
+        order_number=next_order_number(),
+        user_id=int(user_id),
+        # New orders always start unpaid; only payment capture or an admin
+        # moves them on, so clients cannot record revenue themselves
+        status=OrderStatus.PENDING.value,
+        payment_status=PaymentStatus.PENDING.value,
+        **priced.order_fields(),
+        inventory_reserved=True,
         shipping_name=shipping.get('fullName') or shipping.get('name'),
         shipping_street=shipping.get('address') or shipping.get('street'),
         shipping_city=shipping.get('city'),
@@ -55,27 +62,15 @@ def create_order():
     db.session.add(order)
     db.session.flush()  # ensure order.id is available
 
-    # Add items
-    for it in items:
-        # Expect item to contain product_id, name, image, quantity, unit_price
-        unit_price = Decimal(str(it.get('unit_price') or it.get('price') or 0))
-        quantity = int(it.get('quantity', 1))
-        total_price = unit_price * quantity
-
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=it.get('product_id') or it.get('id'),
-            product_name=it.get('name'),
-            product_sku=it.get('sku'),
-            product_image=it.get('image'),
-            quantity=quantity,
-            unit_price=unit_price,
-            total_price=total_price
-        )
-
-        db.session.add(order_item)
-
+    insert_order_items(order, priced)
+    record_order_created(order)
     db.session.commit()
+    invalidate_tags('orders')
+    update_leaderboards(order, None)
+    # Refresh the bought products' pages. Listings are not dropped on every
+    # checkout; they show the new stock once their entry expires, and their
+    # body-derived ETag changes with it
+    invalidate_tags(*[f'product:{pid}' for pid in priced.quantities()])
 
     return jsonify({'order': order.to_dict()}), 201
 
@@ -84,5 +79,11 @@ def create_order():
 @jwt_required()
 def get_my_orders():
     user_id = get_jwt_identity()
-    orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+    orders = (
+        Order.query
+        .options(*Order.loader_options())
+        .filter_by(user_id=user_id)
+        .order_by(Order.created_at.desc())
+        .all()
+    )
     return jsonify({'orders': [o.to_dict() for o in orders]}), 200
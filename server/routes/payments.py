@@ -7,20 +7,30 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 import paypalrestsdk
 from config import Config
 from extensions import db
-from models.order import Order, OrderItem, PaymentStatus, OrderStatus
+from models.order import Order, PaymentStatus, OrderStatus
 from models.user import User
 from decimal import Decimal
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from utils.cache import invalidate_tags
+from utils.auth import get_user_status
+from utils.rate_limit import rate_limited
+from utils.pricing import price_cart, insert_order_items, PricingError
+from utils.inventory import reserve_stock, release_stock, InsufficientStock
+from utils.rollups import record_order_created, record_order_deleted, record_payment_status_change
+from utils.leaderboards import update_leaderboards
+from utils.order_numbers import next_order_number
 
 payments_bp = Blueprint('payments', __name__)
 
 
 @payments_bp.route('/paypal/create-order', methods=['POST'])
 @jwt_required()
+@rate_limited
 def create_paypal_order():
     """
     Create a PayPal order for the checkout.
-    Expects: { items, subtotal, tax, shipping_cost, discount, total, shipping_address }
+    Expects: { items, shipping_address }; amounts are priced server-side
     Returns: { order_id } - PayPal order ID for client approval
     """
     user_id = get_jwt_identity()
@@ -30,24 +40,23 @@ def create_paypal_order():
 
     data = request.get_json() or {}
     
-    items = data.get('items', [])
-    total = float(data.get('total', 0))
-    subtotal = float(data.get('subtotal', 0))
-    tax = float(data.get('tax', 0))
-    shipping_cost = float(data.get('shipping_cost', 0))
+    try:
+        priced = price_cart(data.get('items', []))
+    except PricingError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if not items or total <= 0:
+    if priced.total <= 0:
         return jsonify({'error': 'Invalid order data'}), 400
 
     # Build PayPal items array
     paypal_items = []
-    for item in items:
+    for line in priced.lines:
         paypal_items.append({
-            "name": item.get('name', 'Product'),
-            "sku": str(item.get('id', '')),
-            "price": str(round(item.get('unit_price', 0), 2)),
+            "name": line['product_name'],
+            "sku": str(line['product_id']),
+            "price": str(line['unit_price']),
             "currency": "USD",
-            "quantity": item.get('quantity', 1)
+            "quantity": line['quantity']
         })
 
     # Create PayPal payment
@@ -65,12 +74,12 @@ def create_paypal_order():
                 "items": paypal_items
             },
             "amount": {
-                "total": str(round(total, 2)),
+                "total": str(priced.total),
                 "currency": "USD",
                 "details": {
-                    "subtotal": str(round(subtotal, 2)),
-                    "tax": str(round(tax, 2)),
-                    "shipping": str(round(shipping_cost, 2))
+                    "subtotal": str(priced.subtotal),
+                    "tax": str(priced.tax),
+                    "shipping": str(priced.shipping_cost)
                 }
             },
             "description": f"Order for {user.email}"
@@ -99,11 +108,11 @@ def capture_paypal_order():
     """
     Execute PayPal payment after user approval and create order in database.
     Expects: { payment_id, payer_id, order_data }
-    Returns: { order } - Created order object
+    Returns: { order } - Created order object; resubmitting a captured
+    payment_id returns its order again
     """
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
+    if not get_user_status(user_id):
         return jsonify({'error': 'User not found'}), 404
 
     data = request.get_json() or {}
@@ -114,63 +123,100 @@ def capture_paypal_order():
     if not payment_id or not payer_id:
         return jsonify({'error': 'Missing payment_id or payer_id'}), 400
 
-    # Execute the payment
+    # One order per payment: a repeated capture never charges or reserves twice
+    existing = Order.query.filter_by(payment_id=payment_id).first()
+    if existing:
+        if existing.user_id == int(user_id) and existing.payment_status == PaymentStatus.PAID.value:
+            return jsonify({
+                'order': existing.to_dict(),
+                'payment_id': payment_id,
+                'status': 'success'
+            }), 200
+        return jsonify({'error': 'Payment is already being captured'}), 409
+
+    items = order_data.get('items', [])
+    try:
+        priced = price_cart(items)
+    except PricingError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Look the payment up before taking any row locks: other checkouts of
+    # these products must not wait on a PayPal round trip
     payment = paypalrestsdk.Payment.find(payment_id)
     
-    if payment.execute({"payer_id": payer_id}):
-        # Payment successful - create order in database
-        items = order_data.get('items', [])
-        subtotal = Decimal(str(order_data.get('subtotal', 0)))
-        tax = Decimal(str(order_data.get('tax', 0)))
-        shipping_cost = Decimal(str(order_data.get('shipping_cost', 0)))
-        discount = Decimal(str(order_data.get('discount', 0)))
-        total = Decimal(str(order_data.get('total', 0)))
-        
-        shipping = order_data.get('shipping_address', {})
-
-        order = Order(
-            order_number=f"ORD-{int(datetime.utcnow().timestamp())}",
-            user_id=user.id,
-            subtotal=subtotal,
-            tax=tax,
-            shipping_cost=shipping_cost,
-            discount=discount,
-            total=total,
-            status=OrderStatus.CONFIRMED.value,
-            payment_status=PaymentStatus.PAID.value,
-            shipping_name=shipping.get('fullName') or shipping.get('name'),
-            shipping_street=shipping.get('address') or shipping.get('street'),
-            shipping_city=shipping.get('city'),
-            shipping_state=shipping.get('state'),
-            shipping_postal_code=shipping.get('zipCode') or shipping.get('postal_code'),
-            shipping_country=shipping.get('country', 'US'),
-            shipping_phone=shipping.get('phone'),
-            customer_notes=order_data.get('customer_notes'),
-            confirmed_at=datetime.utcnow()
-        )
-
-        db.session.add(order)
+    # The approved amount must match what the cart costs now
+    approved_total = Decimal(str(payment.transactions[0].amount.total))
+    if approved_total != priced.total:
+        return jsonify({'error': 'Payment amount does not match order total'}), 409
+    
+    # Lock, re-price and reserve stock before charging, so a paid order can
+    # never be oversold; the locks are held only until the commit below
+    try:
+        priced = price_cart(items, lock=True)
+        if priced.total != approved_total:
+            db.session.rollback()
+            return jsonify({'error': 'Payment amount does not match order total'}), 409
+        reserve_stock(priced.quantities(), priced.products)
+    except PricingError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except InsufficientStock as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'shortages': e.shortages}), 409
+
+    shipping = order_data.get('shipping_address', {})
+
+    order = Order(
+        order_number=next_order_number(),
+        user_id=int(user_id),
+        **priced.order_fields(),
+        status=OrderStatus.PENDING.value,
+        payment_status=PaymentStatus.PENDING.value,
+        inventory_reserved=True,
+        payment_id=payment_id,
+        shipping_name=shipping.get('fullName') or shipping.get('name'),
+        shipping_street=shipping.get('address') or shipping.get('street'),
+        shipping_city=shipping.get('city'),
+        shipping_state=shipping.get('state'),
+        shipping_postal_code=shipping.get('zipCode') or shipping.get('postal_code'),
+        shipping_country=shipping.get('country', 'US'),
+        shipping_phone=shipping.get('phone'),
+        customer_notes=order_data.get('customer_notes')
+    )
+
+    db.session.add(order)
+    try:
         db.session.flush()
+    except IntegrityError:
+        # A concurrent capture of the same payment got there first
+        db.session.rollback()
+        return jsonify({'error': 'Payment is already being captured'}), 409
 
-        # Add order items
-        for it in items:
-            unit_price = Decimal(str(it.get('unit_price') or it.get('price') or 0))
-            quantity = int(it.get('quantity', 1))
-            total_price = unit_price * quantity
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=it.get('product_id') or it.get('id'),
-                product_name=it.get('name'),
-                product_sku=it.get('sku'),
-                product_image=it.get('image'),
-                quantity=quantity,
-                unit_price=unit_price,
-                total_price=total_price
-            )
-            db.session.add(order_item)
+    insert_order_items(order, priced)
+    record_order_created(order)
+    # Commit the reservation (releasing the row locks) before calling PayPal
+    db.session.commit()
+    product_tags = [f'product:{pid}' for pid in priced.quantities()]
+    # Only the bought products' pages; listings pick up the stock on expiry
+    invalidate_tags('orders', *product_tags)
 
+    # Execute the payment; an SDK or network error counts as a failed payment,
+    # so the stock reserved above is never left held by a Pending order
+    try:
+        executed = payment.execute({"payer_id": payer_id})
+        error = payment.error
+    except Exception as e:
+        print(f"PayPal execute error: {e}")
+        executed, error = False, str(e)
+
+    if executed:
+        order.status = OrderStatus.CONFIRMED.value
+        order.payment_status = PaymentStatus.PAID.value
+        order.confirmed_at = datetime.utcnow()
+        record_payment_status_change(order, PaymentStatus.PENDING.value)
         db.session.commit()
+        invalidate_tags('orders')
+        update_leaderboards(order, PaymentStatus.PENDING.value)
 
         return jsonify({
             'order': order.to_dict(),
@@ -178,7 +224,16 @@ def capture_paypal_order():
             'status': 'success'
         }), 201
     else:
-        return jsonify({'error': 'Payment execution failed', 'details': payment.error}), 400
+        # Payment failed: give the stock back and drop the order, so it
+        # leaves neither a row nor a count in the rollup, and the payment
+        # can be captured again
+        release_stock([order])
+        record_order_deleted(order)
+        db.session.delete(order)
+        db.session.commit()
+        invalidate_tags('orders', *product_tags)
+
+        return jsonify({'error': 'Payment execution failed', 'details': error}), 400
 
 
 @payments_bp.route('/paypal/webhook', methods=['POST'])
@@ -1,15 +1,37 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from sqlalchemy.exc import IntegrityError
 from models.product import Product
 from models.rating import ProductRating
 from extensions import db
-from sqlalchemy import or_
-from utils.cache import invalidate_cache
+from utils.cache import cached, invalidate_tags
+from utils.rate_limit import rate_limited
+from utils.search import apply_search
+from utils.suggest import suggest
+from utils.ratings import serialize_products, apply_rating_change
+from utils.pagination import paginate, keyset_paginate, resolve_sort_column, InvalidCursor
 
 products_bp = Blueprint('products', __name__)
 
 
+def _get_optional_user_id():
+    """Return the authenticated user's id if a valid JWT is present, else None."""
+    try:
+        try:
+            verify_jwt_in_request(optional=True)
+        except TypeError:
+            # older versions of flask_jwt_extended may not support `optional`
+            verify_jwt_in_request()
+        user_id = get_jwt_identity()
+        if user_id is not None:
+            return int(user_id)
+    except Exception:
+        pass
+    return None
+
+
 @products_bp.route('', methods=['GET'])
+@cached('products', ttl=120, tags=['catalog'])
 def get_products():
     """Public endpoint: Get products with optional filtering and pagination."""
     page = request.args.get('page', 1, type=int)
@@ -22,63 +44,87 @@ def get_products():
 
     query = Product.query
 
+    # Filters applied, for the count cache
+    filters = {}
+    rank = None
     if search:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f'%{search}%'),
-                Product.sku.ilike(f'%{search}%'),
-                Product.description.ilike(f'%{search}%')
-            )
-        )
+        filters['search'] = search
+        query, rank = apply_search(query, search)
 
     if category_id:
+        filters['category_id'] = category_id
         query = query.filter_by(category_id=category_id)
 
-    if is_active == 'true':
-        query = query.filter_by(is_active=True)
-    elif is_active == 'false':
-        query = query.filter_by(is_active=False)
-
-    if hasattr(Product, sort_by):
-        order_col = getattr(Product, sort_by)
-        query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+    if is_active in ('true', 'false'):
+        filters['is_active'] = is_active == 'true'
+        query = query.filter_by(is_active=filters['is_active'])
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    if 'cursor' in request.args:
+        # Keyset pagination: seek on (sort column, id) instead of OFFSET
+        descending = sort_order == 'desc'
+        try:
+            result = keyset_paginate(
+                query,
+                [(resolve_sort_column(Product, sort_by), descending), (Product.id, descending)],
+                cursor=request.args.get('cursor'),
+                per_page=per_page,
+                include_total=request.args.get('include_total') == 'true',
+                table='products',
+                filters=filters
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        items = result.items
+        page_info = {
+            'next_cursor': result.next_cursor,
+            'prev_cursor': result.prev_cursor,
+            'total': result.total,
+            'total_estimated': result.total_estimated,
+            'per_page': result.per_page
+        }
+    else:
+        if rank is not None and ('sort_by' not in request.args or sort_by == 'relevance'):
+            # Best matches first when searching, unless the caller asked for a specific order
+            query = query.order_by(rank, Product.id.desc())
+        elif hasattr(Product, sort_by):
+            order_col = getattr(Product, sort_by)
+            query = query.order_by(order_col.desc() if sort_order == 'desc' else order_col.asc())
+
+        pagination = paginate(query, page, per_page, 'products', filters)
+        items = pagination.items
+        page_info = {
+            'total': pagination.total,
+            'total_estimated': pagination.total_estimated,
+            'pages': pagination.pages,
+            'current_page': page,
+            'per_page': per_page
+        }
 
     # Try to detect authenticated user (optional) so we can include user's own rating
-    user_id = None
-    try:
-        try:
-            verify_jwt_in_request(optional=True)
-        except TypeError:
-            # older versions of flask_jwt_extended may not support `optional`
-            verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        if user_id is not None:
-            user_id = int(user_id)
-    except Exception:
-        user_id = None
-
-    products_list = []
-    for p in pagination.items:
-        d = p.to_dict()
-        if user_id:
-            ur = ProductRating.query.filter_by(product_id=p.id, user_id=user_id).first()
-            d['your_rating'] = ur.rating if ur else None
-        else:
-            d['your_rating'] = None
-        products_list.append(d)
+    user_id = _get_optional_user_id()
+
+    products_list = serialize_products(items, user_id=user_id, include_user_rating=True)
 
     return jsonify({
         'products': products_list,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page,
-        'per_page': per_page
+        **page_info
+    }), 200
+
+
+@products_bp.route('/suggest', methods=['GET'])
+def suggest_products():
+    """Public endpoint: Autocomplete suggestions served from the in-memory index."""
+    q = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 20)
+
+    return jsonify({
+        'query': q,
+        'suggestions': suggest(q, limit=limit)
     }), 200
 
 
 @products_bp.route('/<int:product_id>', methods=['GET'])
+@cached('product', ttl=300, tags=lambda product_id: [f'product:{product_id}', 'categories'])
 def get_product(product_id):
     """Public endpoint: Get single product by ID."""
     product = Product.query.get(product_id)
@@ -86,31 +132,24 @@ def get_product(product_id):
         return jsonify({'error': 'Product not found'}), 404
 
     # Optionally include the authenticated user's rating
-    user_id = None
-    try:
-        try:
-            verify_jwt_in_request(optional=True)
-        except TypeError:
-            verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        if user_id is not None:
-            user_id = int(user_id)
-    except Exception:
-        user_id = None
+    user_id = _get_optional_user_id()
 
-    d = product.to_dict()
-    if user_id:
-        ur = ProductRating.query.filter_by(product_id=product.id, user_id=user_id).first()
-        d['your_rating'] = ur.rating if ur else None
-    else:
-        d['your_rating'] = None
+    d = serialize_products([product], user_id=user_id, include_user_rating=True)[0]
 
     return jsonify({'product': d}), 200
 
 
 
+def _locked_rating(product_id, user_id):
+    """A user's rating of a product, locked so concurrent re-rates apply in order."""
+    return ProductRating.query.filter_by(
+        product_id=product_id, user_id=user_id
+    ).with_for_update().first()
+
+
 @products_bp.route('/<int:product_id>/rate', methods=['POST'])
 @jwt_required()
+@rate_limited
 def rate_product(product_id):
     """Authenticated endpoint: rate a product (1-5)."""
     product = Product.query.get(product_id)
@@ -133,34 +172,29 @@ def rate_product(product_id):
         # Fallback if stored differently
         return jsonify({'error': 'Invalid user identity'}), 400
 
-    existing = ProductRating.query.filter_by(product_id=product.id, user_id=user_id_int).first()
+    existing = _locked_rating(product.id, user_id_int)
+    if not existing:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ProductRating(product_id=product.id, user_id=user_id_int, rating=rating_value))
+        except IntegrityError:
+            # A concurrent first rating by the same user won the insert; update that row instead
+            existing = _locked_rating(product.id, user_id_int)
+
+    old_rating = existing.rating if existing else None
     if existing:
         existing.rating = rating_value
-    else:
-        pr = ProductRating(product_id=product.id, user_id=user_id_int, rating=rating_value)
-        db.session.add(pr)
 
+    # Keep the denormalized summary on Product in step, in the same transaction
+    apply_rating_change(product.id, old_rating, rating_value)
     db.session.commit()
 
-    # Invalidate cached product listings if any
-    try:
-        invalidate_cache('products')
-    except Exception:
-        pass
+    # Only this product's detail; cached listings pick up the new average
+    # when they expire, rather than every listing being dropped per vote
+    invalidate_tags(f'product:{product.id}')
 
-    # Reload product so relationship reflects new rating
+    # Reload product and include the user's rating in response
     product = Product.query.get(product_id)
-
-    d = product.to_dict()
-    # include the user's rating in response
-    try:
-        user_id = get_jwt_identity()
-        if user_id is not None:
-            ur = ProductRating.query.filter_by(product_id=product.id, user_id=int(user_id)).first()
-            d['your_rating'] = ur.rating if ur else None
-        else:
-            d['your_rating'] = None
-    except Exception:
-        d['your_rating'] = None
+    d = serialize_products([product], user_id=user_id_int, include_user_rating=True)[0]
 
     return jsonify({'product': d}), 200
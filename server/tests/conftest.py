@@ -0,0 +1,127 @@
+"""
+Shared fixtures.
+
+The app runs against a throwaway SQLite database and an in-process fakeredis
+server, so the suite needs neither PostgreSQL nor Redis. Everything below the
+environment setup must be imported lazily, after it.
+"""
+import os
+import sys
+import tempfile
+from decimal import Decimal
+
+import fakeredis
+import pytest
+import redis
+
+_tmpdir = tempfile.mkdtemp(prefix='marketplace-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmpdir, 'uploads')
+os.environ['PASSWORD_HASH_WORKERS'] = '0'
+
+_redis_server = fakeredis.FakeServer()
+redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=_redis_server, **kwargs)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+
+    app = create_app('production')
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    """Fresh tables, Redis and caches, inside an app context."""
+    from app import seed_default_constants
+    from extensions import db, redis_client
+    from utils import auth
+    from utils.cache import local_cache
+    from utils.constants import load_constants
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        redis_client.flushall()
+        local_cache.clear()
+        # Ids are reused once tables are recreated
+        auth._local_status.clear()
+        seed_default_constants(app)
+        load_constants()
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app, db):
+    return app.test_client()
+
+
+@pytest.fixture
+def category(db):
+    from models import Category
+
+    category = Category(name='Electronics', slug='electronics')
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+@pytest.fixture
+def make_product(db, category):
+    """Create a product; stock 10 at 10.00 unless overridden."""
+    from models import Product
+
+    def make(name='Headphones', price='10.00', stock=10, **kwargs):
+        index = Product.query.count()
+        product = Product(
+            name=name,
+            slug=f'product-{index}',
+            sku=f'SKU-{index}',
+            price=Decimal(price),
+            stock_quantity=stock,
+            category_id=category.id,
+            **kwargs
+        )
+        db.session.add(product)
+        db.session.commit()
+        return product
+
+    return make
+
+
+def _make_user(db, email, is_admin=False):
+    from models import User
+
+    user = User(email=email, username=email.split('@')[0], is_admin=is_admin)
+    user.set_password('password123')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _auth_headers(user):
+    from flask_jwt_extended import create_access_token
+    from utils.auth import user_claims
+
+    token = create_access_token(identity=str(user.id), additional_claims=user_claims(user))
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def user(db):
+    return _make_user(db, 'customer@example.com')
+
+
+@pytest.fixture
+def user_headers(user):
+    return _auth_headers(user)
+
+
+@pytest.fixture
+def admin_headers(db):
+    return _auth_headers(_make_user(db, 'admin@example.com', is_admin=True))
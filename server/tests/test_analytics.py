@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import redis_client
+from models import Order
+from utils.leaderboards import DAILY_RETENTION_DAYS, rebuild_leaderboards
+from utils.pricing import insert_order_items, price_cart
+from utils.rollups import rebuild_rollups
+
+
+def _paid_order(db, user, product, days_ago):
+    priced = price_cart([{'product_id': product.id, 'quantity': 1}])
+    order = Order(
+        order_number=f'ORD-TEST-{Order.query.count() + 1}',
+        user_id=user.id,
+        status='Confirmed',
+        payment_status='Paid',
+        created_at=datetime.utcnow() - timedelta(days=days_ago),
+        **priced.order_fields()
+    )
+    db.session.add(order)
+    db.session.flush()
+    insert_order_items(order, priced)
+    db.session.commit()
+    return order
+
+
+@pytest.mark.parametrize('url', [
+    '/api/admin/analytics/dashboard',
+    '/api/admin/analytics/sales',
+    '/api/admin/analytics/products/performance',
+    '/api/admin/analytics/users/activity'
+])
+@pytest.mark.parametrize('days', ['0', '-5', 'week'])
+def test_rejects_non_positive_days(client, admin_headers, url, days):
+    response = client.get(f'{url}?days={days}', headers=admin_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'days must be a positive integer'
+
+
+def test_leaderboard_window_is_capped_at_retention(client, admin_headers, monkeypatch):
+    rebuild_leaderboards()
+    unions = []
+    real_pipeline = redis_client.pipeline
+
+    def pipeline(*args, **kwargs):
+        pipe = real_pipeline(*args, **kwargs)
+        zunionstore = pipe.zunionstore
+        pipe.zunionstore = lambda dest, keys, *a, **kw: unions.append(len(keys)) or zunionstore(dest, keys, *a, **kw)
+        return pipe
+
+    monkeypatch.setattr(redis_client, 'pipeline', pipeline)
+    response = client.get('/api/admin/analytics/products/performance?days=100000', headers=admin_headers)
+
+    assert response.status_code == 200
+    assert unions and max(unions) == DAILY_RETENTION_DAYS
+
+
+def test_sales_and_leaderboards_cover_the_same_days(db, client, admin_headers, make_product, user):
+    product = make_product()
+    _paid_order(db, user, product, days_ago=6)
+    _paid_order(db, user, product, days_ago=7)
+    rebuild_rollups()
+    rebuild_leaderboards()
+
+    sales = client.get('/api/admin/analytics/sales?days=7', headers=admin_headers).get_json()
+    performance = client.get(
+        '/api/admin/analytics/products/performance?days=7', headers=admin_headers
+    ).get_json()
+
+    # Today and the six days before it
+    assert sum(day['order_count'] for day in sales['daily_sales']) == 1
+    assert performance['top_sellers'][0]['total_sold'] == 1
@@ -0,0 +1,176 @@
+import pytest
+
+from models import Order, OrderStatus, Product
+from routes.admin.orders import ALLOWED_TRANSITIONS, MAX_BULK_ORDERS
+
+STATUSES = {s.value for s in OrderStatus}
+
+
+def _checkout(client, headers, product, quantity=1):
+    response = client.post('/api/orders', headers=headers, json={
+        'items': [{'product_id': product.id, 'quantity': quantity}]
+    })
+    assert response.status_code == 201
+    return response.get_json()['order']['id']
+
+
+def _bulk(client, headers, order_ids, status):
+    return client.post('/api/admin/orders/bulk/status', headers=headers, json={
+        'order_ids': order_ids, 'status': status
+    })
+
+
+def _product(product_id):
+    return Product.query.filter_by(id=product_id).one()
+
+
+def test_transition_table_covers_every_status():
+    assert set(ALLOWED_TRANSITIONS) == STATUSES
+    for current, targets in ALLOWED_TRANSITIONS.items():
+        assert targets <= STATUSES
+        assert current not in targets
+
+
+@pytest.mark.parametrize('final', [OrderStatus.CANCELLED.value, OrderStatus.REFUNDED.value])
+def test_final_statuses_have_no_exits(final):
+    assert ALLOWED_TRANSITIONS[final] == set()
+
+
+def test_reports_a_result_per_requested_order(client, make_product, user_headers, admin_headers):
+    product = make_product()
+    pending = _checkout(client, user_headers, product)
+    confirmed = _checkout(client, user_headers, product)
+    cancelled = _checkout(client, user_headers, product)
+    assert _bulk(client, admin_headers, [confirmed], 'Confirmed').status_code == 200
+    assert _bulk(client, admin_headers, [cancelled], 'Cancelled').status_code == 200
+
+    response = _bulk(client, admin_headers, [pending, confirmed, cancelled, 9999, pending], 'Confirmed')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['updated'] == 1
+    assert [(r['id'], r['result']) for r in body['results']] == [
+        (pending, 'updated'),
+        (confirmed, 'unchanged'),
+        (cancelled, 'error'),
+        (9999, 'error')
+    ]
+    assert body['results'][2]['error'] == 'Cannot change status from Cancelled to Confirmed'
+    assert body['results'][3]['error'] == 'Order not found'
+
+    order = Order.query.filter_by(id=pending).one()
+    assert order.status == 'Confirmed'
+    assert order.confirmed_at is not None
+
+
+def test_walks_the_happy_path(client, make_product, user_headers, admin_headers):
+    product = make_product()
+    order_id = _checkout(client, user_headers, product)
+
+    for status in ('Confirmed', 'Processing', 'Shipped', 'Delivered', 'Refunded'):
+        assert _bulk(client, admin_headers, [order_id], status).get_json()['updated'] == 1
+
+    order = Order.query.filter_by(id=order_id).one()
+    assert order.status == 'Refunded'
+    assert order.shipped_at is not None and order.delivered_at is not None
+
+
+def test_rejects_going_backwards(client, make_product, user_headers, admin_headers):
+    product = make_product()
+    order_id = _checkout(client, user_headers, product)
+    _bulk(client, admin_headers, [order_id], 'Confirmed')
+    _bulk(client, admin_headers, [order_id], 'Shipped')
+
+    for status in ('Pending', 'Confirmed', 'Processing', 'Cancelled'):
+        result = _bulk(client, admin_headers, [order_id], status).get_json()['results'][0]
+        assert result['result'] == 'error'
+
+    assert Order.query.filter_by(id=order_id).one().status == 'Shipped'
+
+
+def test_cancelling_returns_reserved_stock(client, make_product, user_headers, admin_headers):
+    product = make_product(stock=10)
+    first = _checkout(client, user_headers, product, quantity=2)
+    second = _checkout(client, user_headers, product, quantity=3)
+    assert _product(product.id).stock_quantity == 5
+
+    _bulk(client, admin_headers, [first, second], 'Cancelled')
+
+    assert _product(product.id).stock_quantity == 10
+    assert Order.query.filter_by(inventory_reserved=True).count() == 0
+
+
+def test_shipping_counts_sales_without_touching_stock(client, make_product, user_headers, admin_headers):
+    product = make_product(stock=10)
+    order_id = _checkout(client, user_headers, product, quantity=4)
+    _bulk(client, admin_headers, [order_id], 'Confirmed')
+
+    _bulk(client, admin_headers, [order_id], 'Shipped')
+    # Refunding after shipment must not put the shipped units back on the shelf
+    _bulk(client, admin_headers, [order_id], 'Refunded')
+
+    shipped = _product(product.id)
+    assert shipped.stock_quantity == 6
+    assert shipped.sales_count == 4
+
+
+def test_unconfirmed_orders_cannot_ship(client, make_product, user_headers, admin_headers):
+    product = make_product(stock=10)
+    order_id = _checkout(client, user_headers, product, quantity=2)
+
+    result = _bulk(client, admin_headers, [order_id], 'Shipped').get_json()['results'][0]
+
+    assert result['error'] == 'Cannot change status from Pending to Shipped'
+    assert _product(product.id).sales_count == 0
+
+
+def test_orders_with_failed_payments_cannot_ship(client, make_product, user_headers, admin_headers):
+    product = make_product(stock=10)
+    order_id = _checkout(client, user_headers, product, quantity=2)
+    _bulk(client, admin_headers, [order_id], 'Confirmed')
+    client.put(f'/api/admin/orders/{order_id}/payment-status', headers=admin_headers, json={
+        'payment_status': 'Failed'
+    })
+
+    result = _bulk(client, admin_headers, [order_id], 'Shipped').get_json()['results'][0]
+
+    assert result['error'] == 'Cannot ship an order whose payment is Failed'
+    assert _product(product.id).stock_quantity == 10
+
+
+def test_single_order_updates_follow_the_transition_table(client, make_product, user_headers, admin_headers):
+    product = make_product()
+    order_id = _checkout(client, user_headers, product)
+    url = f'/api/admin/orders/{order_id}/status'
+
+    assert client.put(url, headers=admin_headers, json={'status': 'Shipped'}).status_code == 400
+    assert client.put(url, headers=admin_headers, json={'status': 'Cancelled'}).status_code == 200
+    # Unchanged is not an error
+    assert client.put(url, headers=admin_headers, json={'status': 'Cancelled'}).status_code == 200
+
+    for status in ('Shipped', 'Pending'):
+        response = client.put(url, headers=admin_headers, json={'status': status})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == f'Cannot change status from Cancelled to {status}'
+    assert Order.query.filter_by(id=order_id).one().status == 'Cancelled'
+
+
+@pytest.mark.parametrize('payload, error', [
+    ({'order_ids': [1]}, 'Status is required'),
+    ({'order_ids': [1], 'status': 'Lost'}, 'Invalid status'),
+    ({'order_ids': [], 'status': 'Shipped'}, 'non-empty list'),
+    ({'order_ids': '1,2', 'status': 'Shipped'}, 'non-empty list'),
+    ({'order_ids': ['x'], 'status': 'Shipped'}, 'integers'),
+    ({'order_ids': list(range(1, MAX_BULK_ORDERS + 2)), 'status': 'Shipped'}, f'At most {MAX_BULK_ORDERS}')
+])
+def test_validates_requests(client, admin_headers, payload, error):
+    response = client.post('/api/admin/orders/bulk/status', headers=admin_headers, json=payload)
+
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def test_requires_an_admin(client, user_headers):
+    response = _bulk(client, user_headers, [1], 'Shipped')
+
+    assert response.status_code == 403
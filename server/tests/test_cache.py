@@ -0,0 +1,62 @@
+from extensions import redis_client
+from models import Product
+from utils.cache import invalidate_tags, local_cache
+
+
+def _drop_cached_bodies():
+    """Expire every cached response, as their TTL would."""
+    local_cache.clear()
+    for key in redis_client.scan_iter('products:/api/products*'):
+        redis_client.delete(key)
+
+
+def test_revalidation_answers_304_while_cached(client, make_product):
+    make_product()
+
+    first = client.get('/api/products')
+    etag = first.headers['ETag']
+    again = client.get('/api/products', headers={'If-None-Match': etag})
+
+    assert first.headers['X-Cache'] == 'MISS'
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+
+
+def test_rebuilt_body_gets_a_new_etag_without_an_invalidation(db, client, make_product):
+    product = make_product(stock=5)
+    etag = client.get('/api/products').headers['ETag']
+
+    # Stock changes without touching the listing's tags, then the entry expires
+    Product.query.filter_by(id=product.id).update({'stock_quantity': 3})
+    db.session.commit()
+    _drop_cached_bodies()
+
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['products'][0]['stock_quantity'] == 3
+
+
+def test_unchanged_rebuild_keeps_its_etag(client, make_product):
+    make_product()
+    etag = client.get('/api/products').headers['ETag']
+
+    invalidate_tags('catalog')
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.headers['X-Cache'] == 'NOT-MODIFIED'
+
+
+def test_malformed_entries_are_rebuilt(client, make_product):
+    make_product()
+    client.get('/api/products')
+    local_cache.clear()
+    for key in redis_client.scan_iter('products:/api/products*'):
+        redis_client.set(key, '{"products":[]}')
+
+    response = client.get('/api/products')
+
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(response.get_json()['products']) == 1
@@ -0,0 +1,273 @@
+import pytest
+
+from models import Order, Product
+from utils.inventory import (
+    InsufficientStock, lock_products, order_quantities, record_shipment, release_stock,
+    reserve_order_stock, reserve_stock
+)
+from utils.pricing import insert_order_items, price_cart
+
+
+def _stock(product_id):
+    return Product.query.filter_by(id=product_id).one().stock_quantity
+
+
+def _place_order(db, user, quantities, reserve=True):
+    """Create an order for {product: quantity}, optionally reserving its stock."""
+    items = [{'product_id': p.id, 'quantity': q} for p, q in quantities.items()]
+    priced = price_cart(items, lock=reserve)
+    if reserve:
+        reserve_stock(priced.quantities(), priced.products)
+    order = Order(
+        order_number=f'ORD-TEST-{Order.query.count() + 1}',
+        user_id=user.id,
+        inventory_reserved=reserve,
+        **priced.order_fields()
+    )
+    db.session.add(order)
+    db.session.flush()
+    insert_order_items(order, priced)
+    db.session.commit()
+    return order
+
+
+def test_lock_products_by_id(make_product):
+    first, second = make_product(), make_product()
+
+    assert lock_products([second.id, first.id, second.id]) == {first.id: first, second.id: second}
+    assert lock_products([]) == {}
+
+
+def test_reserve_takes_stock(db, make_product):
+    first, second = make_product(stock=5), make_product(stock=3)
+
+    reserve_stock({first.id: 2, second.id: 3}, lock_products([first.id, second.id]))
+    db.session.commit()
+
+    assert _stock(first.id) == 3
+    assert _stock(second.id) == 0
+
+
+def test_reserve_reports_shortages_and_rolls_back(db, make_product):
+    plenty, scarce = make_product(stock=5), make_product(name='Scarce', stock=1)
+
+    with pytest.raises(InsufficientStock) as exc:
+        reserve_stock({plenty.id: 1, scarce.id: 2}, lock_products([plenty.id, scarce.id]))
+    db.session.rollback()
+
+    assert exc.value.shortages == [{'product_id': scarce.id, 'name': 'Scarce', 'requested': 2, 'available': 1}]
+    assert _stock(plenty.id) == 5
+    assert _stock(scarce.id) == 1
+
+
+def test_reserve_skips_untracked_products(db, make_product):
+    untracked = make_product(stock=0, track_inventory=False)
+
+    reserve_stock({untracked.id: 4}, lock_products([untracked.id]))
+    db.session.commit()
+
+    assert _stock(untracked.id) == 0
+
+
+def test_order_quantities_sums_per_product(db, make_product, user):
+    first, second = make_product(), make_product()
+    orders = [
+        _place_order(db, user, {first: 1, second: 2}),
+        _place_order(db, user, {first: 3})
+    ]
+
+    assert order_quantities([o.id for o in orders]) == {first.id: 4, second.id: 2}
+    assert order_quantities([]) == {}
+
+
+def test_release_returns_reserved_stock_once(db, make_product, user):
+    product = make_product(stock=10)
+    order = _place_order(db, user, {product: 4})
+    assert _stock(product.id) == 6
+
+    assert release_stock([order]) == [product.id]
+    db.session.commit()
+    assert _stock(product.id) == 10
+    assert order.inventory_reserved is False
+
+    # Releasing again (or an order that never reserved) changes nothing
+    assert release_stock([order]) == []
+    db.session.commit()
+    assert _stock(product.id) == 10
+
+
+def test_reserve_order_stock_takes_released_stock_again(db, make_product, user):
+    product = make_product(stock=10)
+    order = _place_order(db, user, {product: 4})
+    release_stock([order])
+    db.session.commit()
+
+    assert reserve_order_stock([order]) == [product.id]
+    db.session.commit()
+    assert _stock(product.id) == 6
+    assert order.inventory_reserved is True
+
+    # Already reserved: nothing more is taken
+    assert reserve_order_stock([order]) == []
+    assert _stock(product.id) == 6
+
+
+def test_shipping_reserved_order_only_counts_sales(db, make_product, user):
+    product = make_product(stock=10)
+    order = _place_order(db, user, {product: 3})
+
+    assert record_shipment([order]) == [product.id]
+    db.session.commit()
+
+    shipped = Product.query.filter_by(id=product.id).one()
+    assert shipped.stock_quantity == 7
+    assert shipped.sales_count == 3
+    assert order.inventory_reserved is False
+
+
+def test_shipping_unreserved_order_deducts_stock_down_to_zero(db, make_product, user):
+    product = make_product(stock=10)
+    order = _place_order(db, user, {product: 4}, reserve=False)
+    Product.query.filter_by(id=product.id).update({'stock_quantity': 2})
+    db.session.commit()
+
+    record_shipment([order])
+    db.session.commit()
+
+    shipped = Product.query.filter_by(id=product.id).one()
+    assert shipped.stock_quantity == 0
+    assert shipped.sales_count == 4
+
+
+def test_checkout_reserves_stock_and_refuses_overselling(client, make_product, user_headers):
+    product = make_product(stock=3)
+
+    response = client.post('/api/orders', headers=user_headers, json={
+        'items': [{'product_id': product.id, 'quantity': 2}]
+    })
+    assert response.status_code == 201
+    assert _stock(product.id) == 1
+
+    response = client.post('/api/orders', headers=user_headers, json={
+        'items': [{'product_id': product.id, 'quantity': 2}]
+    })
+    assert response.status_code == 409
+    assert response.get_json()['shortages'][0]['available'] == 1
+    assert _stock(product.id) == 1
+
+
+def test_checkout_refreshes_product_and_expired_listings(client, make_product, user_headers):
+    from extensions import redis_client
+    from utils.cache import local_cache
+
+    product = make_product(stock=5)
+    detail_etag = client.get(f'/api/products/{product.id}').headers['ETag']
+    listing_etag = client.get('/api/products').headers['ETag']
+
+    client.post('/api/orders', headers=user_headers, json={
+        'items': [{'product_id': product.id, 'quantity': 2}]
+    })
+
+    detail = client.get(f'/api/products/{product.id}', headers={'If-None-Match': detail_etag})
+    assert detail.get_json()['product']['stock_quantity'] == 3
+
+    # The listing is not invalidated; once its entry expires it is rebuilt
+    # with a new validator, so revalidating clients see the new stock
+    local_cache.clear()
+    for key in redis_client.scan_iter('products:/api/products*'):
+        redis_client.delete(key)
+    listing = client.get('/api/products', headers={'If-None-Match': listing_etag})
+    assert listing.status_code == 200
+    assert listing.get_json()['products'][0]['stock_quantity'] == 3
+
+
+def _fake_paypal(monkeypatch, items, execute):
+    """Point PayPal lookups at a payment for items whose execute() is execute."""
+    import paypalrestsdk
+    from types import SimpleNamespace
+
+    total = str(price_cart(items).total)
+    calls = []
+
+    class FakePayment:
+        error = 'declined'
+        transactions = [SimpleNamespace(amount=SimpleNamespace(total=total))]
+
+        def execute(self, params):
+            calls.append(params)
+            return execute()
+
+    monkeypatch.setattr(paypalrestsdk.Payment, 'find', staticmethod(lambda payment_id: FakePayment()))
+    return calls
+
+
+def _capture(client, headers, items, payment_id='PAY-1'):
+    return client.post('/api/payments/paypal/capture-order', headers=headers, json={
+        'payment_id': payment_id, 'payer_id': 'PAYER-1', 'order_data': {'items': items}
+    })
+
+
+def test_failed_capture_leaves_no_order_behind(client, make_product, user_headers, monkeypatch):
+    from models import OrderDaily
+
+    product = make_product(stock=5)
+    items = [{'product_id': product.id, 'quantity': 2}]
+
+    def unreachable():
+        raise ConnectionError('PayPal unreachable')
+
+    _fake_paypal(monkeypatch, items, unreachable)
+    response = _capture(client, user_headers, items)
+
+    assert response.status_code == 400
+    assert response.get_json()['details'] == 'PayPal unreachable'
+    assert Order.query.count() == 0
+    assert [r.order_count for r in OrderDaily.query.all()] in ([], [0])
+    assert _stock(product.id) == 5
+
+    # Declined the second time round: still nothing kept
+    _fake_paypal(monkeypatch, items, lambda: False)
+    assert _capture(client, user_headers, items).get_json()['details'] == 'declined'
+    assert Order.query.count() == 0
+    assert [r.order_count for r in OrderDaily.query.all()] in ([], [0])
+    assert _stock(product.id) == 5
+
+
+def test_repeated_capture_returns_the_same_order(client, make_product, user_headers, monkeypatch):
+    from models import OrderDaily
+
+    product = make_product(stock=5)
+    items = [{'product_id': product.id, 'quantity': 2}]
+    calls = _fake_paypal(monkeypatch, items, lambda: True)
+
+    first = _capture(client, user_headers, items)
+    again = _capture(client, user_headers, items)
+
+    assert (first.status_code, again.status_code) == (201, 200)
+    assert again.get_json()['order']['id'] == first.get_json()['order']['id']
+    assert len(calls) == 1
+    assert _stock(product.id) == 3
+    assert [(r.order_count, r.paid_count) for r in OrderDaily.query.all()] == [(1, 1)]
+
+
+def test_payment_status_releases_and_retakes_stock(client, db, make_product, user, admin_headers):
+    product = make_product(stock=5)
+    order = _place_order(db, user, {product: 3})
+    url = f'/api/admin/orders/{order.id}/payment-status'
+
+    assert client.put(url, headers=admin_headers, json={'payment_status': 'Failed'}).status_code == 200
+    assert _stock(product.id) == 5
+
+    # Someone else buys the freed units, so the order cannot be paid again
+    Product.query.filter_by(id=product.id).update({'stock_quantity': 2})
+    db.session.commit()
+    response = client.put(url, headers=admin_headers, json={'payment_status': 'Paid'})
+    assert response.status_code == 409
+    assert Order.query.filter_by(id=order.id).one().payment_status == 'Failed'
+
+    Product.query.filter_by(id=product.id).update({'stock_quantity': 4})
+    db.session.commit()
+    response = client.put(url, headers=admin_headers, json={'payment_status': 'Paid'})
+    assert response.status_code == 200
+    assert _stock(product.id) == 1
+    assert Order.query.filter_by(id=order.id).one().inventory_reserved is True
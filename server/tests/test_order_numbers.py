@@ -0,0 +1,64 @@
+import re
+
+from extensions import redis_client
+from models import Order
+from utils import order_numbers
+from utils.order_numbers import SEQUENCE_KEY, OrderNumberAllocator, format_order_number
+
+
+def _issue(db, user, sequence):
+    """Record an order as already holding the number for sequence."""
+    db.session.add(Order(
+        order_number=format_order_number(sequence), user_id=user.id, subtotal=0, total=0
+    ))
+    db.session.commit()
+
+
+def test_processes_take_disjoint_blocks(db):
+    first, second = OrderNumberAllocator(3), OrderNumberAllocator(3)
+
+    values = [first.next_sequence(), second.next_sequence(), first.next_sequence()]
+
+    seed = (first.max_processes + 1) * 3
+    assert values == [seed + 1, seed + 4, seed + 2]
+    # One INCRBY per block, not per number
+    assert int(redis_client.get(SEQUENCE_KEY)) == seed + 6
+
+
+def test_exhausted_block_reserves_the_next_one(db):
+    allocator, other = OrderNumberAllocator(2), OrderNumberAllocator(2)
+
+    first_block = [allocator.next_sequence(), allocator.next_sequence()]
+    taken = other.next_sequence()
+    next_block = allocator.next_sequence()
+
+    assert first_block[1] == first_block[0] + 1
+    assert taken == first_block[0] + 2
+    assert next_block == first_block[0] + 4
+
+
+def test_lost_counter_restarts_past_blocks_still_held(db, user):
+    holders = [OrderNumberAllocator(10, max_processes=4) for _ in range(4)]
+    held = [h.next_sequence() for h in holders]
+    _issue(db, user, held[0])
+
+    redis_client.delete(SEQUENCE_KEY)
+    fresh = OrderNumberAllocator(10, max_processes=4)
+    reseeded = fresh.next_sequence()
+
+    # Every value left in the other processes' blocks stays below the new ones
+    assert reseeded > max(held) + 9
+    assert reseeded == held[0] + 5 * 10 + 1
+
+
+def test_unreachable_counter_falls_back_to_random_numbers(db, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise ConnectionError('redis is down')
+
+    monkeypatch.setattr(order_numbers, '_allocator', OrderNumberAllocator(5))
+    monkeypatch.setattr(redis_client, 'incrby', unavailable)
+
+    numbers = {order_numbers.next_order_number() for _ in range(3)}
+
+    assert len(numbers) == 3
+    assert all(re.fullmatch(r'ORD-\d{8}-R[0-9A-F]{12}', n) for n in numbers)
@@ -0,0 +1,151 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from models import Order, Product
+from utils.cache import invalidate_tags
+from utils.pagination import (
+    InvalidCursor, _order_clause, _seek_condition, count_total, decode_cursor, encode_cursor, keyset_paginate
+)
+
+
+def _walk(query, order_by, per_page):
+    """Follow next cursors from the first page; returns the pages' ids."""
+    pages, cursor = [], None
+    while True:
+        page = keyset_paginate(query, order_by, cursor=cursor, per_page=per_page)
+        pages.append([p.id for p in page.items])
+        if not page.next_cursor:
+            return pages
+        cursor = page.next_cursor
+
+
+def test_cursor_round_trips_typed_values():
+    values = [datetime(2025, 1, 2, 3, 4, 5), date(2025, 1, 2), Decimal('9.99'), None, 'text', 42]
+
+    cursor = encode_cursor(values, 'prev')
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (values, 'prev')
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor([1], 'sideways')])
+def test_rejects_bad_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_rejects_cursor_for_another_sort_order(make_product):
+    make_product()
+
+    with pytest.raises(InvalidCursor, match='sort order'):
+        keyset_paginate(Product.query, [(Product.id, False)], cursor=encode_cursor([1, 2]))
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_pages_cover_every_row_once(make_product, descending):
+    ids = [make_product(price=str(10 + i % 3)).id for i in range(7)]
+
+    order_by = [(Product.price, descending), (Product.id, descending)]
+    pages = _walk(Product.query, order_by, per_page=3)
+
+    expected = [p.id for p in sorted(
+        Product.query.all(), key=lambda p: (p.price, p.id), reverse=descending
+    )]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [i for page in pages for i in page] == expected
+    assert sorted(expected) == sorted(ids)
+
+
+def test_nullable_sort_key_puts_nulls_last_both_ways(make_product):
+    for brand in ['b', None, 'a', None, 'c']:
+        make_product(brand=brand)
+
+    order_by = [(Product.brand, False), (Product.id, False)]
+    forward = _walk(Product.query, order_by, per_page=2)
+    flat = [i for page in forward for i in page]
+    brands = [Product.query.filter_by(id=i).one().brand for i in flat]
+    assert brands == ['a', 'b', 'c', None, None]
+
+    # Walk back from the last page with prev cursors
+    last = keyset_paginate(Product.query, order_by, per_page=2, cursor=encode_cursor(
+        [brands[3], flat[3]], 'next'
+    ))
+    assert [p.id for p in last.items] == flat[4:]
+    back = keyset_paginate(Product.query, order_by, per_page=2, cursor=last.prev_cursor)
+    assert [p.id for p in back.items] == flat[2:4]
+    assert back.next_cursor is not None
+
+
+@pytest.mark.parametrize('forward', [True, False])
+def test_order_history_seek_matches_its_index(forward):
+    order_by = [(Order.created_at, True), (Order.id, True)]
+    statement = select(Order.id).filter(
+        _seek_condition(order_by, [datetime(2025, 1, 2), 42], forward)
+    ).order_by(*[_order_clause(c, d, forward) for c, d in order_by])
+
+    sql = ' '.join(str(statement.compile(dialect=postgresql.dialect())).split())
+
+    # One row-value range and a plain ORDER BY, both served by scanning
+    # ix_orders_created_at_id (backward for the forward pages)
+    index = next(i for i in Order.__table__.indexes if i.name == 'ix_orders_created_at_id')
+    assert [c.name for c in index.columns] == ['created_at', 'id']
+    assert 'NULL' not in sql
+    if forward:
+        assert '(orders.created_at, orders.id) < (' in sql
+        assert sql.endswith('ORDER BY orders.created_at DESC, orders.id DESC')
+    else:
+        assert '(orders.created_at, orders.id) > (' in sql
+        assert sql.endswith('ORDER BY orders.created_at ASC, orders.id ASC')
+
+
+def test_first_page_has_no_prev_cursor(make_product):
+    for _ in range(3):
+        make_product()
+
+    page = keyset_paginate(Product.query, [(Product.id, False)], per_page=2)
+
+    assert page.prev_cursor is None
+    assert page.next_cursor is not None
+    assert page.total is None
+
+
+def test_listing_pages_through_cursors(client, make_product):
+    for _ in range(5):
+        make_product()
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        body = client.get(f'/api/products?per_page=2&sort_order=asc&cursor={cursor}').get_json()
+        seen.extend(p['id'] for p in body['products'])
+        cursor = body['next_cursor']
+
+    assert seen == sorted(seen) and len(seen) == 5
+    assert client.get('/api/products?cursor=garbage').status_code == 400
+
+
+def test_total_is_cached_per_filter_set(make_product):
+    make_product()
+    query = Product.query.filter_by(is_active=True)
+
+    assert count_total(query, 'products', {'is_active': True}) == (1, False)
+    make_product()
+    # Same filters, stale until the table's tag is invalidated
+    assert count_total(query, 'products', {'is_active': True, 'search': ''}) == (1, False)
+    invalidate_tags('products')
+    assert count_total(query, 'products', {'is_active': True}) == (2, False)
+
+
+def test_listing_ignores_unknown_args_for_counts(client, make_product):
+    from extensions import redis_client
+
+    make_product()
+    for junk in ('a', 'b', 'c'):
+        response = client.get(f'/api/products?include_total=true&cursor=&junk={junk}')
+        assert response.status_code == 200
+        assert response.get_json()['total'] == 1
+
+    assert len([k for k in redis_client.scan_iter('products:count:*')]) == 1
@@ -0,0 +1,39 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from config import Config
+from utils import passwords
+
+
+@pytest.mark.parametrize('method, prefix', [
+    ('scrypt', 'scrypt:32768:8:1'),
+    ('scrypt:16384', 'scrypt:16384:8:1'),
+    ('scrypt:16384:4', 'scrypt:16384:4:1'),
+    ('scrypt:16384:8:1', 'scrypt:16384:8:1'),
+    ('pbkdf2', None),
+    ('pbkdf2:sha512', None),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000'),
+])
+def test_method_prefix_matches_stored_hashes(monkeypatch, method, prefix):
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', method)
+    stored = passwords.hash_password('x')
+
+    assert passwords._method_prefix(method) == stored.split('$', 1)[0]
+    assert prefix is None or stored.startswith(f'{prefix}$')
+    assert not passwords.needs_rehash(stored)
+    assert passwords.verify_password(stored, 'x')
+
+
+def test_needs_rehash_compares_without_hashing(monkeypatch):
+    stored = generate_password_hash('x', method='pbkdf2:sha256:1000')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('needs_rehash must not compute a hash')
+
+    monkeypatch.setattr(passwords, 'generate_password_hash', fail)
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    assert not passwords.needs_rehash(stored)
+
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', 'scrypt')
+    assert passwords.needs_rehash(stored)
+    assert passwords.needs_rehash(None)
@@ -0,0 +1,130 @@
+from decimal import Decimal
+
+import pytest
+
+from models import Order, OrderItem
+from utils.pricing import PricingError, insert_order_items, price_cart
+
+
+def test_prices_cart_from_catalog(make_product):
+    product = make_product(price='10.00')
+
+    priced = price_cart([{'product_id': product.id, 'quantity': 2}])
+
+    assert priced.subtotal == Decimal('20.00')
+    assert priced.tax == Decimal('2.00')
+    assert priced.shipping_cost == Decimal('5.00')
+    assert priced.total == Decimal('27.00')
+    assert priced.quantities() == {product.id: 2}
+
+
+def test_ignores_client_prices_and_totals(make_product):
+    product = make_product(price='10.00')
+
+    priced = price_cart([{'product_id': product.id, 'quantity': 1, 'price': '0.01', 'total': '0.01'}])
+
+    assert priced.lines[0]['unit_price'] == Decimal('10.00')
+    assert priced.total == Decimal('16.00')
+
+
+def test_free_shipping_from_threshold(make_product):
+    product = make_product(price='50.00')
+
+    priced = price_cart([{'product_id': product.id, 'quantity': 2}])
+
+    assert priced.subtotal == Decimal('100.00')
+    assert priced.shipping_cost == Decimal('0.00')
+    assert priced.total == Decimal('110.00')
+
+
+def test_rounds_tax_half_up(make_product):
+    product = make_product(price='0.05')
+
+    priced = price_cart([{'product_id': product.id, 'quantity': 1}])
+
+    assert priced.tax == Decimal('0.01')
+
+
+def test_merges_repeated_products(make_product):
+    first = make_product(name='First')
+    second = make_product(name='Second', price='2.50')
+
+    priced = price_cart([
+        {'product_id': first.id, 'quantity': 1},
+        {'id': second.id, 'quantity': 2},
+        {'product_id': first.id, 'quantity': 3}
+    ])
+
+    assert priced.quantities() == {first.id: 4, second.id: 2}
+    assert priced.subtotal == Decimal('45.00')
+    assert [line['product_name'] for line in priced.lines] == ['First', 'Second']
+
+
+@pytest.mark.parametrize('items', [
+    [],
+    None,
+    [{'product_id': 1, 'quantity': 0}],
+    [{'product_id': 1, 'quantity': -2}],
+    [{'product_id': 'abc', 'quantity': 1}],
+    [{'quantity': 1}],
+    ['abc'],
+    [5],
+    'abc',
+    {'product_id': 1}
+])
+def test_rejects_malformed_carts(make_product, items):
+    make_product()
+
+    with pytest.raises(PricingError):
+        price_cart(items)
+
+
+@pytest.mark.parametrize('url, body', [
+    ('/api/orders', {'items': ['abc', 5]}),
+    ('/api/payments/paypal/create-order', {'items': ['abc', 5]}),
+    ('/api/payments/paypal/capture-order', {
+        'payment_id': 'PAY-1', 'payer_id': 'PAYER-1', 'order_data': {'items': ['abc', 5]}
+    }),
+])
+def test_malformed_items_are_client_errors(client, user_headers, url, body):
+    response = client.post(url, headers=user_headers, json=body)
+
+    assert response.status_code == 400
+    assert 'product_id' in response.get_json()['error']
+
+
+def test_rejects_unknown_and_inactive_products(make_product):
+    inactive = make_product(is_active=False)
+
+    with pytest.raises(PricingError, match='not available'):
+        price_cart([{'product_id': inactive.id, 'quantity': 1}])
+    with pytest.raises(PricingError, match='not available'):
+        price_cart([{'product_id': 9999, 'quantity': 1}])
+
+
+def test_locked_pricing_returns_products(make_product):
+    product = make_product()
+
+    priced = price_cart([{'product_id': product.id, 'quantity': 1}], lock=True)
+
+    assert priced.products == {product.id: product}
+
+
+def test_insert_order_items_snapshots_lines(db, make_product, user):
+    product = make_product(name='Desk Lamp', price='12.50')
+    priced = price_cart([{'product_id': product.id, 'quantity': 2}])
+    order = Order(order_number='ORD-TEST-1', user_id=user.id, **priced.order_fields())
+    db.session.add(order)
+    db.session.flush()
+
+    insert_order_items(order, priced)
+    db.session.commit()
+    product.name = 'Renamed'
+    db.session.commit()
+
+    item = OrderItem.query.filter_by(order_id=order.id).one()
+    assert item.product_name == 'Desk Lamp'
+    assert item.product_sku == product.sku
+    assert item.quantity == 2
+    assert item.unit_price == Decimal('12.50')
+    assert item.total_price == Decimal('25.00')
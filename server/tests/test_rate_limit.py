@@ -0,0 +1,22 @@
+from utils import rate_limit
+
+
+def test_blueprint_limit_covers_undecorated_views(client, user_headers, monkeypatch):
+    monkeypatch.setattr(rate_limit, '_limits', {'payments': (2, 60)})
+    url = '/api/payments/paypal/capture-order'
+
+    statuses = [client.post(url, headers=user_headers, json={}).status_code for _ in range(3)]
+
+    assert statuses == [400, 400, 429]
+    assert client.post(url, json={}).headers['Retry-After']
+    # Other blueprints are not limited
+    assert client.get('/api/products').status_code == 200
+
+
+def test_decorated_views_are_counted_once(client, user, monkeypatch):
+    monkeypatch.setattr(rate_limit, '_limits', {'auth': (2, 60)})
+    credentials = {'email': user.email, 'password': 'wrong'}
+
+    statuses = [client.post('/api/auth/login', json=credentials).status_code for _ in range(3)]
+
+    assert statuses == [401, 401, 429]
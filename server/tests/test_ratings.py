@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from models import Product, ProductRating
+from utils.ratings import apply_rating_change, serialize_products
+
+
+@contextmanager
+def _count_queries(db):
+    """Collect the SQL statements run inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def _rated_products(db, make_product, user, count):
+    """Products each rated by the user, with their summaries kept in step."""
+    products = [make_product() for _ in range(count)]
+    for star, product in enumerate(products, start=1):
+        rating = star % 5 + 1
+        db.session.add(ProductRating(product_id=product.id, user_id=user.id, rating=rating))
+        apply_rating_change(product.id, None, rating)
+    db.session.commit()
+    return [p.id for p in products]
+
+
+def _serialize_page(db, ids, user_id):
+    db.session.expire_all()
+    with _count_queries(db) as statements:
+        products = Product.query.filter(Product.id.in_(ids)).order_by(Product.id).all()
+        serialized = serialize_products(products, user_id=user_id, include_user_rating=True)
+    return serialized, statements
+
+
+def test_serialize_products_query_count_is_independent_of_page_size(db, make_product, user):
+    ids = _rated_products(db, make_product, user, 8)
+
+    _, small = _serialize_page(db, ids[:2], user.id)
+    serialized, large = _serialize_page(db, ids, user.id)
+
+    assert len(large) == len(small)
+    # One batched lookup of the caller's ratings, none per product
+    assert len([s for s in large if 'product_ratings' in s]) == 1
+    assert [p['your_rating'] for p in serialized] == [star % 5 + 1 for star in range(1, 9)]
+    assert [p['reviews'] for p in serialized] == [1] * 8
+    assert {p['category']['product_count'] for p in serialized} == {8}
+
+
+def test_anonymous_listing_skips_the_ratings_lookup(db, make_product, user):
+    ids = _rated_products(db, make_product, user, 3)
+
+    serialized, statements = _serialize_page(db, ids, None)
+
+    assert not [s for s in statements if 'product_ratings' in s]
+    assert [p['your_rating'] for p in serialized] == [None] * 3
+    assert serialized[0]['rating'] == 2.0
+
+
+def test_rating_refreshes_the_product_but_keeps_cached_listings(client, make_product, user_headers):
+    product = make_product()
+    client.get('/api/products')
+    client.get(f'/api/products/{product.id}')
+
+    response = client.post(f'/api/products/{product.id}/rate', headers=user_headers, json={'rating': 4})
+    assert response.status_code == 200
+
+    detail = client.get(f'/api/products/{product.id}')
+    assert detail.headers['X-Cache'] == 'MISS'
+    assert detail.get_json()['product']['rating'] == 4.0
+    assert client.get('/api/products').headers['X-Cache'].startswith('HIT')
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from models import Product
+from utils.schema import upgrade_schema
+
+
+def _columns(db, table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def test_fresh_schema_needs_no_upgrade(db):
+    assert upgrade_schema() is False
+
+
+def test_adds_rating_summaries_and_dedupes_ratings(db, make_product, user):
+    user_id = user.id
+    product_id = make_product().id
+    # A products table from before the summaries, and ratings without the constraint
+    for name in ['rating_sum', 'rating_count'] + [f'rating_{star}' for star in range(1, 6)]:
+        db.session.execute(text(f'ALTER TABLE products DROP COLUMN {name}'))
+    db.session.execute(text('DROP TABLE product_ratings'))
+    db.session.execute(text(
+        'CREATE TABLE product_ratings (id INTEGER PRIMARY KEY, product_id INTEGER NOT NULL, '
+        'user_id INTEGER NOT NULL, rating INTEGER NOT NULL, created_at DATETIME, updated_at DATETIME)'
+    ))
+    db.session.execute(text(
+        'INSERT INTO product_ratings (product_id, user_id, rating) VALUES (:p, :u, 2), (:p, :u, 5)'
+    ), {'p': product_id, 'u': user_id})
+    db.session.commit()
+    # Start from fresh connections, as a restarted app would; SQLite can
+    # reject re-adding a column on the connection that dropped it
+    db.session.remove()
+    db.engine.dispose()
+
+    assert upgrade_schema() is True
+
+    assert 'rating_5' in _columns(db, 'products')
+    db.session.expire_all()
+    upgraded = Product.query.filter_by(id=product_id).one()
+    assert (upgraded.rating_count, upgraded.rating_sum, upgraded.rating_5) == (1, 5, 1)
+    with pytest.raises(IntegrityError):
+        db.session.execute(text(
+            'INSERT INTO product_ratings (product_id, user_id, rating) VALUES (:p, :u, 3)'
+        ), {'p': product_id, 'u': user_id})
+    db.session.rollback()
+
+    assert upgrade_schema() is False
+
+
+def test_adds_the_reservation_flag_and_payment_to_orders(db, client, make_product, user_headers):
+    product_id = make_product(stock=3).id
+    db.session.execute(text('ALTER TABLE orders DROP COLUMN inventory_reserved'))
+    db.session.execute(text('DROP INDEX ix_orders_payment_id'))
+    db.session.execute(text('ALTER TABLE orders DROP COLUMN payment_id'))
+    db.session.commit()
+    db.session.remove()
+    db.engine.dispose()
+
+    assert upgrade_schema() is True
+
+    response = client.post('/api/orders', headers=user_headers, json={
+        'items': [{'product_id': product_id, 'quantity': 1}]
+    })
+    assert response.status_code == 201
+    assert response.get_json()['order']['inventory_reserved'] is True
+    assert 'ix_orders_payment_id' in {
+        i['name'] for i in inspect(db.engine).get_indexes('orders') if i['unique']
+    }
+
+
+def test_adds_the_order_history_index(db):
+    db.session.execute(text('DROP INDEX ix_orders_created_at_id'))
+    db.session.commit()
+
+    assert upgrade_schema() is True
+
+    assert 'ix_orders_created_at_id' in {i['name'] for i in inspect(db.engine).get_indexes('orders')}
+    assert upgrade_schema() is False
@@ -1,28 +1,130 @@
+"""
+Authorization helpers.
+
+Access tokens carry the user's is_admin / is_active flags as claims. Because
+claims can go stale, admin checks confirm them against a user-status map kept
+in a Redis hash (and briefly in process memory), which is refreshed whenever
+those flags change. The database is only consulted when the map has no entry,
+and such fills never replace an existing entry (HSETNX), so a fill that read the
+database just before a change cannot overwrite the entry written for it.
+"""
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from extensions import redis_client
 from models.user import User
+from utils.cache import LocalCache
+
+USER_STATUS_KEY = 'auth:user_status'
+USER_STATUS_LOCAL_TTL = 5  # seconds a process trusts its own copy of a status
+
+# Sentinel stored for ids with no user, so repeated lookups stay off the database
+_MISSING = 'none'
+
+_local_status = LocalCache(4096)
+
+
+def user_claims(user):
+    """Additional JWT claims for a user's tokens."""
+    return {'is_admin': bool(user.is_admin), 'is_active': bool(user.is_active)}
+
+
+def _encode_status(user):
+    if user is None:
+        return _MISSING
+    return f"{int(bool(user.is_admin))}{int(bool(user.is_active))}"
+
+
+def _decode_status(value):
+    if value == _MISSING:
+        return None
+    return {'is_admin': value[0] == '1', 'is_active': value[1] == '1'}
+
+
+def get_user_status(user_id):
+    """
+    Current is_admin / is_active flags of a user.
+
+    Returns:
+        dict: {'is_admin': bool, 'is_active': bool}, or None if the user does not exist
+    """
+    user_id = str(user_id)
+    value = _local_status.get(user_id)
+    if value is None:
+        try:
+            value = redis_client.hget(USER_STATUS_KEY, user_id)
+        except Exception as e:
+            print(f"User status lookup error: {e}")
+        if value is None:
+            value = _encode_status(User.query.get(user_id))
+            try:
+                if not redis_client.hsetnx(USER_STATUS_KEY, user_id, value):
+                    # A refresh landed since we looked; it is newer than our read
+                    value = redis_client.hget(USER_STATUS_KEY, user_id) or value
+            except Exception as e:
+                print(f"User status store error: {e}")
+        _local_status.set(user_id, value, USER_STATUS_LOCAL_TTL)
+    return _decode_status(value)
+
+
+def refresh_user_status(user):
+    """Record a user's current flags; call after committing a change to them."""
+    _local_status.delete(str(user.id))
+    try:
+        redis_client.hset(USER_STATUS_KEY, str(user.id), _encode_status(user))
+    except Exception as e:
+        print(f"User status store error: {e}")
+
+
+def forget_user_status(user_id):
+    """Record that a user was deleted; call after committing the delete."""
+    _local_status.delete(str(user_id))
+    try:
+        # Keep an entry rather than deleting it, so a late fill cannot bring
+        # the user back
+        redis_client.hset(USER_STATUS_KEY, str(user_id), _MISSING)
+    except Exception as e:
+        print(f"User status store error: {e}")
+
+
+def check_admin():
+    """
+    Check that the current JWT belongs to an active admin.
+
+    Returns:
+        None if authorized, otherwise a (response, status) error tuple
+    """
+    verify_jwt_in_request()
+    claims = get_jwt()
+
+    # Tokens that never carried admin rights can be rejected from the claims alone
+    if claims.get('is_admin') is False:
+        return jsonify({'error': 'Admin privileges required'}), 403
+
+    status = get_user_status(get_jwt_identity())
+
+    if status is None:
+        return jsonify({'error': 'User not found'}), 404
+
+    if not status['is_admin']:
+        return jsonify({'error': 'Admin privileges required'}), 403
+
+    if not status['is_active']:
+        return jsonify({'error': 'Account is inactive'}), 403
+
+    return None
 
 
 def admin_required(fn):
     """Decorator to require admin privileges."""
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        if not user.is_admin:
-            return jsonify({'error': 'Admin privileges required'}), 403
-        
-        if not user.is_active:
-            return jsonify({'error': 'Account is inactive'}), 403
-        
+        error = check_admin()
+        if error:
+            return error
+
         return fn(*args, **kwargs)
-    
+
     return wrapper
 
 
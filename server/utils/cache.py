@@ -1,7 +1,76 @@
+"""
+Two-tier response and value cache.
+
+Entries live in Redis and, for hot keys, in a bounded per-process LRU in front
+of it. Invalidation is by tag: every tag has a generation counter that is
+embedded in the keys built under it, so bumping the counter orphans old entries
+in both tiers at once. Bumps are broadcast on a Redis pub/sub channel so every
+worker drops its locally cached generation immediately; the local TTL bounds
+staleness if a message is ever missed.
+"""
 from extensions import redis_client
+from config import Config
+from utils import metrics, pubsub
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
 from functools import wraps
-from flask import request
+from urllib.parse import urlencode
+from flask import request, make_response, current_app
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+
+class LocalCache:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalCache(Config.LOCAL_CACHE_MAX_ENTRIES)
+
+# Bumped whenever local generations are evicted, so a lookup that raced with an
+# eviction does not store the generation it read before it
+_eviction_epoch = 0
 
 
 def cache_key(*args, **kwargs):
@@ -11,57 +80,238 @@ def cache_key(*args, **kwargs):
     return ':'.join(key_parts)
 
 
-def get_cache(key):
-    """Get value from Redis cache."""
+def _generation_key(tag):
+    return f"gen:{tag}"
+
+
+def _evict_generations(tags):
+    global _eviction_epoch
+    _eviction_epoch += 1
+    local_cache.delete(*[_generation_key(t) for t in tags])
+
+
+def _evict_all_generations():
+    global _eviction_epoch
+    _eviction_epoch += 1
+    local_cache.clear()
+
+
+pubsub.subscribe(
+    INVALIDATION_CHANNEL,
+    lambda data: _evict_generations(json.loads(data)),
+    on_reset=_evict_all_generations
+)
+
+
+def get_generations(tags):
+    """
+    Current generation of each tag; a tag that was never invalidated is at 0.
+    """
+    if not tags:
+        return []
+    pubsub.ensure_listener()
+    keys = [_generation_key(t) for t in tags]
+    # Local generations are only trustworthy while invalidations are being received
+    generations = [local_cache.get(k) if pubsub.connected() else None for k in keys]
+    missing = [i for i, generation in enumerate(generations) if generation is None]
+    if missing:
+        epoch = _eviction_epoch
+        fetched = redis_client.mget([keys[i] for i in missing])
+        for i, generation in zip(missing, fetched):
+            generations[i] = int(generation or 0)
+            if epoch == _eviction_epoch:
+                local_cache.set(keys[i], generations[i], Config.LOCAL_CACHE_TTL)
+    return generations
+
+
+def tagged_key(key, tags):
+    """
+    Embed the current generation of each tag in a cache key.
+
+    Invalidating a tag bumps its generation, so keys built before the bump are
+    never read again and simply expire. Returns None if Redis is unavailable.
+    """
+    if not tags:
+        return key
     try:
-        value = redis_client.get(key)
-        if value:
-            return json.loads(value)
+        generations = get_generations(tags)
+    except Exception as e:
+        print(f"Cache generation error: {e}")
+        return None
+    return f"{key}:g:{'.'.join(str(g) for g in generations)}"
+
+
+def _get_raw(key, tier=None):
+    """Raw cached string, checking the local tier before Redis."""
+    value = local_cache.get(key)
+    if value is not None:
+        metrics.incr('cache.local.hits')
+        if tier is not None:
+            tier.append('local')
+        return value
+    metrics.incr('cache.local.misses')
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(key)
+        pipe.ttl(key)
+        value, ttl = pipe.execute()
     except Exception as e:
         print(f"Cache get error: {e}")
-    return None
+        return None
+    if value is None:
+        metrics.incr('cache.redis.misses')
+        return None
+    metrics.incr('cache.redis.hits')
+    if tier is not None:
+        tier.append('redis')
+    # Never keep the local copy longer than Redis would
+    local_cache.set(key, value, min(ttl, Config.LOCAL_CACHE_TTL))
+    return value
 
 
-def set_cache(key, value, ttl=300):
-    """Set value in Redis cache with TTL in seconds."""
+def _set_raw(key, value, ttl):
+    local_cache.set(key, value, min(ttl, Config.LOCAL_CACHE_TTL))
     try:
-        redis_client.setex(key, ttl, json.dumps(value))
+        redis_client.setex(key, ttl, value)
     except Exception as e:
         print(f"Cache set error: {e}")
 
 
-def delete_cache(pattern):
-    """Delete cache keys matching pattern."""
+def get_cache(key):
+    """Get value from the local tier or Redis."""
+    value = _get_raw(key)
+    if value:
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            print(f"Cache decode error: {e}")
+    return None
+
+
+def set_cache(key, value, ttl=300):
+    """Set value in both cache tiers with TTL in seconds."""
+    _set_raw(key, json.dumps(value), ttl)
+
+
+def invalidate_tags(*tags):
+    """Invalidate every cache entry built under any of the given tags (O(1) per tag)."""
+    if not tags:
+        return
+    # Drop our own copies first so this process reads its writes
+    _evict_generations(tags)
     try:
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
+        pipe = redis_client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(_generation_key(tag))
+        pipe.publish(INVALIDATION_CHANNEL, json.dumps(list(tags)))
+        pipe.execute()
     except Exception as e:
-        print(f"Cache delete error: {e}")
+        print(f"Cache invalidate error: {e}")
+
+
+def cache_stats():
+    """Hit/miss counters per tier for this process."""
+    counters = metrics.snapshot()['counters']
+    stats = {
+        tier: {
+            'hits': counters.get(f'cache.{tier}.hits', 0),
+            'misses': counters.get(f'cache.{tier}.misses', 0)
+        }
+        for tier in ('local', 'redis')
+    }
+    stats['local']['entries'] = len(local_cache)
+    return stats
+
+
+def _normalized_query():
+    """Query string with args sorted so equivalent requests share a cache entry."""
+    return urlencode(sorted(request.args.items(multi=True)))
+
 
+def _not_modified(etag, last_modified):
+    """Whether the request's validators still match the current representation."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return request.if_modified_since >= last_modified
+    return False
 
-def cached(prefix, ttl=300):
-    """Decorator to cache function results."""
+
+def _pack_entry(body):
+    """
+    Stored form of a cached response: its validators, then the body.
+
+    The ETag hashes the body itself, so a body rebuilt after its entry expired
+    gets a new validator whenever its content changed, whether or not any tag
+    was invalidated in between.
+    """
+    etag = hashlib.sha1(body.encode()).hexdigest()[:20]
+    return f"{etag} {int(time.time())} {body}"
+
+
+def _unpack_entry(raw):
+    """(etag, last modified, body) of a stored entry, or None if it is malformed."""
+    parts = raw.split(' ', 2)
+    if len(parts) != 3 or len(parts[0]) != 20 or not parts[1].isdigit():
+        return None
+    etag, modified, body = parts
+    return etag, datetime.fromtimestamp(int(modified), timezone.utc), body
+
+
+def cached(prefix, ttl=300, tags=None, personalized=True):
+    """
+    Decorator to cache a public GET endpoint's JSON response.
+
+    Entries are keyed by path and normalized query string and served from the
+    local tier when possible (X-Cache: HIT-LOCAL, HIT-REDIS or MISS). Responses
+    carry a weak ETag hashed from the cached body and a Last-Modified from when
+    it was built, both stored with the entry, so a revalidating client gets a
+    304 without the database being queried or the body being serialized.
+
+    Args:
+        prefix: Cache key prefix
+        ttl: Time to live in seconds
+        tags: List of tags, or a callable taking the view's kwargs and
+            returning one; invalidate_tags() on any of them drops the entry
+        personalized: Whether responses may depend on the caller; if so,
+            requests carrying an Authorization header bypass the cache
+    """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            # Generate cache key from function name and arguments
-            key = cache_key(prefix, request.full_path if request else '')
-            
-            # Try to get from cache
-            cached_value = get_cache(key)
-            if cached_value is not None:
-                return cached_value
-            
-            # Execute function and cache result
-            result = f(*args, **kwargs)
-            set_cache(key, result, ttl)
-            return result
-        
-        return wrapper
-    return decorator
+            if personalized and request.headers.get('Authorization'):
+                return f(*args, **kwargs)
+
+            entry_tags = tags(**kwargs) if callable(tags) else tags
+            key = tagged_key(cache_key(prefix, request.path, _normalized_query()), entry_tags)
+            if key is None:
+                return f(*args, **kwargs)
+
+            def with_validators(response, entry, status):
+                etag, last_modified, _ = entry
+                if _not_modified(etag, last_modified):
+                    metrics.incr('cache.not_modified')
+                    response, status = current_app.response_class(status=304), 'NOT-MODIFIED'
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                # Let clients keep the body but revalidate before reuse
+                response.headers['Cache-Control'] = 'no-cache'
+                response.headers['X-Cache'] = status
+                return response
 
+            tier = []
+            raw = _get_raw(key, tier)
+            entry = _unpack_entry(raw) if raw is not None else None
+            if entry is not None:
+                response = current_app.response_class(entry[2], mimetype='application/json')
+                return with_validators(response, entry, f'HIT-{tier[0].upper()}')
 
-def invalidate_cache(prefix):
-    """Invalidate all cache entries with given prefix."""
-    delete_cache(f"{prefix}:*")
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+            raw = _pack_entry(response.get_data(as_text=True))
+            _set_raw(key, raw, ttl)
+            return with_validators(response, _unpack_entry(raw), 'MISS')
+
+        return wrapper
+    return decorator
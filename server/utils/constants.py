@@ -0,0 +1,112 @@
+"""
+Process-wide snapshot of the store constants (tax rate, shipping fee, ...).
+
+Constants are loaded once per process and read from memory afterwards. Admin
+updates bump a version counter in Redis; each process compares it with the
+version of its own snapshot at most every SYNC_INTERVAL seconds and reloads
+when they differ.
+"""
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from extensions import redis_client
+
+VERSION_KEY = 'constants:version'
+SYNC_INTERVAL = 2  # seconds between Redis version checks per process
+
+# Known constants with their types and defaults
+CONSTANT_TYPES = {
+    'tax': (Decimal, Decimal('0.1')),
+    'shipping_fee': (Decimal, Decimal('5.0')),
+    'free_shipping_threshold': (Decimal, Decimal('100')),
+}
+
+
+def _coerce(key, value):
+    kind, default = CONSTANT_TYPES[key]
+    try:
+        return kind(value)
+    except (TypeError, ValueError, InvalidOperation):
+        print(f"Invalid value for constant {key}: {value!r}")
+        return default
+
+
+class ConstantsSnapshot:
+    """Immutable view of the constants table at one version."""
+
+    def __init__(self, values, version=None):
+        self.raw = dict(values)
+        self.version = version
+        self._typed = {
+            key: _coerce(key, self.raw[key]) if key in self.raw else default
+            for key, (_, default) in CONSTANT_TYPES.items()
+        }
+
+    @property
+    def tax_rate(self):
+        return self._typed['tax']
+
+    @property
+    def shipping_fee(self):
+        return self._typed['shipping_fee']
+
+    @property
+    def free_shipping_threshold(self):
+        return self._typed['free_shipping_threshold']
+
+    def get(self, key, default=None):
+        """Typed value for known keys, raw string otherwise."""
+        if key in self._typed:
+            return self._typed[key]
+        return self.raw.get(key, default)
+
+
+_snapshot = None
+_last_sync = 0.0
+_load_lock = threading.Lock()
+
+
+def _get_remote_version():
+    try:
+        return int(redis_client.get(VERSION_KEY) or 0)
+    except Exception as e:
+        print(f"Constants version check error: {e}")
+        return None
+
+
+def load_constants():
+    """(Re)load the snapshot from the database. Requires an app context."""
+    global _snapshot, _last_sync
+    from models.constant import Constant
+
+    with _load_lock:
+        version = _get_remote_version()
+        _snapshot = ConstantsSnapshot(
+            {c.key: c.value for c in Constant.query.all()},
+            version
+        )
+        _last_sync = time.monotonic()
+    return _snapshot
+
+
+def get_constants_snapshot():
+    """Current snapshot, reloading first if another process changed the constants."""
+    global _last_sync
+    if _snapshot is None:
+        return load_constants()
+    now = time.monotonic()
+    if now - _last_sync >= SYNC_INTERVAL:
+        _last_sync = now
+        remote = _get_remote_version()
+        if remote is not None and remote != _snapshot.version:
+            return load_constants()
+    return _snapshot
+
+
+def bump_constants_version():
+    """Tell every process, this one included, to reload after a committed change."""
+    try:
+        redis_client.incr(VERSION_KEY)
+    except Exception as e:
+        print(f"Constants version bump error: {e}")
+    load_constants()
@@ -0,0 +1,207 @@
+"""
+Stock reservation and release.
+
+Checkout reserves stock for the whole cart with one conditional UPDATE, so
+concurrent checkouts can never oversell. Product rows are always locked in id
+order first (SELECT ... ORDER BY id FOR UPDATE) so that transactions touching
+overlapping carts cannot deadlock. Reserved stock is returned when the order is
+cancelled or its payment fails, and taken again if that payment is later
+marked paid; shipping a reserved order then only bumps sales counts.
+"""
+import time
+from sqlalchemy import case, func, update
+from extensions import db
+from models.order import OrderItem
+from models.product import Product
+from utils import metrics
+
+
+class InsufficientStock(Exception):
+    """Raised when a cart asks for more units than are in stock."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ', '.join(s['name'] for s in shortages)
+        super().__init__(f'Insufficient stock for: {names}')
+
+
+def lock_products(product_ids):
+    """
+    Load and row-lock products in id order with one IN query.
+
+    Returns:
+        dict: {product_id: Product}
+    """
+    if not product_ids:
+        return {}
+    start = time.perf_counter()
+    products = (
+        Product.query
+        .filter(Product.id.in_(sorted(set(product_ids))))
+        .order_by(Product.id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    )
+    metrics.observe('inventory.lock_wait', time.perf_counter() - start)
+    return {p.id: p for p in products}
+
+
+def _by_product(quantities):
+    """CASE expression mapping products.id to its quantity."""
+    return case(quantities, value=Product.id, else_=0)
+
+
+def _expire_stock(products):
+    # The UPDATEs below bypass the identity map
+    for product in products:
+        db.session.expire(product, ['stock_quantity', 'sales_count'])
+
+
+def reserve_stock(quantities, products):
+    """
+    Take stock for a cart in a single conditional UPDATE.
+
+    Args:
+        quantities: {product_id: quantity}
+        products: Products locked with lock_products()
+
+    Raises:
+        InsufficientStock: If any tracked product is short; the caller must
+            roll back, since other rows of the statement may have been updated
+    """
+    tracked = {
+        pid: qty for pid, qty in quantities.items()
+        if pid in products and products[pid].track_inventory
+    }
+    if not tracked:
+        return
+
+    delta = _by_product(tracked)
+    start = time.perf_counter()
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(list(tracked)), Product.stock_quantity >= delta)
+        .values(stock_quantity=Product.stock_quantity - delta)
+        .execution_options(synchronize_session=False)
+    )
+    metrics.observe('inventory.reserve', time.perf_counter() - start)
+
+    if result.rowcount != len(tracked):
+        metrics.incr('inventory.conflicts')
+        shortages = [
+            {
+                'product_id': pid,
+                'name': products[pid].name,
+                'requested': qty,
+                'available': max(products[pid].stock_quantity or 0, 0)
+            }
+            for pid, qty in tracked.items()
+            if (products[pid].stock_quantity or 0) < qty
+        ]
+        raise InsufficientStock(shortages)
+
+    metrics.incr('inventory.reserved')
+    _expire_stock(products.values())
+
+
+def order_quantities(order_ids):
+    """Units per product across orders, from one grouped query."""
+    if not order_ids:
+        return {}
+    rows = (
+        db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .filter(OrderItem.order_id.in_(list(order_ids)))
+        .group_by(OrderItem.product_id)
+        .all()
+    )
+    return {pid: int(qty or 0) for pid, qty in rows if pid is not None}
+
+
+def _adjust_stock(quantities, products, sign):
+    tracked = {pid: qty for pid, qty in quantities.items() if pid in products and products[pid].track_inventory}
+    if tracked:
+        delta = _by_product(tracked)
+        stock = func.coalesce(Product.stock_quantity, 0)
+        # Never drive stock below zero when shipping orders that were not reserved
+        new_stock = stock + delta if sign > 0 else case((stock > delta, stock - delta), else_=0)
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(list(tracked)))
+            .values(stock_quantity=new_stock)
+            .execution_options(synchronize_session=False)
+        )
+    return list(tracked)
+
+
+def release_stock(orders):
+    """
+    Put back the stock reserved by orders (on cancellation or payment failure).
+
+    Orders without a reservation are skipped. Returns the ids of products
+    whose stock changed.
+    """
+    reserved = [o for o in orders if o.inventory_reserved]
+    if not reserved:
+        return []
+    quantities = order_quantities([o.id for o in reserved])
+    products = lock_products(list(quantities))
+    changed = _adjust_stock(quantities, products, +1)
+    _expire_stock(products.values())
+    for order in reserved:
+        order.inventory_reserved = False
+    metrics.incr('inventory.released', len(reserved))
+    return changed
+
+
+def reserve_order_stock(orders):
+    """
+    Take stock again for unshipped orders whose reservation was released.
+
+    Orders that still hold a reservation or have shipped are skipped. Returns
+    the ids of products whose stock changed.
+
+    Raises:
+        InsufficientStock: If any product is short; the caller must roll back
+    """
+    unreserved = [o for o in orders if not o.inventory_reserved and not o.shipped_at]
+    if not unreserved:
+        return []
+    quantities = order_quantities([o.id for o in unreserved])
+    products = lock_products(list(quantities))
+    changed = [pid for pid in quantities if pid in products and products[pid].track_inventory]
+    reserve_stock(quantities, products)
+    for order in unreserved:
+        order.inventory_reserved = True
+    return changed
+
+
+def record_shipment(orders):
+    """
+    Apply stock and sales_count changes for shipped orders.
+
+    Reserved orders already took their stock at checkout, so only sales counts
+    move; orders placed without a reservation have their stock deducted now.
+    Returns the ids of products that changed.
+    """
+    if not orders:
+        return []
+    sold = order_quantities([o.id for o in orders])
+    products = lock_products(list(sold))
+    changed = set(sold)
+
+    unreserved = [o.id for o in orders if not o.inventory_reserved]
+    if unreserved:
+        _adjust_stock(order_quantities(unreserved), products, -1)
+
+    if sold:
+        db.session.execute(
+            update(Product)
+            .where(Product.id.in_(list(sold)))
+            .values(sales_count=func.coalesce(Product.sales_count, 0) + _by_product(sold))
+            .execution_options(synchronize_session=False)
+        )
+    _expire_stock(products.values())
+    for order in orders:
+        order.inventory_reserved = False
+    return sorted(changed)
@@ -0,0 +1,216 @@
+"""
+Sales leaderboards in Redis sorted sets.
+
+Paid orders add to four sorted sets, all-time and per UTC day (by the order's
+creation date, like the daily rollups):
+
+    lb:products:units     product id -> units sold
+    lb:products:revenue   product id -> revenue in cents
+    lb:customers:spend    user id -> spend in cents
+    lb:customers:orders   user id -> paid orders
+
+Refunds and other moves out of Paid subtract again. Top-N reads are a
+ZREVRANGE plus a ZMSCORE. Per-day sets expire after DAILY_RETENTION_DAYS;
+windows of several days are unioned on demand and cached briefly.
+
+Until rebuild_leaderboards() has run (BUILT_KEY is set), readers return None
+and callers fall back to SQL, so a new or flushed Redis never serves partial
+history.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func
+from extensions import db, redis_client
+from models.order import Order, OrderItem, PaymentStatus
+
+PRODUCT_UNITS = 'lb:products:units'
+PRODUCT_REVENUE = 'lb:products:revenue'
+CUSTOMER_SPEND = 'lb:customers:spend'
+CUSTOMER_ORDERS = 'lb:customers:orders'
+LEADERBOARD_KEYS = (PRODUCT_UNITS, PRODUCT_REVENUE, CUSTOMER_SPEND, CUSTOMER_ORDERS)
+BUILT_KEY = 'lb:built'
+DAILY_RETENTION_DAYS = 366
+WINDOW_CACHE_TTL = 60  # seconds
+
+
+def _cents(value):
+    return int((Decimal(str(value or 0)) * 100).to_integral_value())
+
+
+def _day_key(key, day):
+    return f'{key}:{day:%Y%m%d}'
+
+
+def _day_expiry(day):
+    """Unix time at which a day's sets expire."""
+    return calendar.timegm((day + timedelta(days=DAILY_RETENTION_DAYS + 1)).timetuple())
+
+
+def order_scores(order):
+    """Leaderboard contributions of one order (loads its items)."""
+    return {
+        'day': (order.created_at or datetime.utcnow()).date(),
+        'user_id': order.user_id,
+        'spend': _cents(order.total),
+        'items': [
+            (item.product_id, item.quantity or 0, _cents(item.total_price))
+            for item in order.items if item.product_id
+        ]
+    }
+
+
+def apply_scores(scores, sign):
+    """Add (sign=1) or subtract (sign=-1) an order's contributions."""
+    day = scores['day']
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for keyed in (lambda key: key, lambda key: _day_key(key, day)):
+            for product_id, quantity, cents in scores['items']:
+                pipe.zincrby(keyed(PRODUCT_UNITS), sign * quantity, product_id)
+                pipe.zincrby(keyed(PRODUCT_REVENUE), sign * cents, product_id)
+            pipe.zincrby(keyed(CUSTOMER_SPEND), sign * scores['spend'], scores['user_id'])
+            pipe.zincrby(keyed(CUSTOMER_ORDERS), sign, scores['user_id'])
+            if sign < 0:
+                # Drop members a refund brought back to zero
+                for key in LEADERBOARD_KEYS:
+                    pipe.zremrangebyscore(keyed(key), '-inf', 0)
+        for key in LEADERBOARD_KEYS:
+            pipe.expireat(_day_key(key, day), _day_expiry(day))
+        pipe.execute()
+    except Exception as e:
+        print(f"Leaderboard update error: {e}")
+
+
+def update_leaderboards(order, old_status):
+    """
+    Apply an order's payment status change; call after the change is committed.
+
+    Args:
+        order: Order carrying its new payment_status
+        old_status: Payment status before the change, or None for a new order
+    """
+    was_paid = old_status == PaymentStatus.PAID.value
+    is_paid = order.payment_status == PaymentStatus.PAID.value
+    if was_paid != is_paid:
+        apply_scores(order_scores(order), 1 if is_paid else -1)
+
+
+def _source_key(key, days):
+    """The all-time set, or a short-lived union of the last `days` daily sets."""
+    if not days:
+        return key
+    # Older daily sets have expired; never union more keys than are kept
+    days = min(days, DAILY_RETENTION_DAYS)
+    today = datetime.utcnow().date()
+    window_key = f'{key}:last{days}:{today:%Y%m%d}'
+    if not redis_client.exists(window_key):
+        day_keys = [_day_key(key, today - timedelta(days=i)) for i in range(days)]
+        pipe = redis_client.pipeline()
+        pipe.zunionstore(window_key, day_keys)
+        pipe.expire(window_key, WINDOW_CACHE_TTL)
+        pipe.execute()
+    return window_key
+
+
+def _top(rank_key, other_key, limit, days):
+    if not redis_client.exists(BUILT_KEY):
+        return None
+    rank_source = _source_key(rank_key, days)
+    rows = [(m, s) for m, s in redis_client.zrevrange(rank_source, 0, limit - 1, withscores=True) if s > 0]
+    if not rows:
+        return []
+    others = redis_client.zmscore(_source_key(other_key, days), [m for m, _ in rows])
+    return [(int(m), score, other or 0) for (m, score), other in zip(rows, others)]
+
+
+def top_products(limit, days=None):
+    """
+    Best-selling products by units sold.
+
+    Args:
+        limit: Number of products
+        days: Only count the last N days (all time if None)
+
+    Returns:
+        list: [{'id', 'units', 'revenue'}] best first, or None if the
+            leaderboards have not been built
+    """
+    rows = _top(PRODUCT_UNITS, PRODUCT_REVENUE, limit, days)
+    if rows is None:
+        return None
+    return [{'id': pid, 'units': int(units), 'revenue': cents / 100} for pid, units, cents in rows]
+
+
+def top_customers(limit, days=None):
+    """
+    Biggest customers by paid spend.
+
+    Returns:
+        list: [{'id', 'spend', 'orders'}] best first, or None if the
+            leaderboards have not been built
+    """
+    rows = _top(CUSTOMER_SPEND, CUSTOMER_ORDERS, limit, days)
+    if rows is None:
+        return None
+    return [{'id': uid, 'spend': cents / 100, 'orders': int(orders)} for uid, cents, orders in rows]
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def rebuild_leaderboards():
+    """
+    Recompute every leaderboard from paid orders and swap them in atomically.
+
+    Returns:
+        tuple: (products, customers) ranked all-time
+    """
+    paid = Order.payment_status == PaymentStatus.PAID.value
+    order_day = func.date(Order.created_at)
+    oldest = datetime.utcnow().date() - timedelta(days=DAILY_RETENTION_DAYS)
+    sets = {}
+
+    def add(key, member, score, day):
+        for k in (key, _day_key(key, day)) if day >= oldest else (key,):
+            bucket = sets.setdefault(k, {})
+            bucket[member] = bucket.get(member, 0) + score
+
+    product_rows = db.session.query(
+        order_day, OrderItem.product_id, func.sum(OrderItem.quantity), func.sum(OrderItem.total_price)
+    ).join(Order).filter(paid, OrderItem.product_id.isnot(None)).group_by(order_day, OrderItem.product_id).all()
+    for day, product_id, quantity, revenue in product_rows:
+        day = _as_date(day)
+        add(PRODUCT_UNITS, product_id, int(quantity or 0), day)
+        add(PRODUCT_REVENUE, product_id, _cents(revenue), day)
+
+    customer_rows = db.session.query(
+        order_day, Order.user_id, func.sum(Order.total), func.count(Order.id)
+    ).filter(paid).group_by(order_day, Order.user_id).all()
+    for day, user_id, total, count in customer_rows:
+        day = _as_date(day)
+        add(CUSTOMER_SPEND, user_id, _cents(total), day)
+        add(CUSTOMER_ORDERS, user_id, count, day)
+
+    stale = set()
+    for key in LEADERBOARD_KEYS:
+        stale.update(redis_client.scan_iter(match=f'{key}*'))
+
+    # One MULTI/EXEC: readers see the old or the new leaderboards, never a mix
+    pipe = redis_client.pipeline()
+    if stale:
+        pipe.delete(*stale)
+    for key, members in sets.items():
+        members = {m: s for m, s in members.items() if s > 0}
+        if not members:
+            continue
+        pipe.zadd(key, members)
+        if key not in LEADERBOARD_KEYS:
+            day = datetime.strptime(key.rsplit(':', 1)[1], '%Y%m%d').date()
+            pipe.expireat(key, _day_expiry(day))
+    pipe.set(BUILT_KEY, datetime.utcnow().isoformat())
+    pipe.execute()
+
+    return len(sets.get(PRODUCT_UNITS, {})), len(sets.get(CUSTOMER_SPEND, {}))
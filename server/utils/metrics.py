@@ -0,0 +1,57 @@
+"""
+Per-process counters and timers.
+
+Values live in the memory of the worker process that recorded them, so with
+several gunicorn workers each one reports its own numbers.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timers = defaultdict(lambda: {'count': 0, 'total': 0.0, 'max': 0.0})
+
+
+def incr(name, amount=1):
+    """Increment a counter."""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, seconds):
+    """Record one duration sample for a timer."""
+    with _lock:
+        timer = _timers[name]
+        timer['count'] += 1
+        timer['total'] += seconds
+        timer['max'] = max(timer['max'], seconds)
+
+
+@contextmanager
+def timed(name):
+    """Context manager recording the duration of its block under name."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def snapshot():
+    """Current counters and timer summaries (milliseconds) for this process."""
+    with _lock:
+        return {
+            'pid': os.getpid(),
+            'counters': dict(_counters),
+            'timers': {
+                name: {
+                    'count': t['count'],
+                    'avg_ms': round(t['total'] / t['count'] * 1000, 3) if t['count'] else 0,
+                    'max_ms': round(t['max'] * 1000, 3)
+                }
+                for name, t in _timers.items()
+            }
+        }
@@ -0,0 +1,125 @@
+"""
+Order number generation.
+
+Numbers look like ORD-20250101-00001234: the UTC date plus a global sequence.
+Each process reserves a block of sequence values at a time with one Redis
+INCRBY of ORDER_NUMBER_BLOCK_SIZE (or one PostgreSQL nextval, per
+ORDER_NUMBER_BACKEND) and hands them out from memory, so numbers are unique
+across processes and nodes, increase monotonically within a process, and cost
+no database work per order.
+
+On PostgreSQL the block is whatever the sequence steps by: the increment is
+read from pg_sequences along with each nextval, so a sequence created with a
+different block size (or altered later) never produces overlapping blocks.
+ORDER_NUMBER_BLOCK_SIZE is only used when the sequence is first created.
+
+If the Redis key is lost, other processes may still hold blocks they reserved
+but have not used up, all above the highest number already issued. The
+counter is therefore re-seeded ORDER_NUMBER_MAX_PROCESSES + 1 blocks past
+that number, beyond any block still in use, instead of right after it.
+"""
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import text
+from config import Config
+from extensions import db, redis_client
+
+SEQUENCE_KEY = 'order_number:seq'
+PG_SEQUENCE = 'order_number_seq'
+PREFIX = 'ORD'
+# Recent orders scanned to re-seed the counter if the Redis key was lost
+RECONCILE_WINDOW = 1000
+
+
+def format_order_number(sequence, day=None):
+    """Human-readable order number for a sequence value."""
+    day = day or datetime.utcnow()
+    return f"{PREFIX}-{day:%Y%m%d}-{sequence:08d}"
+
+
+def _parse_sequence(order_number):
+    parts = (order_number or '').split('-')
+    if len(parts) == 3 and parts[0] == PREFIX and len(parts[1]) == 8 and parts[2].isdigit():
+        return int(parts[2])
+    return None
+
+
+def _max_issued_sequence():
+    """Highest sequence value among recent orders."""
+    from models.order import Order
+
+    rows = db.session.query(Order.order_number).order_by(Order.id.desc()).limit(RECONCILE_WINDOW).all()
+    return max((_parse_sequence(n) or 0 for (n,) in rows), default=0)
+
+
+class OrderNumberAllocator:
+    """Hands out sequence values from locally reserved blocks."""
+
+    def __init__(self, block_size, max_processes=Config.ORDER_NUMBER_MAX_PROCESSES):
+        self.block_size = max(int(block_size), 1)
+        self.max_processes = max(int(max_processes), 1)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # exclusive
+
+    def _reserve_from_redis(self):
+        if not redis_client.exists(SEQUENCE_KEY):
+            # First use or lost Redis data: start past numbers already issued
+            # and past the unused rest of every block another process may hold
+            margin = (self.max_processes + 1) * self.block_size
+            redis_client.set(SEQUENCE_KEY, _max_issued_sequence() + margin, nx=True)
+        end = redis_client.incrby(SEQUENCE_KEY, self.block_size)
+        return end - self.block_size + 1, self.block_size
+
+    def _reserve_from_postgres(self):
+        with db.engine.begin() as conn:
+            exists = conn.execute(text("SELECT to_regclass(:name)"), {'name': PG_SEQUENCE}).scalar()
+            if not exists:
+                conn.execute(text(
+                    f"CREATE SEQUENCE IF NOT EXISTS {PG_SEQUENCE} "
+                    f"INCREMENT BY {self.block_size} START WITH {_max_issued_sequence() + 1}"
+                ))
+            start, increment = conn.execute(text(
+                f"SELECT nextval('{PG_SEQUENCE}'), increment_by FROM pg_sequences "
+                "WHERE schemaname = current_schema() AND sequencename = :name"
+            ), {'name': PG_SEQUENCE}).one()
+            if increment < 1:
+                raise ValueError(f"{PG_SEQUENCE} must have a positive increment, not {increment}")
+            return start, increment
+
+    def _reserve(self):
+        """Reserve a block; returns (first value, block length) or None."""
+        try:
+            if Config.ORDER_NUMBER_BACKEND == 'postgres':
+                return self._reserve_from_postgres()
+            return self._reserve_from_redis()
+        except Exception as e:
+            print(f"Order number allocation error: {e}")
+            return None
+
+    def next_sequence(self):
+        """Next sequence value, or None if no counter is reachable."""
+        with self._lock:
+            if self._next >= self._end:
+                block = self._reserve()
+                if block is None:
+                    return None
+                start, size = block
+                self._next, self._end = start, start + size
+            value = self._next
+            self._next += 1
+            return value
+
+
+_allocator = OrderNumberAllocator(Config.ORDER_NUMBER_BLOCK_SIZE)
+
+
+def next_order_number():
+    """Allocate a new, unique order number."""
+    sequence = _allocator.next_sequence()
+    if sequence is None:
+        # Counter unreachable: a random 'R' suffix stays unique and can never
+        # collide with sequence numbers
+        return f"{PREFIX}-{datetime.utcnow():%Y%m%d}-R{uuid.uuid4().hex[:12].upper()}"
+    return format_order_number(sequence)
@@ -0,0 +1,265 @@
+"""
+Pagination helpers.
+
+Keyset (cursor) pagination seeks past the sort key of the last row of the
+previous page instead of using OFFSET, so deep pages cost the same as the
+first one. Cursors are opaque, URL-safe strings encoding those sort key
+values and a direction.
+
+Totals for both modes go through count_total(), which caches exact counts per
+filter set in Redis and uses planner estimates for large unfiltered tables.
+Callers pass the filters they actually applied, so unrelated query string
+arguments never create cache entries or force exact counts.
+"""
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import and_, or_, tuple_, text
+from extensions import db
+from utils.cache import cache_key, tagged_key, get_cache, set_cache
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor string cannot be decoded."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(values, direction='next'):
+    """Encode sort key values into an opaque cursor string."""
+    payload = json.dumps({'v': [_encode_value(v) for v in values], 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor string.
+
+    Returns:
+        tuple: (list of sort key values, direction 'next' or 'prev')
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        direction = payload.get('d', 'next')
+        if direction not in ('next', 'prev'):
+            raise InvalidCursor('Invalid cursor direction')
+        return [_decode_value(v) for v in payload['v']], direction
+    except InvalidCursor:
+        raise
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def resolve_sort_column(model, sort_by, default='created_at'):
+    """Return the mapped column for sort_by, falling back to default for unknown names."""
+    if sort_by not in model.__table__.columns:
+        sort_by = default
+    return getattr(model, sort_by)
+
+
+def _nullable(column):
+    return getattr(getattr(column, 'expression', column), 'nullable', True)
+
+
+def _order_clause(column, descending, forward):
+    # Forward pages order NULLs last; backward pages walk the same order in reverse
+    if descending == forward:
+        ordered = column.desc()
+    else:
+        ordered = column.asc()
+    if not _nullable(column):
+        # A plain ASC/DESC matches a (backward) scan of an ascending index;
+        # PostgreSQL cannot serve an explicit NULLS LAST from a DESC scan
+        return ordered
+    return ordered.nulls_last() if forward else ordered.nulls_first()
+
+
+def _beyond(column, descending, value, forward):
+    """Condition for rows strictly after (forward) or before (backward) value in one key."""
+    if forward:
+        if value is None:
+            return None  # nothing sorts after NULL
+        cond = column < value if descending else column > value
+        return or_(cond, column.is_(None)) if _nullable(column) else cond
+    if value is None:
+        return column.isnot(None)
+    return column > value if descending else column < value
+
+
+def _seek_condition(order_by, values, forward):
+    directions = {descending for _, descending in order_by}
+    tail_nullable = any(_nullable(column) for column, _ in order_by[1:])
+
+    # Fast path: a single row-value comparison the database can serve from a
+    # composite index, e.g. (created_at, id) < (:created_at, :id)
+    if len(directions) == 1 and None not in values and not tail_nullable:
+        descending = directions.pop()
+        columns = tuple_(*[column for column, _ in order_by])
+        bound = tuple_(*values)
+        after = columns < bound if descending == forward else columns > bound
+        first = order_by[0][0]
+        if forward and _nullable(first):
+            return or_(after, first.is_(None))
+        return after
+
+    clauses = []
+    for i, ((column, descending), value) in enumerate(zip(order_by, values)):
+        beyond = _beyond(column, descending, value, forward)
+        if beyond is None:
+            continue
+        equal = [
+            c.is_(None) if v is None else c == v
+            for (c, _), v in zip(order_by[:i], values[:i])
+        ]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses) if clauses else False
+
+
+def _planner_estimate(table):
+    """Row estimate from PostgreSQL statistics, or None if unavailable."""
+    if db.engine.dialect.name != 'postgresql':
+        return None
+    try:
+        estimate = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+            {'table': table}
+        ).scalar()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Count estimate error: {e}")
+        return None
+    # reltuples is -1 (or 0) for tables that were never analyzed
+    return estimate if estimate and estimate > 0 else None
+
+
+def count_total(query, table, filters=None):
+    """
+    Count the rows of a filtered listing query.
+
+    Unfiltered queries on tables larger than COUNT_ESTIMATE_THRESHOLD use the
+    planner's row estimate. Everything else runs COUNT(*) and caches the
+    result per (table, filters) for COUNT_CACHE_TTL seconds, tagged with the
+    table name so invalidate_tags(table) drops them on writes.
+
+    Args:
+        query: Filtered SQLAlchemy query
+        table: Table name; also the cache invalidation tag
+        filters: Dict of the filter values applied to the query, e.g.
+            {'status': 'Pending'}; None or empty when unfiltered
+
+    Returns:
+        tuple: (total, is_estimate)
+    """
+    filters = {k: v for k, v in (filters or {}).items() if v not in ('', None)}
+
+    if not filters:
+        estimate = _planner_estimate(table)
+        if estimate is not None and estimate >= current_app.config['COUNT_ESTIMATE_THRESHOLD']:
+            return estimate, True
+
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+    key = tagged_key(cache_key(table, 'count', digest), [table])
+    total = get_cache(key) if key else None
+    if total is None:
+        total = query.order_by(None).count()
+        if key:
+            set_cache(key, total, current_app.config['COUNT_CACHE_TTL'])
+    return total, False
+
+
+def paginate(query, page, per_page, table, filters=None):
+    """
+    Offset pagination whose total comes from count_total().
+
+    Returns a Flask-SQLAlchemy Pagination with an extra ``total_estimated`` flag.
+    """
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    pagination.total, pagination.total_estimated = count_total(query, table, filters)
+    return pagination
+
+
+class KeysetPage:
+    """One page of keyset-paginated results."""
+
+    def __init__(self, items, next_cursor, prev_cursor, total, per_page, total_estimated=False):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.per_page = per_page
+        self.total_estimated = total_estimated
+
+
+def keyset_paginate(query, order_by, cursor=None, per_page=20, include_total=False, table=None, filters=None):
+    """
+    Paginate a query by seeking on its sort key.
+
+    Args:
+        query: SQLAlchemy query without ORDER BY
+        order_by: List of (column, descending) pairs; the last one must be unique (e.g. id)
+        cursor: Cursor from a previous page, or None/'' for the first page
+        per_page: Page size
+        include_total: Also return the total from count_total()
+        table: Table name passed to count_total()
+        filters: Applied filters passed to count_total()
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        InvalidCursor: If the cursor cannot be decoded
+    """
+    per_page = max(per_page, 1)
+    values, direction = decode_cursor(cursor) if cursor else (None, 'next')
+    if values is not None and len(values) != len(order_by):
+        raise InvalidCursor('Cursor does not match sort order')
+    forward = direction == 'next'
+
+    total, total_estimated = count_total(query, table, filters) if include_total else (None, False)
+
+    page_query = query.order_by(*[_order_clause(c, d, forward) for c, d in order_by])
+    if values is not None:
+        page_query = page_query.filter(_seek_condition(order_by, values, forward))
+
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if not forward:
+        items.reverse()
+
+    def key_of(item):
+        return [getattr(item, column.key) for column, _ in order_by]
+
+    has_next = has_more if forward else values is not None
+    has_prev = values is not None if forward else has_more
+
+    return KeysetPage(
+        items=items,
+        next_cursor=encode_cursor(key_of(items[-1]), 'next') if items and has_next else None,
+        prev_cursor=encode_cursor(key_of(items[0]), 'prev') if items and has_prev else None,
+        total=total,
+        per_page=per_page,
+        total_estimated=total_estimated
+    )
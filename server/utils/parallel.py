@@ -0,0 +1,74 @@
+"""
+Concurrent execution of independent database work.
+
+gather() runs callables on a small per-process thread pool. Each one gets its
+own application context, and therefore its own database session and
+connection, so a handful of independent queries take about as long as the
+slowest of them instead of their sum.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config import Config
+from utils import metrics
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if Config.ANALYTICS_QUERY_WORKERS <= 0:
+        return None
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                # Threads do not survive a fork; each worker process builds its own pool
+                _executor = ThreadPoolExecutor(
+                    max_workers=Config.ANALYTICS_QUERY_WORKERS,
+                    thread_name_prefix='analytics'
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def gather(tasks, metric_prefix=None):
+    """
+    Run independent callables concurrently.
+
+    Args:
+        tasks: {name: callable taking no arguments}; each runs in its own app
+            context, so it must not use objects loaded by the calling request
+        metric_prefix: If given, each task's duration is recorded as the
+            '<metric_prefix>.<name>' timer
+
+    Returns:
+        tuple: ({name: result}, {name: elapsed milliseconds})
+
+    Raises:
+        The exception of a failing task
+    """
+    app = current_app._get_current_object()
+
+    def run(name, fn):
+        start = time.perf_counter()
+        with app.app_context():
+            result = fn()
+        elapsed = time.perf_counter() - start
+        if metric_prefix:
+            metrics.observe(f'{metric_prefix}.{name}', elapsed)
+        return result, elapsed
+
+    executor = _get_executor()
+    if executor is None:
+        outcomes = {name: run(name, fn) for name, fn in tasks.items()}
+    else:
+        futures = {name: executor.submit(run, name, fn) for name, fn in tasks.items()}
+        outcomes = {name: future.result() for name, future in futures.items()}
+
+    results = {name: result for name, (result, _) in outcomes.items()}
+    timings = {name: round(elapsed * 1000, 2) for name, (_, elapsed) in outcomes.items()}
+    return results, timings
@@ -0,0 +1,133 @@
+"""
+Password hashing off the request path.
+
+Hashing is deliberately CPU-expensive, so it runs in a small process pool
+instead of the request worker's own thread. The number of calls waiting on the
+pool is capped; beyond that, callers get PasswordHasherBusy straight away
+rather than queueing behind a login burst.
+
+The pool and the cap are per server worker process: gunicorn runs
+WEB_CONCURRENCY workers, each with its own PASSWORD_HASH_WORKERS hashing
+processes, and the cap can only be reached by a worker serving several
+requests at once (GUNICORN_THREADS > 1). config.py sizes both from those
+settings.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+from config import Config
+from utils import metrics
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hashing calls are already queued."""
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(Config.PASSWORD_HASH_MAX_PENDING, 1))
+
+
+def _timed_hash(password, method):
+    start = time.perf_counter()
+    pwhash = generate_password_hash(password, method=method)
+    return pwhash, time.perf_counter() - start
+
+
+def _timed_check(pwhash, password):
+    start = time.perf_counter()
+    ok = check_password_hash(pwhash, password)
+    return ok, time.perf_counter() - start
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                # spawn: forking a process with live threads is unsafe. Spawned
+                # workers import only this module plus the entry script as
+                # __mp_main__, so entry scripts keep app creation behind a
+                # __name__ guard (see wsgi.py and app.py)
+                _executor = ProcessPoolExecutor(
+                    max_workers=Config.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _discard_executor(executor):
+    global _executor_pid
+    with _executor_lock:
+        if _executor is executor:
+            _executor_pid = None
+    executor.shutdown(wait=False)
+
+
+def _run(name, fn, *args):
+    if not _pending.acquire(blocking=False):
+        metrics.incr('password.rejected')
+        raise PasswordHasherBusy('Too many password operations in progress')
+    start = time.perf_counter()
+    try:
+        executor = _get_executor()
+        if executor is None:
+            result, elapsed = fn(*args)
+        else:
+            try:
+                result, elapsed = executor.submit(fn, *args).result()
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool next time and finish this call inline
+                print(f"Password hashing pool error: {e}")
+                _discard_executor(executor)
+                result, elapsed = fn(*args)
+    finally:
+        _pending.release()
+    # Work time in the pool vs. total time including the queue wait
+    metrics.observe(f'password.{name}', elapsed)
+    metrics.observe(f'password.{name}.total', time.perf_counter() - start)
+    return result
+
+
+def hash_password(password):
+    """Hash a password with the configured PASSWORD_HASH_METHOD."""
+    # Expanded, so partial methods like 'scrypt:16384' work as well
+    return _run('hash', _timed_hash, password, _method_prefix(Config.PASSWORD_HASH_METHOD))
+
+
+def verify_password(pwhash, password):
+    """Check a password against a stored hash."""
+    if not pwhash:
+        return False
+    return _run('check', _timed_check, pwhash, password)
+
+
+def _method_prefix(method):
+    """
+    The method field werkzeug stores in hashes made with `method`.
+
+    Expands shorthand like 'scrypt' or 'scrypt:16384' to the full
+    'scrypt:32768:8:1' / 'scrypt:16384:8:1' with werkzeug's defaults for the
+    missing parameters, without computing a hash.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = (args + [2 ** 15, 8, 1][len(args):])[:3]
+        return f'scrypt:{int(n)}:{int(r)}:{int(p)}'
+    if name == 'pbkdf2':
+        hash_name, iterations = (args + ['sha256', DEFAULT_PBKDF2_ITERATIONS][len(args):])[:2]
+        return f'pbkdf2:{hash_name}:{int(iterations)}'
+    return method
+
+
+def needs_rehash(pwhash):
+    """Whether a stored hash was made with different parameters than the configured ones."""
+    return not pwhash or pwhash.split('$', 1)[0] != _method_prefix(Config.PASSWORD_HASH_METHOD)
@@ -0,0 +1,135 @@
+"""
+Server-side checkout pricing.
+
+Carts are priced from the products table and the constants snapshot only;
+prices and totals sent by the client are ignored. The formula matches the
+checkout page: tax is the tax rate times the subtotal, and shipping is the flat
+shipping fee unless the subtotal reaches the free-shipping threshold.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import insert
+from extensions import db
+from models.order import OrderItem
+from models.product import Product
+from utils.constants import get_constants_snapshot
+from utils.inventory import lock_products
+
+CENT = Decimal('0.01')
+
+
+class PricingError(ValueError):
+    """Raised when a cart cannot be priced (bad quantities, unavailable products)."""
+
+
+def _money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PricedCart:
+    """Order lines and totals for a cart."""
+
+    def __init__(self, lines, subtotal, tax, shipping_cost, discount=Decimal('0.00'), products=None):
+        self.lines = lines
+        self.products = products or {}
+        self.subtotal = subtotal
+        self.tax = tax
+        self.shipping_cost = shipping_cost
+        self.discount = discount
+        self.total = subtotal + tax + shipping_cost - discount
+
+    def quantities(self):
+        """{product_id: quantity} for the cart."""
+        return {line['product_id']: line['quantity'] for line in self.lines}
+
+    def order_fields(self):
+        """Money columns for an Order."""
+        return {
+            'subtotal': self.subtotal,
+            'tax': self.tax,
+            'shipping_cost': self.shipping_cost,
+            'discount': self.discount,
+            'total': self.total
+        }
+
+
+def _cart_quantities(items):
+    """Merge cart items into {product_id: quantity}, keeping first-seen order."""
+    if items is not None and not isinstance(items, list):
+        raise PricingError('Items must be a list')
+    quantities = {}
+    for item in items or []:
+        if not isinstance(item, dict):
+            raise PricingError('Each item needs a product_id and a quantity')
+        try:
+            product_id = int(item.get('product_id') or item.get('id'))
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise PricingError('Each item needs a product_id and a quantity')
+        if quantity < 1:
+            raise PricingError('Quantities must be at least 1')
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    if not quantities:
+        raise PricingError('Cart is empty')
+    return quantities
+
+
+def price_cart(items, lock=False):
+    """
+    Price a cart.
+
+    Args:
+        items: Cart items as sent by the client; only product_id (or id) and
+            quantity are used
+        lock: Row-lock the products (in id order) for a following
+            reserve_stock() in the same transaction
+
+    Returns:
+        PricedCart
+
+    Raises:
+        PricingError: If the cart is empty or refers to unavailable products
+    """
+    quantities = _cart_quantities(items)
+    if lock:
+        products = lock_products(list(quantities))
+    else:
+        products = {
+            p.id: p for p in Product.query.filter(Product.id.in_(list(quantities))).all()
+        }
+
+    lines = []
+    subtotal = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            raise PricingError(f'Product {product_id} is not available')
+        unit_price = _money(product.price)
+        total_price = unit_price * quantity
+        subtotal += total_price
+        # Snapshot the product as sold; later catalog edits must not rewrite orders
+        lines.append({
+            'product_id': product.id,
+            'product_name': product.name,
+            'product_sku': product.sku,
+            'product_image': product.image_url,
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_price': total_price
+        })
+
+    constants = get_constants_snapshot()
+    tax = _money(subtotal * constants.tax_rate)
+    if subtotal >= constants.free_shipping_threshold:
+        shipping_cost = Decimal('0.00')
+    else:
+        shipping_cost = _money(constants.shipping_fee)
+
+    return PricedCart(lines, subtotal, tax, shipping_cost, products=products)
+
+
+def insert_order_items(order, priced):
+    """Insert all of a priced cart's lines for an order in one executemany."""
+    db.session.execute(
+        insert(OrderItem),
+        [{'order_id': order.id, **line} for line in priced.lines]
+    )
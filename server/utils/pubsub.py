@@ -0,0 +1,71 @@
+"""
+Process-wide Redis pub/sub listener.
+
+Modules register a handler per channel at import time; one daemon thread per
+process (restarted after a fork) delivers messages to them. Because pub/sub
+drops messages while disconnected, each channel can also register an on_reset
+callback that runs after every (re)subscription so the module can resync its
+local state. connected() tells callers whether messages are currently flowing.
+"""
+import os
+import threading
+import time
+from extensions import redis_client
+
+_handlers = {}  # channel -> (handler, on_reset)
+_listener_pid = None
+_connected = False
+_lock = threading.Lock()
+
+
+def subscribe(channel, handler, on_reset=None):
+    """
+    Register handler(data) for messages on channel.
+
+    Must be called before the listener starts, i.e. at import time.
+    """
+    _handlers[channel] = (handler, on_reset)
+
+
+def connected():
+    """Whether this process's listener is subscribed right now."""
+    return _connected and _listener_pid == os.getpid()
+
+
+def _reset_all():
+    for _, on_reset in _handlers.values():
+        if on_reset:
+            on_reset()
+
+
+def _listen():
+    global _connected
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*_handlers)
+            # Messages may have been missed while disconnected
+            _reset_all()
+            _connected = True
+            for message in pubsub.listen():
+                if message.get('type') == 'message':
+                    handler, _ = _handlers[message['channel']]
+                    handler(message['data'])
+        except Exception as e:
+            print(f"Pub/sub listener error: {e}")
+        _connected = False
+        _reset_all()
+        time.sleep(1)
+
+
+def ensure_listener():
+    """Start this process's listener if it is not running (again after a fork)."""
+    global _listener_pid, _connected
+    if _listener_pid == os.getpid() or not _handlers:
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        _connected = False
+        threading.Thread(target=_listen, name='redis-pubsub', daemon=True).start()
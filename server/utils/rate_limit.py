@@ -0,0 +1,198 @@
+"""
+Sliding-window rate limiting.
+
+Limits are looked up by endpoint (``blueprint.view``) and then by blueprint in
+RATE_LIMITS, e.g. ``auth.login=10/60,payments=20/60`` (requests per seconds).
+Views decorated with @rate_limited check theirs after @jwt_required; every
+other view is checked by the before_request hook init_rate_limits() installs,
+so a blueprint entry covers all of its views.
+Every request is counted against a per-IP key and, when a JWT identity is
+present, a per-user key. The IP is request.remote_addr, which the app sets
+from X-Forwarded-For only for the PROXY_FIX_HOPS trusted proxies. Both are
+checked and recorded in one atomic Lua call against Redis sorted sets; if
+Redis is unreachable, an in-process token bucket with the same rate takes over.
+"""
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, jsonify
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from config import Config
+from extensions import redis_client
+from utils import metrics
+
+KEY_PREFIX = 'rl'
+MAX_LOCAL_BUCKETS = 10000
+
+# KEYS: sliding-window sets to check; ARGV: window (ms), limit, unique member.
+# Returns 0 if admitted (and recorded in every key), else milliseconds to wait.
+_SLIDING_WINDOW_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local retry = 0
+for _, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        local wait = tonumber(oldest[2]) + window - now
+        if wait > retry then retry = wait end
+    end
+end
+if retry > 0 then return retry end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+_sliding_window = redis_client.register_script(_SLIDING_WINDOW_LUA)
+
+
+def parse_rate_limits(spec):
+    """Parse 'name=limit/seconds,...' into {name: (limit, seconds)}."""
+    limits = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        try:
+            name, rate = part.split('=', 1)
+            limit, seconds = rate.split('/', 1)
+            limits[name.strip()] = (int(limit), int(seconds))
+        except ValueError:
+            print(f"Invalid rate limit spec: {part!r}")
+    return limits
+
+
+_limits = parse_rate_limits(Config.RATE_LIMITS)
+
+
+def get_limit(endpoint):
+    """(limit, seconds) configured for an endpoint or its blueprint, or None."""
+    if endpoint in _limits:
+        return _limits[endpoint]
+    return _limits.get(endpoint.split('.', 1)[0])
+
+
+class _LocalBuckets:
+    """In-process token buckets used while Redis is unreachable."""
+
+    def __init__(self, max_buckets):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    def take(self, keys, limit, seconds):
+        """Take one token from every key; returns seconds to wait, 0 if admitted."""
+        rate = limit / seconds
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            wait = 0
+            for key in keys:
+                tokens, updated_at = self._buckets.get(key, (limit, now))
+                tokens = min(limit, tokens + (now - updated_at) * rate)
+                levels[key] = tokens
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            if not wait:
+                for key in keys:
+                    levels[key] -= 1
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+_local_buckets = _LocalBuckets(MAX_LOCAL_BUCKETS)
+
+
+def _current_identity():
+    try:
+        return get_jwt_identity()
+    except Exception:
+        return None  # no verified JWT on this request
+
+
+def check_rate_limit(endpoint, limit, seconds):
+    """
+    Count one request against the limit for this client.
+
+    Returns:
+        float: Seconds until the client may retry, or 0 if the request is admitted
+    """
+    keys = [f'{KEY_PREFIX}:{endpoint}:ip:{request.remote_addr}']
+    user_id = _current_identity()
+    if user_id:
+        keys.append(f'{KEY_PREFIX}:{endpoint}:user:{user_id}')
+
+    try:
+        wait_ms = _sliding_window(keys=keys, args=[seconds * 1000, limit, uuid.uuid4().hex])
+        return int(wait_ms) / 1000
+    except Exception as e:
+        print(f"Rate limit error, using local bucket: {e}")
+        metrics.incr('ratelimit.fallback')
+        return _local_buckets.take(keys, limit, seconds)
+
+
+def _enforce(endpoint):
+    """429 response if this request is over the endpoint's limit, else None."""
+    configured = get_limit(endpoint)
+    if not configured:
+        return None
+    limit, seconds = configured
+    wait = check_rate_limit(endpoint, limit, seconds)
+    if wait <= 0:
+        return None
+    metrics.incr(f'ratelimit.rejected.{endpoint}')
+    response = jsonify({'error': 'Too many requests, please slow down'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response, 429
+
+
+def rate_limited(fn):
+    """
+    Decorator applying the RATE_LIMITS entry for the view's endpoint.
+
+    Place it below @jwt_required so authenticated requests are also limited per user.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        rejected = _enforce(request.endpoint)
+        if rejected:
+            return rejected
+        return fn(*args, **kwargs)
+
+    # Seen through @jwt_required too, which copies the wrapper's attributes
+    wrapper.rate_limited = True
+    return wrapper
+
+
+def _limit_undecorated_view():
+    endpoint = request.endpoint
+    if not endpoint or request.method == 'OPTIONS':
+        return None
+    view = current_app.view_functions.get(endpoint)
+    if view is None or getattr(view, 'rate_limited', False):
+        return None
+    if not get_limit(endpoint):
+        return None
+    try:
+        # Key on the user as well when a valid token is sent; the view's own
+        # @jwt_required still rejects missing or bad ones
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        pass
+    return _enforce(endpoint)
+
+
+def init_rate_limits(app):
+    """Apply RATE_LIMITS to views without @rate_limited."""
+    app.before_request(_limit_undecorated_view)
@@ -0,0 +1,145 @@
+from sqlalchemy import bindparam, func, case, update
+from extensions import db
+from models.product import Product
+from models.rating import ProductRating
+from models.category import Category
+
+
+def _bucket(star):
+    """Return the histogram column for a star value."""
+    return getattr(Product, f'rating_{star}')
+
+
+# Setting updated_at to itself stops its onupdate default from firing: rating
+# summaries are derived data, not an edit of the product
+_KEEP_UPDATED_AT = {Product.updated_at: Product.updated_at}
+
+
+def apply_rating_change(product_id, old_rating, new_rating):
+    """
+    Atomically update a product's rating summary for one inserted or changed rating.
+
+    Args:
+        product_id: Product being rated
+        old_rating: Previous rating by this user, or None for a new rating
+        new_rating: New rating value (1-5)
+    """
+    if old_rating == new_rating:
+        return
+
+    values = {
+        Product.rating_sum: func.coalesce(Product.rating_sum, 0) + (new_rating - (old_rating or 0)),
+        _bucket(new_rating): func.coalesce(_bucket(new_rating), 0) + 1
+    }
+    if old_rating is None:
+        values[Product.rating_count] = func.coalesce(Product.rating_count, 0) + 1
+    else:
+        values[_bucket(old_rating)] = func.coalesce(_bucket(old_rating), 0) - 1
+
+    values.update(_KEEP_UPDATED_AT)
+    Product.query.filter_by(id=product_id).update(values, synchronize_session=False)
+
+
+def recompute_rating_summaries():
+    """
+    Rebuild every product's rating summary from product_ratings.
+
+    Returns:
+        int: Number of products that have at least one rating
+    """
+    rows = db.session.query(
+        ProductRating.product_id,
+        func.sum(ProductRating.rating).label('rating_sum'),
+        func.count(ProductRating.id).label('rating_count'),
+        *[
+            func.sum(case((ProductRating.rating == star, 1), else_=0)).label(f'rating_{star}')
+            for star in range(1, 6)
+        ]
+    ).group_by(ProductRating.product_id).all()
+
+    summary_columns = ['rating_sum', 'rating_count'] + [f'rating_{star}' for star in range(1, 6)]
+
+    # Reset everything first so products whose ratings were removed end up at zero
+    zeroes = {getattr(Product, name): 0 for name in summary_columns}
+    zeroes.update(_KEEP_UPDATED_AT)
+    Product.query.update(zeroes, synchronize_session=False)
+
+    if rows:
+        # Core executemany, so only the summary columns are written
+        products = Product.__table__
+        values = {products.c[name]: bindparam(f'new_{name}') for name in summary_columns}
+        values[products.c.updated_at] = products.c.updated_at
+        stmt = update(products).where(products.c.id == bindparam('product_id')).values(values)
+        db.session.execute(stmt, [
+            {
+                'product_id': row.product_id,
+                **{f'new_{name}': int(getattr(row, name) or 0) for name in summary_columns}
+            }
+            for row in rows
+        ])
+
+    db.session.commit()
+    return len(rows)
+
+
+def get_user_ratings(user_id, product_ids):
+    """
+    Get a user's own ratings for many products in one query.
+
+    Returns:
+        dict: {product_id: rating}
+    """
+    if not user_id or not product_ids:
+        return {}
+
+    rows = db.session.query(ProductRating.product_id, ProductRating.rating).filter(
+        ProductRating.user_id == user_id,
+        ProductRating.product_id.in_(product_ids)
+    ).all()
+
+    return {row.product_id: row.rating for row in rows}
+
+
+def get_categories(category_ids):
+    """
+    Load categories and their product counts for many ids in two queries.
+
+    Returns:
+        dict: {category_id: (category, product_count)}
+    """
+    if not category_ids:
+        return {}
+
+    categories = Category.query.filter(Category.id.in_(category_ids)).all()
+    counts = dict(db.session.query(Product.category_id, func.count(Product.id)).filter(
+        Product.category_id.in_(category_ids)
+    ).group_by(Product.category_id).all())
+
+    return {c.id: (c, counts.get(c.id, 0)) for c in categories}
+
+
+def serialize_products(products, user_id=None, include_user_rating=False, include_category=True):
+    """
+    Serialize a page of products in a constant number of queries.
+
+    Rating averages and counts come from the denormalized columns on Product;
+    the caller's own ratings and the products' categories are fetched in batches.
+    """
+    user_ratings = {}
+    if include_user_rating:
+        user_ratings = get_user_ratings(user_id, [p.id for p in products])
+
+    categories = {}
+    if include_category:
+        categories = get_categories({p.category_id for p in products if p.category_id})
+
+    results = []
+    for p in products:
+        d = p.to_dict(include_category=False)
+        if p.category_id in categories:
+            category, product_count = categories[p.category_id]
+            d['category'] = category.to_dict(product_count=product_count)
+        if include_user_rating:
+            d['your_rating'] = user_ratings.get(p.id)
+        results.append(d)
+    return results
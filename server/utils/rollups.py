@@ -0,0 +1,211 @@
+"""
+Daily analytics rollups.
+
+orders_daily and signups_daily hold per-day counts and paid revenue, keyed by
+the UTC creation date of the orders and users they summarize. Routes record
+changes before committing; the deltas are queued on the session and applied
+once the write has committed, in a short transaction of their own with one
+upsert (INSERT ... ON CONFLICT DO UPDATE) per day row. That keeps the hot
+per-day row lock out of checkout transactions. A rolled-back write discards
+its deltas.
+
+rebuild_rollups() recomputes the tables from scratch for repairs, and
+ensure_rollups() runs it at startup when they are still empty, so an existing
+database is backfilled on first use. Analytics read the rollups, so their cost
+depends on the number of days shown, not on table size.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import case, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from extensions import db
+from models.order import Order, PaymentStatus
+from models.rollup import OrderDaily, SignupDaily
+from models.user import User
+
+PAID_COLUMNS = ('paid_total', 'paid_subtotal', 'paid_tax', 'paid_shipping')
+_PENDING_KEY = 'rollup_deltas'
+
+
+def _day(value):
+    return (value or datetime.utcnow()).date()
+
+
+def _upsert(connection, model, day, deltas):
+    """Add deltas to a rollup row, creating it if needed."""
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(day=day, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.day],
+            set_={name: table.c[name] + stmt.excluded[name] for name in deltas}
+        )
+        connection.execute(stmt)
+        return
+
+    updated = connection.execute(
+        update(table).where(table.c.day == day).values(
+            {name: table.c[name] + delta for name, delta in deltas.items()}
+        )
+    ).rowcount
+    if not updated:
+        connection.execute(table.insert().values(day=day, **deltas))
+
+
+def _queue(model, day, deltas):
+    """Queue deltas to apply once the current transaction commits."""
+    pending = db.session.info.setdefault(_PENDING_KEY, {})
+    totals = pending.setdefault((model, day), {})
+    for name, delta in deltas.items():
+        totals[name] = totals.get(name, 0) + delta
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        with db.engine.begin() as connection:
+            for (model, day), deltas in pending.items():
+                _upsert(connection, model, day, deltas)
+    except Exception as e:
+        # The write itself is committed; rebuild_rollups() repairs the drift
+        print(f"Rollup update error: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _paid_deltas(order, sign):
+    return {
+        'paid_count': sign,
+        'paid_total': sign * Decimal(str(order.total or 0)),
+        'paid_subtotal': sign * Decimal(str(order.subtotal or 0)),
+        'paid_tax': sign * Decimal(str(order.tax or 0)),
+        'paid_shipping': sign * Decimal(str(order.shipping_cost or 0))
+    }
+
+
+def record_order_created(order):
+    """Count a new order (and its revenue, if it is created already paid)."""
+    deltas = {'order_count': 1}
+    if order.payment_status == PaymentStatus.PAID.value:
+        deltas.update(_paid_deltas(order, 1))
+    _queue(OrderDaily, _day(order.created_at), deltas)
+
+
+def record_payment_status_change(order, old_status):
+    """
+    Move an order's revenue in or out of the rollup when it becomes paid or
+    stops being paid (refunded, failed).
+
+    Args:
+        order: Order, already carrying its new payment_status
+        old_status: Payment status before the change
+    """
+    was_paid = old_status == PaymentStatus.PAID.value
+    is_paid = order.payment_status == PaymentStatus.PAID.value
+    if was_paid != is_paid:
+        _queue(OrderDaily, _day(order.created_at), _paid_deltas(order, 1 if is_paid else -1))
+
+
+def record_order_deleted(order):
+    """Remove a deleted order from the rollup."""
+    deltas = {'order_count': -1}
+    if order.payment_status == PaymentStatus.PAID.value:
+        deltas.update(_paid_deltas(order, -1))
+    _queue(OrderDaily, _day(order.created_at), deltas)
+
+
+def record_signup(user):
+    """Count a new user."""
+    _queue(SignupDaily, _day(user.created_at), {'signup_count': 1})
+
+
+def record_user_deleted(user):
+    """Remove a deleted user from the rollup."""
+    _queue(SignupDaily, _day(user.created_at), {'signup_count': -1})
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def rebuild_rollups():
+    """
+    Recompute orders_daily and signups_daily from orders and users.
+
+    Returns:
+        tuple: (order days, signup days) written
+    """
+    OrderDaily.query.delete(synchronize_session=False)
+    SignupDaily.query.delete(synchronize_session=False)
+
+    order_day = func.date(Order.created_at)
+    paid = Order.payment_status == PaymentStatus.PAID.value
+    order_rows = db.session.query(
+        order_day,
+        func.count(Order.id),
+        func.sum(case((paid, 1), else_=0)),
+        func.sum(case((paid, Order.total), else_=0)),
+        func.sum(case((paid, Order.subtotal), else_=0)),
+        func.sum(case((paid, Order.tax), else_=0)),
+        func.sum(case((paid, Order.shipping_cost), else_=0))
+    ).filter(Order.created_at.isnot(None)).group_by(order_day).all()
+
+    db.session.add_all(
+        OrderDaily(
+            day=_as_date(day),
+            order_count=count,
+            paid_count=paid_count or 0,
+            **{name: Decimal(str(value or 0)) for name, value in zip(PAID_COLUMNS, sums)}
+        )
+        for day, count, paid_count, *sums in order_rows
+    )
+
+    signup_day = func.date(User.created_at)
+    signup_rows = db.session.query(signup_day, func.count(User.id)).filter(
+        User.created_at.isnot(None)
+    ).group_by(signup_day).all()
+
+    db.session.add_all(
+        SignupDaily(day=_as_date(day), signup_count=count) for day, count in signup_rows
+    )
+
+    db.session.commit()
+    return len(order_rows), len(signup_rows)
+
+
+def ensure_rollups():
+    """
+    Backfill the rollups if they are empty but there is data to summarize,
+    e.g. on the first start after the tables were added.
+
+    Returns:
+        bool: Whether a rebuild ran
+    """
+    missing_orders = (
+        db.session.scalar(select(OrderDaily.day).limit(1)) is None
+        and db.session.scalar(select(Order.id).limit(1)) is not None
+    )
+    missing_signups = (
+        db.session.scalar(select(SignupDaily.day).limit(1)) is None
+        and db.session.scalar(select(User.id).limit(1)) is not None
+    )
+    if not (missing_orders or missing_signups):
+        return False
+    try:
+        rebuild_rollups()
+    except Exception as e:
+        # Another process may be backfilling at the same time
+        db.session.rollback()
+        print(f"Rollup backfill error: {e}")
+        return False
+    return True
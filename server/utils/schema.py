@@ -0,0 +1,135 @@
+"""
+In-place upgrades for databases created by an older version of the app.
+
+db.create_all() only creates missing tables; it never adds columns or
+constraints to tables that already exist. upgrade_schema() runs at startup
+right after it, inspects the live tables and adds what is missing, backfilling
+derived data where needed. Every step is idempotent, so it is a no-op on a
+fresh or already upgraded database.
+"""
+from sqlalchemy import inspect, text
+from extensions import db
+
+
+def _column_names(table):
+    return {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def _constraint_names(table):
+    inspector = inspect(db.engine)
+    return (
+        {c['name'] for c in inspector.get_unique_constraints(table)}
+        | {i['name'] for i in inspector.get_indexes(table)}
+    )
+
+
+def _add_columns(table, columns):
+    """
+    Add the columns a table is missing.
+
+    Args:
+        table: Table name
+        columns: [(name, DDL type and default)]
+
+    Returns:
+        list: Names of the columns that were added
+    """
+    existing = _column_names(table)
+    added = []
+    for name, ddl in columns:
+        if name not in existing:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {ddl}'))
+            added.append(name)
+    return added
+
+
+def _upgrade_ratings():
+    """Rating summary columns on products and one rating per user and product."""
+    from utils.ratings import recompute_rating_summaries
+
+    added = _add_columns('products', [
+        (name, 'INTEGER DEFAULT 0')
+        for name in ['rating_sum', 'rating_count'] + [f'rating_{star}' for star in range(1, 6)]
+    ])
+
+    removed = 0
+    if 'uq_product_ratings_product_user' not in _constraint_names('product_ratings'):
+        # Concurrent first ratings could insert duplicates before the
+        # constraint existed; keep each user's latest rating
+        removed = db.session.execute(text(
+            'DELETE FROM product_ratings WHERE id NOT IN '
+            '(SELECT max(id) FROM product_ratings GROUP BY product_id, user_id)'
+        )).rowcount
+        db.session.execute(text(
+            'CREATE UNIQUE INDEX uq_product_ratings_product_user ON product_ratings (product_id, user_id)'
+        ))
+
+    if added or removed:
+        # Commits together with the changes above
+        recompute_rating_summaries()
+    return bool(added or removed)
+
+
+def _upgrade_orders():
+    """Reservation flag and captured PayPal payment on orders."""
+    # Orders placed before checkout reserved stock hold none, so false is right
+    # for existing rows: shipping them deducts their stock as it always did
+    added = _add_columns('orders', [
+        ('inventory_reserved', 'BOOLEAN NOT NULL DEFAULT FALSE'),
+        ('payment_id', 'VARCHAR(100)')
+    ])
+    if 'ix_orders_payment_id' not in _constraint_names('orders'):
+        db.session.execute(text(
+            'CREATE UNIQUE INDEX IF NOT EXISTS ix_orders_payment_id ON orders (payment_id)'
+        ))
+        added.append('ix_orders_payment_id')
+    return bool(added)
+
+
+def _upgrade_order_history():
+    """NOT NULL orders.created_at and its index for the order history keyset."""
+    changed = False
+    if 'ix_orders_created_at_id' not in _constraint_names('orders'):
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_orders_created_at_id ON orders (created_at, id)'
+        ))
+        changed = True
+
+    nullable = any(
+        c['name'] == 'created_at' and c['nullable']
+        for c in inspect(db.engine).get_columns('orders')
+    )
+    if not nullable:
+        return changed
+    # Keyset pagination no longer seeks or sorts NULL creation times
+    db.session.execute(text(
+        'UPDATE orders SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL'
+    ))
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite cannot alter a column's nullability; the backfill is enough
+        # since the model never writes NULL
+        return changed
+    db.session.execute(text('ALTER TABLE orders ALTER COLUMN created_at SET NOT NULL'))
+    return True
+
+
+UPGRADES = [_upgrade_ratings, _upgrade_orders, _upgrade_order_history]
+
+
+def upgrade_schema():
+    """
+    Bring existing tables up to the current models.
+
+    Returns:
+        bool: Whether anything was changed
+    """
+    changed = False
+    for upgrade in UPGRADES:
+        try:
+            changed = upgrade() or changed
+            db.session.commit()
+        except Exception as e:
+            # Another process may be upgrading at the same time
+            db.session.rollback()
+            print(f"Schema upgrade error in {upgrade.__name__}: {e}")
+    return changed
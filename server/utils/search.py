@@ -0,0 +1,164 @@
+"""
+Product full-text search.
+
+PostgreSQL uses a GIN index over a ``to_tsvector`` expression on the products
+table; SQLite uses an FTS5 virtual table kept in sync from the admin product
+routes. Any other backend (or SQLite built without FTS5) falls back to ILIKE.
+"""
+import re
+from sqlalchemy import text, or_, func, literal_column
+from extensions import db
+from models.product import Product
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'products_fts'
+
+
+def _pg_document_sql(table=None):
+    """
+    The tsvector expression that is indexed and searched on PostgreSQL.
+
+    Name and SKU matches are weighted above description matches. The query must
+    use the same expression as the index for PostgreSQL to use it.
+    """
+    col = (lambda name: f'{table}.{name}') if table else (lambda name: name)
+    return (
+        f"(setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({col('name')}, '') || ' ' || "
+        f"coalesce({col('sku')}, '')), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({col('description')}, '')), 'C'))"
+    )
+
+
+# bm25 column weights for the FTS5 table (name, sku, description)
+_FTS_WEIGHTS = (10.0, 10.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts5_available = None
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _tokens(term):
+    """Split a search term into safe word tokens."""
+    return _TOKEN_RE.findall((term or '').lower())
+
+
+def _sqlite_has_fts5():
+    """Create the FTS5 table on first use; False if SQLite lacks FTS5."""
+    global _fts5_available
+    if _fts5_available is None:
+        try:
+            db.session.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, sku, description)"
+            ))
+            db.session.commit()
+            _fts5_available = True
+        except Exception as e:
+            db.session.rollback()
+            print(f"SQLite FTS5 unavailable, falling back to LIKE search: {e}")
+            _fts5_available = False
+    return _fts5_available
+
+
+def init_search():
+    """Create the search index for the current database if missing."""
+    dialect = _dialect()
+    try:
+        if dialect == 'postgresql':
+            db.session.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_products_search ON products USING GIN ({_pg_document_sql()})"
+            ))
+            db.session.commit()
+        elif dialect == 'sqlite' and _sqlite_has_fts5():
+            indexed = db.session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+            if not indexed:
+                rebuild_search_index()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Search index init error: {e}")
+
+
+def rebuild_search_index():
+    """Rebuild the SQLite FTS table from products (no-op on PostgreSQL)."""
+    if _dialect() != 'sqlite' or not _sqlite_has_fts5():
+        return
+    db.session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    db.session.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, name, sku, description) "
+        f"SELECT id, coalesce(name, ''), coalesce(sku, ''), coalesce(description, '') FROM products"
+    ))
+    db.session.commit()
+
+
+def index_products(products):
+    """
+    Refresh search entries for created or edited products.
+
+    PostgreSQL maintains its expression index on write, so this only does work
+    for the SQLite FTS table. Call before the surrounding commit.
+    """
+    if _dialect() != 'sqlite' or not _sqlite_has_fts5():
+        return
+    for product in products:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': product.id})
+        db.session.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, name, sku, description) VALUES (:id, :name, :sku, :description)"),
+            {
+                'id': product.id,
+                'name': product.name or '',
+                'sku': product.sku or '',
+                'description': product.description or ''
+            }
+        )
+
+
+def unindex_products(product_ids):
+    """Remove deleted products from the search index. Call before the surrounding commit."""
+    if _dialect() != 'sqlite' or not _sqlite_has_fts5():
+        return
+    for product_id in product_ids:
+        db.session.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': product_id})
+
+
+def apply_search(query, term):
+    """
+    Filter a Product query by a full-text search term.
+
+    Returns:
+        tuple: (filtered query, rank expression to order by or None)
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return query, None
+
+    dialect = _dialect()
+
+    if dialect == 'postgresql':
+        # Prefix-match every token so partial words still find results
+        ts_query = func.to_tsquery(
+            literal_column(f"'{SEARCH_CONFIG}'"), ' & '.join(f'{t}:*' for t in tokens)
+        )
+        document = literal_column(_pg_document_sql(Product.__tablename__))
+        rank = func.ts_rank_cd(document, ts_query)
+        return query.filter(document.op('@@')(ts_query)), rank.desc()
+
+    if dialect == 'sqlite' and _sqlite_has_fts5():
+        match = ' '.join(f'"{t}"*' for t in tokens)
+        weights = ', '.join(str(w) for w in _FTS_WEIGHTS)
+        fts = text(
+            f"SELECT rowid AS id, bm25({FTS_TABLE}, {weights}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+        ).bindparams(match=match).columns(id=db.Integer, rank=db.Float).subquery()
+        # bm25 scores are lower for more relevant rows
+        return query.join(fts, fts.c.id == Product.id), fts.c.rank.asc()
+
+    return query.filter(
+        or_(
+            Product.name.ilike(f'%{term}%'),
+            Product.sku.ilike(f'%{term}%'),
+            Product.description.ilike(f'%{term}%')
+        )
+    ), None
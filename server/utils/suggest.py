@@ -0,0 +1,371 @@
+"""
+In-memory autocomplete index for the storefront search box.
+
+Product names, SKUs, brands and category names are held in a prefix trie for
+as-you-type matching, plus a trigram index for typo-tolerant matches. The index
+is built from the database at startup and patched by the admin product and
+category routes. Each patch is published with the changed ids over Redis
+pub/sub, and every worker process re-reads just those rows and patches its
+copy from the pub/sub listener thread. Lookups never touch the database. If
+the listener was disconnected (and may have missed patches), the process
+rebuilds its copy in the background once it is subscribed again.
+"""
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from flask import current_app
+from extensions import redis_client
+from utils import pubsub
+
+CHANGES_CHANNEL = 'suggest:changes'
+MIN_SIMILARITY = 0.3
+MAX_PREFIX_TERMS = 200
+
+# Lower sorts first when scores tie
+_TYPE_PRIORITY = {'product': 0, 'category': 1, 'brand': 2}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokenize(text):
+    return _TOKEN_RE.findall((text or '').lower())
+
+
+def _trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuggestIndex:
+    """Prefix trie plus trigram index mapping search terms to suggestion entries."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._trie = {}
+        self._term_keys = defaultdict(set)   # term -> entry keys
+        self._trigram_terms = defaultdict(set)  # trigram -> terms
+        self._entries = {}                   # key -> suggestion dict
+        self._entry_terms = {}               # key -> terms indexed for it
+        self._brand_products = defaultdict(set)  # brand key -> product ids
+        self._product_brand = {}             # product id -> brand key
+
+    # Term bookkeeping
+
+    def _add_term(self, term, key):
+        if term not in self._term_keys:
+            node = self._trie
+            for ch in term:
+                node = node.setdefault(ch, {})
+            node['$'] = True
+            for tri in _trigrams(term):
+                self._trigram_terms[tri].add(term)
+        self._term_keys[term].add(key)
+
+    def _remove_term(self, term, key):
+        keys = self._term_keys.get(term)
+        if keys is None:
+            return
+        keys.discard(key)
+        if keys:
+            return
+        del self._term_keys[term]
+        for tri in _trigrams(term):
+            terms = self._trigram_terms.get(tri)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._trigram_terms[tri]
+        # Unmark the trie node; empty branches are harmless and left in place
+        node = self._trie
+        for ch in term:
+            node = node.get(ch)
+            if node is None:
+                return
+        node.pop('$', None)
+
+    def _add_entry(self, key, entry, texts):
+        self._remove_entry(key)
+        terms = set()
+        for text in texts:
+            terms.update(_tokenize(text))
+        for term in terms:
+            self._add_term(term, key)
+        self._entries[key] = entry
+        self._entry_terms[key] = terms
+
+    def _remove_entry(self, key):
+        for term in self._entry_terms.pop(key, ()):
+            self._remove_term(term, key)
+        self._entries.pop(key, None)
+
+    # Public mutation API
+
+    def add_product(self, product):
+        """Add or refresh a product; inactive products are removed."""
+        with self._lock:
+            self.remove_product(product.id)
+            if not product.is_active:
+                return
+            self._add_entry(('product', product.id), {
+                'type': 'product',
+                'id': product.id,
+                'text': product.name,
+                'slug': product.slug,
+                'image_url': product.image_url
+            }, [product.name, product.sku])
+
+            brand = (product.brand or '').strip()
+            if brand:
+                brand_key = ('brand', brand.lower())
+                if not self._brand_products[brand_key]:
+                    self._add_entry(brand_key, {'type': 'brand', 'id': None, 'text': brand}, [brand])
+                self._brand_products[brand_key].add(product.id)
+                self._product_brand[product.id] = brand_key
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._remove_entry(('product', product_id))
+            brand_key = self._product_brand.pop(product_id, None)
+            if brand_key is not None:
+                self._brand_products[brand_key].discard(product_id)
+                if not self._brand_products[brand_key]:
+                    del self._brand_products[brand_key]
+                    self._remove_entry(brand_key)
+
+    def add_category(self, category):
+        """Add or refresh a category; inactive categories are removed."""
+        with self._lock:
+            self.remove_category(category.id)
+            if not category.is_active:
+                return
+            self._add_entry(('category', category.id), {
+                'type': 'category',
+                'id': category.id,
+                'text': category.name,
+                'slug': category.slug
+            }, [category.name])
+
+    def remove_category(self, category_id):
+        with self._lock:
+            self._remove_entry(('category', category_id))
+
+    def load(self, products, categories):
+        """Replace the whole index."""
+        with self._lock:
+            self._clear()
+            for product in products:
+                self.add_product(product)
+            for category in categories:
+                self.add_category(category)
+
+    # Lookup
+
+    def _prefix_terms(self, prefix):
+        node = self._trie
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return []
+        terms = []
+        stack = [(node, prefix)]
+        while stack and len(terms) < MAX_PREFIX_TERMS:
+            node, term = stack.pop()
+            if '$' in node:
+                terms.append(term)
+            for ch, child in node.items():
+                if ch != '$':
+                    stack.append((child, term + ch))
+        return terms
+
+    def _fuzzy_terms(self, token):
+        grams = _trigrams(token)
+        shared = defaultdict(int)
+        for tri in grams:
+            for term in self._trigram_terms.get(tri, ()):
+                shared[term] += 1
+        matches = {}
+        for term, count in shared.items():
+            similarity = count / len(grams | _trigrams(term))
+            if similarity >= MIN_SIMILARITY:
+                matches[term] = similarity
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Suggest entries for a partial query.
+
+        Every token must prefix-match a term of the entry; when that yields too
+        few results, entries are filled in by trigram similarity instead.
+        """
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores = {}
+
+            matched = None
+            for token in tokens:
+                keys = set()
+                for term in self._prefix_terms(token):
+                    keys |= self._term_keys[term]
+                matched = keys if matched is None else matched & keys
+                if not matched:
+                    break
+            for key in matched or ():
+                text = self._entries[key]['text'].lower()
+                # Prefix matches always outrank fuzzy ones (scores <= number of tokens)
+                scores[key] = len(tokens) + (2 if text.startswith(query.strip().lower()) else 1)
+
+            if len(scores) < limit:
+                fuzzy = defaultdict(float)
+                for token in tokens:
+                    if len(token) < 3:
+                        continue
+                    best = {}
+                    for term, similarity in self._fuzzy_terms(token).items():
+                        for key in self._term_keys[term]:
+                            best[key] = max(best.get(key, 0), similarity)
+                    for key, similarity in best.items():
+                        fuzzy[key] += similarity
+                for key, score in fuzzy.items():
+                    scores.setdefault(key, score)
+
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (
+                    -item[1],
+                    _TYPE_PRIORITY[self._entries[item[0]]['type']],
+                    len(self._entries[item[0]]['text'])
+                )
+            )
+            return [dict(self._entries[key]) for key, _ in ranked[:limit]]
+
+
+suggest_index = SuggestIndex()
+
+_app = None
+# Serializes database reads + index updates, so an older read never lands last
+_apply_lock = threading.Lock()
+_resync_lock = threading.Lock()
+_resync_pending = False
+
+
+def build_suggest_index():
+    """(Re)load the index from the database. Requires an app context."""
+    global _app
+    from models.product import Product
+    from models.category import Category
+
+    _app = current_app._get_current_object()
+    with _apply_lock:
+        suggest_index.load(
+            Product.query.filter_by(is_active=True).all(),
+            Category.query.filter_by(is_active=True).all()
+        )
+
+
+def _apply_changes(product_ids, category_ids):
+    """Re-read changed rows and patch them in; ids no longer found are removed."""
+    from models.product import Product
+    from models.category import Category
+
+    with _apply_lock:
+        if product_ids:
+            found = Product.query.filter(Product.id.in_(product_ids)).all()
+            for product in found:
+                suggest_index.add_product(product)
+            for product_id in set(product_ids) - {p.id for p in found}:
+                suggest_index.remove_product(product_id)
+        if category_ids:
+            found = Category.query.filter(Category.id.in_(category_ids)).all()
+            for category in found:
+                suggest_index.add_category(category)
+            for category_id in set(category_ids) - {c.id for c in found}:
+                suggest_index.remove_category(category_id)
+
+
+def _on_changes(data):
+    if _app is None:
+        return
+    changes = json.loads(data)
+    with _app.app_context():
+        _apply_changes(changes.get('products', []), changes.get('categories', []))
+
+
+def _resync():
+    global _resync_pending
+    # Wait until changes are being received again, then catch up on what was missed
+    while not pubsub.connected():
+        time.sleep(0.5)
+    with _resync_lock:
+        _resync_pending = False
+    try:
+        with _app.app_context():
+            build_suggest_index()
+    except Exception as e:
+        print(f"Suggest index rebuild error: {e}")
+
+
+def _schedule_resync():
+    global _resync_pending
+    if _app is None:
+        return
+    with _resync_lock:
+        if _resync_pending:
+            return
+        _resync_pending = True
+    threading.Thread(target=_resync, name='suggest-resync', daemon=True).start()
+
+
+pubsub.subscribe(CHANGES_CHANNEL, _on_changes, on_reset=_schedule_resync)
+
+
+def _publish(product_ids=(), category_ids=()):
+    """Tell the other processes which rows changed; call after committing."""
+    try:
+        redis_client.publish(CHANGES_CHANNEL, json.dumps({
+            'products': list(product_ids),
+            'categories': list(category_ids)
+        }))
+    except Exception as e:
+        print(f"Suggest change publish error: {e}")
+
+
+def suggest(query, limit=10):
+    """Look up suggestions from this process's index."""
+    pubsub.ensure_listener()
+    return suggest_index.search(query, limit=limit)
+
+
+def sync_products(products):
+    """Patch created or edited products into the index."""
+    for product in products:
+        suggest_index.add_product(product)
+    _publish(product_ids=[p.id for p in products])
+
+
+def remove_products(product_ids):
+    """Drop deleted products from the index."""
+    for product_id in product_ids:
+        suggest_index.remove_product(product_id)
+    _publish(product_ids=product_ids)
+
+
+def sync_categories(categories):
+    """Patch created or edited categories into the index."""
+    for category in categories:
+        suggest_index.add_category(category)
+    _publish(category_ids=[c.id for c in categories])
+
+
+def remove_categories(category_ids):
+    """Drop deleted categories from the index."""
+    for category_id in category_ids:
+        suggest_index.remove_category(category_id)
+    _publish(category_ids=category_ids)
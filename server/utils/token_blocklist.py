@@ -0,0 +1,122 @@
+"""
+Revoked JWT blocklist.
+
+Revoked token ids (JTIs) are stored in Redis until the token would have
+expired anyway. Since almost every token checked is *not* revoked, each process
+keeps a Bloom filter of revoked JTIs in front of Redis: a negative answer from
+the filter is definitive and costs no round-trip, and only possible positives
+are confirmed against Redis. Revocations are broadcast over pub/sub so every
+worker adds them to its filter; while the listener is disconnected every check
+goes to Redis.
+"""
+import hashlib
+import math
+import threading
+import time
+from config import Config
+from extensions import redis_client
+from utils import pubsub
+
+REVOKED_KEY_PREFIX = 'jwt:revoked:'
+REVOKED_INDEX_KEY = 'jwt:revoked'  # sorted set of jti -> expiry, used to rebuild filters
+REVOKED_CHANNEL = 'jwt:revocations'
+REBUILD_INTERVAL = 3600  # seconds; drops expired JTIs that a Bloom filter cannot forget
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos // 8] |= 1 << (pos % 8)
+
+    def __contains__(self, item):
+        return all(self._bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+
+def _new_filter():
+    return BloomFilter(Config.JWT_BLOOM_CAPACITY, Config.JWT_BLOOM_ERROR_RATE)
+
+
+_filter = _new_filter()
+_filter_ready = False
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def _rebuild_filter():
+    """Reload the local filter from the Redis index of unexpired revocations."""
+    global _filter, _filter_ready, _built_at
+    with _lock:
+        try:
+            now = time.time()
+            redis_client.zremrangebyscore(REVOKED_INDEX_KEY, '-inf', now)
+            fresh = _new_filter()
+            for jti in redis_client.zrangebyscore(REVOKED_INDEX_KEY, now, '+inf'):
+                fresh.add(jti)
+            _filter, _filter_ready = fresh, True
+        except Exception as e:
+            print(f"Token blocklist rebuild error: {e}")
+            _filter_ready = False
+        _built_at = time.monotonic()
+
+
+def _on_revoked(jti):
+    with _lock:
+        _filter.add(jti)
+
+
+pubsub.subscribe(REVOKED_CHANNEL, _on_revoked, on_reset=_rebuild_filter)
+
+
+def revoke_token(jti, expires_at):
+    """
+    Add a token to the blocklist until it expires.
+
+    Args:
+        jti: Token id (the ``jti`` claim)
+        expires_at: Unix timestamp of the token's expiry (the ``exp`` claim)
+    """
+    ttl = int(expires_at - time.time()) + 1
+    if ttl <= 0:
+        return
+    _on_revoked(jti)
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.setex(REVOKED_KEY_PREFIX + jti, ttl, 1)
+        pipe.zadd(REVOKED_INDEX_KEY, {jti: expires_at})
+        pipe.publish(REVOKED_CHANNEL, jti)
+        pipe.execute()
+    except Exception as e:
+        print(f"Token revoke error: {e}")
+
+
+def is_token_revoked(jwt_payload):
+    """Blocklist check for flask_jwt_extended's token_in_blocklist_loader."""
+    jti = jwt_payload.get('jti')
+    if not jti:
+        return False
+
+    pubsub.ensure_listener()
+    if pubsub.connected() and _filter_ready:
+        if time.monotonic() - _built_at >= REBUILD_INTERVAL:
+            _rebuild_filter()
+        if jti not in _filter:
+            return False
+
+    try:
+        return bool(redis_client.exists(REVOKED_KEY_PREFIX + jti))
+    except Exception as e:
+        print(f"Token blocklist check error: {e}")
+        return False
@@ -1,4 +1,10 @@
-from app import create_app
+# Create the WSGI application for production servers (gunicorn).
+# Spawned helper processes (the password hashing pool) re-import the main
+# module as __mp_main__; they must not import and boot a whole app of their own.
+if __name__ != '__mp_main__':
+    from app import create_app
 
-# Create the WSGI application for production servers (gunicorn)
-app = create_app()
+    app = create_app()
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)